@@ -9,6 +9,8 @@ def main(global_config, **settings):
         config.include('pyramid_jinja2')
         config.include('.routes') # This will now include all routes (static, home, and API)
         config.include('.models')
+        # reminder-due and hafalan-changed events, if push.enabled
+        config.include('.push')
         # config.include('pyramid_tm') # Already commented out or handled if necessary
 
         # Add JSON renderer for API responses
@@ -20,5 +22,8 @@ def main(global_config, **settings):
         # Include authentication middleware
         config.include('.auth')
 
+        # gzip/br/zstd responses according to Accept-Encoding
+        config.include('.compression')
+
         config.scan('.views') # Scan direktori views yang baru dibuat
     return config.make_wsgi_app()
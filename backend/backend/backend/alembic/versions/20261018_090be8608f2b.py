@@ -0,0 +1,27 @@
+"""composite (user_id, is_completed, due_date) index on reminders
+
+Revision ID: 090be8608f2b
+Revises: 3679facdb948
+Create Date: 2026-10-18 20:47:31.205716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '090be8608f2b'
+down_revision = '3679facdb948'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_reminders_user_completed_due', 'reminders', ['user_id', 'is_completed', 'due_date'])
+    # Both are covered by the composite index (and the dispatcher has its own)
+    op.drop_index(op.f('ix_reminders_user_id'), table_name='reminders')
+    op.drop_index(op.f('ix_reminders_due_date'), table_name='reminders')
+
+def downgrade():
+    op.create_index(op.f('ix_reminders_due_date'), 'reminders', ['due_date'], unique=False)
+    op.create_index(op.f('ix_reminders_user_id'), 'reminders', ['user_id'], unique=False)
+    op.drop_index('ix_reminders_user_completed_due', table_name='reminders')
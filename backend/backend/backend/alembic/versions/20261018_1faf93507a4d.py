@@ -0,0 +1,24 @@
+"""index hafalan by user, status and review time
+
+Revision ID: 1faf93507a4d
+Revises: a17ef55d57d4
+Create Date: 2026-10-18 14:21:09.337104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1faf93507a4d'
+down_revision = 'a17ef55d57d4'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ix_hafalan_user_status_reviewed', 'hafalan', ['user_id', 'status', 'last_reviewed_at']
+    )
+
+def downgrade():
+    op.drop_index('ix_hafalan_user_status_reviewed', table_name='hafalan')
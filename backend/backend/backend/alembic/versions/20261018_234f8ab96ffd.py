@@ -0,0 +1,87 @@
+"""per-user ayah coverage bitmap
+
+Revision ID: 234f8ab96ffd
+Revises: 6f5920a6fc44
+Create Date: 2026-10-18 17:48:20.571934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '234f8ab96ffd'
+down_revision = '6f5920a6fc44'
+branch_labels = None
+depends_on = None
+
+# Copied from utils/coverage.py so the migration does not change with it
+BITMAP_BYTES = 780
+BATCH_SIZE = 1000
+
+hafalan = sa.table(
+    'hafalan',
+    sa.column('user_id', sa.Integer),
+    sa.column('status', sa.String),
+    sa.column('start_index', sa.Integer),
+    sa.column('end_index', sa.Integer),
+)
+user_coverage = sa.table(
+    'user_coverage',
+    sa.column('user_id', sa.Integer),
+    sa.column('bitmap', sa.LargeBinary),
+    sa.column('covered_ayahs', sa.Integer),
+)
+
+
+def backfill(bind):
+    """Build the bitmaps from the finished entries, BATCH_SIZE users at a time."""
+    last_user_id = 0
+    while True:
+        user_ids = [
+            row.user_id for row in bind.execute(
+                sa.select(hafalan.c.user_id).distinct()
+                .where(hafalan.c.user_id > last_user_id)
+                .order_by(hafalan.c.user_id)
+                .limit(BATCH_SIZE)
+            )
+        ]
+        if not user_ids:
+            return
+        bits = dict.fromkeys(user_ids, 0)
+        for row in bind.execute(
+            sa.select(hafalan.c.user_id, hafalan.c.start_index, hafalan.c.end_index).where(
+                hafalan.c.user_id.in_(user_ids),
+                hafalan.c.status == 'selesai',
+                hafalan.c.start_index.isnot(None),
+                hafalan.c.end_index.isnot(None),
+            )
+        ):
+            bits[row.user_id] |= ((1 << (row.end_index - row.start_index + 1)) - 1) << (row.start_index - 1)
+        rows = [
+            {
+                'user_id': user_id,
+                'bitmap': value.to_bytes(BITMAP_BYTES, 'little'),
+                'covered_ayahs': bin(value).count('1'),
+            }
+            for user_id, value in bits.items() if value
+        ]
+        if rows:
+            bind.execute(user_coverage.insert(), rows)
+        last_user_id = user_ids[-1]
+
+
+def upgrade():
+    op.create_table(
+        'user_coverage',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('bitmap', sa.LargeBinary(), nullable=False),
+        sa.Column('covered_ayahs', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_user_coverage_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', name=op.f('pk_user_coverage')),
+    )
+    backfill(op.get_bind())
+
+def downgrade():
+    op.drop_table('user_coverage')
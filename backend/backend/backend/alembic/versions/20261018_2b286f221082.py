@@ -0,0 +1,24 @@
+"""add collection versions to users
+
+Revision ID: 2b286f221082
+Revises: 9be68f162d9f
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b286f221082'
+down_revision = '9be68f162d9f'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('users', sa.Column('hafalan_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('reminder_version', sa.Integer(), server_default='0', nullable=False))
+
+def downgrade():
+    op.drop_column('users', 'reminder_version')
+    op.drop_column('users', 'hafalan_version')
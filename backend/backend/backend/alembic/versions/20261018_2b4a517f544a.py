@@ -0,0 +1,155 @@
+"""per-user progress summaries
+
+Revision ID: 2b4a517f544a
+Revises: 1faf93507a4d
+Create Date: 2026-10-18 15:02:37.184520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b4a517f544a'
+down_revision = '1faf93507a4d'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+users = sa.table('users', sa.column('id', sa.Integer))
+surahs = sa.table(
+    'surahs',
+    sa.column('id', sa.Integer),
+    sa.column('number_of_ayahs', sa.Integer),
+)
+hafalan = sa.table(
+    'hafalan',
+    sa.column('user_id', sa.Integer),
+    sa.column('surah_id', sa.Integer),
+    sa.column('status', sa.String),
+    sa.column('start_ayah', sa.Integer),
+    sa.column('end_ayah', sa.Integer),
+)
+user_progress = sa.table(
+    'user_progress',
+    *(sa.column(name, sa.Integer) for name in (
+        'user_id', 'total_entries', 'belum_count', 'sedang_count',
+        'selesai_count', 'ayahs_memorized', 'surahs_completed',
+    ))
+)
+user_surah_progress = sa.table(
+    'user_surah_progress',
+    *(sa.column(name, sa.Integer) for name in (
+        'user_id', 'surah_id', 'entries', 'selesai_entries', 'ayahs_memorized',
+    )),
+    sa.column('completed', sa.Boolean),
+)
+
+
+def union_size(ranges):
+    """Ayahs covered by ``ranges``, shared ayahs counted once."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return sum(end - start + 1 for start, end in merged)
+
+
+def summarize(rows, number_of_ayahs):
+    """The summary rows of one batch of users, as utils/progress.py counts them."""
+    progress = {}
+    per_surah = {}
+    ranges = {}
+    for row in rows:
+        user = progress.setdefault(row.user_id, {
+            'user_id': row.user_id, 'total_entries': 0, 'belum_count': 0, 'sedang_count': 0,
+            'selesai_count': 0, 'ayahs_memorized': 0, 'surahs_completed': 0,
+        })
+        user['total_entries'] += 1
+        user[f'{row.status}_count'] += 1
+        finished = row.status == 'selesai' and row.start_ayah is not None and row.end_ayah is not None
+        if row.surah_id is None:
+            # Unresolved surahs cannot be placed in the mushaf
+            if finished:
+                user['ayahs_memorized'] += row.end_ayah - row.start_ayah + 1
+            continue
+        surah = per_surah.setdefault((row.user_id, row.surah_id), {
+            'user_id': row.user_id, 'surah_id': row.surah_id, 'entries': 0,
+            'selesai_entries': 0, 'ayahs_memorized': 0, 'completed': False,
+        })
+        surah['entries'] += 1
+        surah['selesai_entries'] += row.status == 'selesai'
+        if finished:
+            ranges.setdefault((row.user_id, row.surah_id), []).append((row.start_ayah, row.end_ayah))
+
+    for key, surah in per_surah.items():
+        surah['ayahs_memorized'] = union_size(ranges.get(key, ()))
+        surah['completed'] = surah['ayahs_memorized'] >= number_of_ayahs.get(surah['surah_id'], 0)
+        user = progress[surah['user_id']]
+        user['ayahs_memorized'] += surah['ayahs_memorized']
+        user['surahs_completed'] += surah['completed']
+    return list(progress.values()), list(per_surah.values())
+
+
+def backfill(bind):
+    """
+    Fill both summaries BATCH_SIZE users at a time. Finished ranges are
+    counted as per-surah unions, so overlapping entries count their shared
+    ayahs once, as the incremental updates do.
+    """
+    number_of_ayahs = dict(bind.execute(sa.select(surahs.c.id, surahs.c.number_of_ayahs)).fetchall())
+    last_id = 0
+    while True:
+        user_ids = bind.execute(
+            sa.select(users.c.id).where(users.c.id > last_id).order_by(users.c.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not user_ids:
+            break
+        rows = bind.execute(
+            sa.select(hafalan.c.user_id, hafalan.c.surah_id, hafalan.c.status,
+                      hafalan.c.start_ayah, hafalan.c.end_ayah)
+            .where(hafalan.c.user_id.in_(user_ids))
+        ).fetchall()
+        progress, per_surah = summarize(rows, number_of_ayahs)
+        if progress:
+            bind.execute(user_progress.insert(), progress)
+        if per_surah:
+            bind.execute(user_surah_progress.insert(), per_surah)
+        last_id = user_ids[-1]
+
+
+def upgrade():
+    op.create_table(
+        'user_progress',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_entries', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('belum_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('sedang_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('selesai_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('ayahs_memorized', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('surahs_completed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_user_progress_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', name=op.f('pk_user_progress')),
+    )
+    op.create_table(
+        'user_surah_progress',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('surah_id', sa.Integer(), nullable=False),
+        sa.Column('entries', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('selesai_entries', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('ayahs_memorized', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('completed', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.ForeignKeyConstraint(['surah_id'], ['surahs.id'], name=op.f('fk_user_surah_progress_surah_id_surahs'), ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_user_surah_progress_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'surah_id', name=op.f('pk_user_surah_progress')),
+    )
+
+    backfill(op.get_bind())
+
+def downgrade():
+    op.drop_table('user_surah_progress')
+    op.drop_table('user_progress')
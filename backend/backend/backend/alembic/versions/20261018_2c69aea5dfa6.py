@@ -0,0 +1,94 @@
+"""change sequence and tombstones for delta sync
+
+Revision ID: 2c69aea5dfa6
+Revises: 8042a7a618f3
+Create Date: 2026-10-18 16:27:51.209338
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c69aea5dfa6'
+down_revision = '8042a7a618f3'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+users = sa.table(
+    'users',
+    sa.column('id', sa.Integer),
+    sa.column('change_seq', sa.Integer),
+)
+
+
+def backfill(bind):
+    """Number existing rows per user in id order, hafalan first, BATCH_SIZE at a time."""
+    counters = {}
+    for table_name in ('hafalan', 'reminders'):
+        table = sa.table(
+            table_name,
+            sa.column('id', sa.Integer),
+            sa.column('user_id', sa.Integer),
+            sa.column('change_seq', sa.Integer),
+        )
+        update = table.update().where(table.c.id == sa.bindparam('row_id')).values(
+            change_seq=sa.bindparam('seq')
+        )
+        last_id = 0
+        while True:
+            rows = bind.execute(
+                sa.select(table.c.id, table.c.user_id)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                counters[row.user_id] = counters.get(row.user_id, 0) + 1
+                updates.append({'row_id': row.id, 'seq': counters[row.user_id]})
+            bind.execute(update, updates)
+            last_id = rows[-1].id
+
+    if counters:
+        bind.execute(
+            users.update().where(users.c.id == sa.bindparam('user_id')).values(change_seq=sa.bindparam('seq')),
+            [{'user_id': user_id, 'seq': seq} for user_id, seq in counters.items()],
+        )
+
+
+def upgrade():
+    for table_name in ('users', 'hafalan', 'reminders'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_sync_tombstones_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_sync_tombstones')),
+    )
+    op.create_index('ix_sync_tombstones_user_change_seq', 'sync_tombstones', ['user_id', 'change_seq'])
+
+    backfill(op.get_bind())
+
+    # Built after the backfill so the updates do not maintain them row by row
+    op.create_index('ix_hafalan_user_change_seq', 'hafalan', ['user_id', 'change_seq'])
+    op.create_index('ix_reminders_user_change_seq', 'reminders', ['user_id', 'change_seq'])
+
+def downgrade():
+    op.drop_index('ix_reminders_user_change_seq', table_name='reminders')
+    op.drop_index('ix_hafalan_user_change_seq', table_name='hafalan')
+    op.drop_index('ix_sync_tombstones_user_change_seq', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    for table_name in ('reminders', 'hafalan', 'users'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('change_seq')
@@ -0,0 +1,24 @@
+"""sinks that accepted a reminder being retried
+
+Revision ID: 35d25ffadd70
+Revises: d3f92fbfb4a5
+Create Date: 2026-10-18 23:41:08.226517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '35d25ffadd70'
+down_revision = 'd3f92fbfb4a5'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.add_column(sa.Column('delivered_sinks', sa.Text(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.drop_column('delivered_sinks')
@@ -0,0 +1,36 @@
+"""recurring reminders and occurrence overrides
+
+Revision ID: 3679facdb948
+Revises: 8f9e04a9f209
+Create Date: 2026-10-18 20:11:05.862390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3679facdb948'
+down_revision = '8f9e04a9f209'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.add_column(sa.Column('recurrence', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_end', sa.TIMESTAMP(timezone=True), nullable=True))
+    op.create_table(
+        'reminder_occurrences',
+        sa.Column('reminder_id', sa.Integer(), nullable=False),
+        sa.Column('occurs_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('is_completed', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['reminder_id'], ['reminders.id'], name=op.f('fk_reminder_occurrences_reminder_id_reminders'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('reminder_id', 'occurs_at', name=op.f('pk_reminder_occurrences')),
+    )
+
+def downgrade():
+    op.drop_table('reminder_occurrences')
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.drop_column('recurrence_end')
+        batch_op.drop_column('recurrence')
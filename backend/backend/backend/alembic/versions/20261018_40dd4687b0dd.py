@@ -0,0 +1,24 @@
+"""unique ayah number per surah
+
+Revision ID: 40dd4687b0dd
+Revises: 2b286f221082
+Create Date: 2026-10-18 10:03:54.118240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40dd4687b0dd'
+down_revision = '2b286f221082'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('ayahs') as batch_op:
+        batch_op.create_unique_constraint(op.f('uq_ayahs_surah_id'), ['surah_id', 'ayah_number_in_surah'])
+
+def downgrade():
+    with op.batch_alter_table('ayahs') as batch_op:
+        batch_op.drop_constraint(op.f('uq_ayahs_surah_id'), type_='unique')
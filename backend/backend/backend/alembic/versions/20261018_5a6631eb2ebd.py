@@ -0,0 +1,73 @@
+"""review event log and daily activity rollups
+
+Revision ID: 5a6631eb2ebd
+Revises: 234f8ab96ffd
+Create Date: 2026-10-18 18:32:09.114582
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5a6631eb2ebd'
+down_revision = '234f8ab96ffd'
+branch_labels = None
+depends_on = None
+
+hafalan_status_enum_type = postgresql.ENUM('belum', 'sedang', 'selesai', name='hafalanstatusenum', create_type=False)
+
+
+def backfill(bind):
+    """Seed the log with the last review of every entry (the only history kept so far)."""
+    bind.execute(sa.text(
+        "INSERT INTO review_events (user_id, hafalan_id, kind, status, ayahs, occurred_at) "
+        "SELECT user_id, id, 'review', status, COALESCE(end_ayah - start_ayah + 1, 0), last_reviewed_at "
+        "FROM hafalan WHERE last_reviewed_at IS NOT NULL"
+    ))
+    if bind.dialect.name == 'postgresql':
+        day = "(occurred_at AT TIME ZONE 'UTC')::date"
+    else:
+        day = "date(occurred_at)"
+    bind.execute(sa.text(
+        "INSERT INTO user_daily_activity (user_id, day, events, reviews, ayahs_reviewed) "
+        f"SELECT user_id, {day}, COUNT(*), COUNT(*), SUM(ayahs) FROM review_events "
+        f"GROUP BY user_id, {day}"
+    ))
+
+
+def upgrade():
+    op.create_table(
+        'review_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('hafalan_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('status', hafalan_status_enum_type, nullable=True),
+        sa.Column('quality', sa.Integer(), nullable=True),
+        sa.Column('ayahs', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('occurred_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_review_events_user_id_users'), ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['hafalan_id'], ['hafalan.id'], name=op.f('fk_review_events_hafalan_id_hafalan'), ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_review_events')),
+    )
+    op.create_table(
+        'user_daily_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('events', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('reviews', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('ayahs_reviewed', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_user_daily_activity_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day', name=op.f('pk_user_daily_activity')),
+    )
+    backfill(op.get_bind())
+    op.create_index('ix_review_events_user_occurred', 'review_events', ['user_id', 'occurred_at'])
+    op.create_index('ix_review_events_occurred', 'review_events', ['occurred_at'])
+
+def downgrade():
+    op.drop_index('ix_review_events_occurred', table_name='review_events')
+    op.drop_index('ix_review_events_user_occurred', table_name='review_events')
+    op.drop_table('user_daily_activity')
+    op.drop_table('review_events')
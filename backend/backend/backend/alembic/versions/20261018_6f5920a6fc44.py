@@ -0,0 +1,38 @@
+"""spaced-repetition schedule on hafalan
+
+Revision ID: 6f5920a6fc44
+Revises: 2c69aea5dfa6
+Create Date: 2026-10-18 17:05:36.418720
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f5920a6fc44'
+down_revision = '2c69aea5dfa6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('hafalan') as batch_op:
+        batch_op.add_column(sa.Column('due_at', sa.TIMESTAMP(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('review_interval', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('ease_factor', sa.Float(), server_default='2.5', nullable=False))
+        batch_op.add_column(sa.Column('review_repetitions', sa.Integer(), server_default='0', nullable=False))
+    # Entries already being memorized or finished are due from their last
+    # review (or creation), so they show up at the front of the queue
+    op.execute(
+        "UPDATE hafalan SET due_at = COALESCE(last_reviewed_at, created_at) "
+        "WHERE status != 'belum'"
+    )
+    op.create_index('ix_hafalan_user_due', 'hafalan', ['user_id', 'due_at'])
+
+def downgrade():
+    op.drop_index('ix_hafalan_user_due', table_name='hafalan')
+    with op.batch_alter_table('hafalan') as batch_op:
+        batch_op.drop_column('review_repetitions')
+        batch_op.drop_column('ease_factor')
+        batch_op.drop_column('review_interval')
+        batch_op.drop_column('due_at')
@@ -0,0 +1,27 @@
+"""composite indexes for hafalan list filters and sorts
+
+Revision ID: 8042a7a618f3
+Revises: 2b4a517f544a
+Create Date: 2026-10-18 15:48:12.603917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8042a7a618f3'
+down_revision = '2b4a517f544a'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_hafalan_user_status_updated', 'hafalan', ['user_id', 'status', 'updated_at'])
+    op.create_index('ix_hafalan_user_reviewed', 'hafalan', ['user_id', 'last_reviewed_at'])
+    # Covered by the user_id prefix of the composite indexes
+    op.drop_index(op.f('ix_hafalan_user_id'), table_name='hafalan')
+
+def downgrade():
+    op.create_index(op.f('ix_hafalan_user_id'), 'hafalan', ['user_id'], unique=False)
+    op.drop_index('ix_hafalan_user_reviewed', table_name='hafalan')
+    op.drop_index('ix_hafalan_user_status_updated', table_name='hafalan')
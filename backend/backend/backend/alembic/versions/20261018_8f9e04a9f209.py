@@ -0,0 +1,47 @@
+"""reminder dispatch state
+
+Revision ID: 8f9e04a9f209
+Revises: 5a6631eb2ebd
+Create Date: 2026-10-18 19:26:47.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f9e04a9f209'
+down_revision = '5a6631eb2ebd'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.add_column(sa.Column('dispatch_status', sa.String(length=10), server_default='pending', nullable=False))
+        batch_op.add_column(sa.Column('dispatch_attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('claimed_until', sa.TIMESTAMP(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('dispatched_at', sa.TIMESTAMP(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('last_error', sa.Text(), nullable=True))
+    # Reminders that were already due before the dispatcher existed are not
+    # sent out all at once on its first run
+    op.execute("UPDATE reminders SET dispatch_status = 'sent' WHERE due_date < CURRENT_TIMESTAMP")
+    op.create_index(
+        'ix_reminders_pending_due', 'reminders', ['due_date'],
+        postgresql_where=sa.text("dispatch_status = 'pending' AND is_completed IS NOT TRUE"),
+        sqlite_where=sa.text("dispatch_status = 'pending' AND is_completed IS NOT 1"),
+    )
+    op.create_index('ix_reminders_claim_token', 'reminders', ['claim_token'])
+
+def downgrade():
+    op.drop_index('ix_reminders_claim_token', table_name='reminders')
+    op.drop_index('ix_reminders_pending_due', table_name='reminders')
+    with op.batch_alter_table('reminders') as batch_op:
+        batch_op.drop_column('last_error')
+        batch_op.drop_column('dispatched_at')
+        batch_op.drop_column('claimed_until')
+        batch_op.drop_column('claim_token')
+        batch_op.drop_column('next_attempt_at')
+        batch_op.drop_column('dispatch_attempts')
+        batch_op.drop_column('dispatch_status')
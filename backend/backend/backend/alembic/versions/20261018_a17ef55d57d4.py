@@ -0,0 +1,113 @@
+"""structured ayah ranges on hafalan
+
+Revision ID: a17ef55d57d4
+Revises: e3357411ac62
+Create Date: 2026-10-18 13:02:44.915620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backend.utils.ayah_range import AyahRangeError, range_columns
+from backend.utils.surah_resolver import SurahResolver
+
+
+# revision identifiers, used by Alembic.
+revision = 'a17ef55d57d4'
+down_revision = 'e3357411ac62'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+surahs = sa.table(
+    'surahs',
+    sa.column('id', sa.Integer),
+    sa.column('surah_number', sa.Integer),
+    sa.column('name_arabic', sa.String),
+    sa.column('name_english', sa.String),
+    sa.column('english_translation', sa.String),
+    sa.column('number_of_ayahs', sa.Integer),
+)
+hafalan = sa.table(
+    'hafalan',
+    sa.column('id', sa.Integer),
+    sa.column('surah_name', sa.String),
+    sa.column('ayah_range', sa.String),
+    sa.column('surah_id', sa.Integer),
+    sa.column('start_ayah', sa.Integer),
+    sa.column('end_ayah', sa.Integer),
+    sa.column('start_index', sa.Integer),
+    sa.column('end_index', sa.Integer),
+)
+
+
+def backfill(bind):
+    """Parse existing rows in id order, BATCH_SIZE at a time."""
+    surah_rows = [dict(row) for row in bind.execute(
+        sa.select(surahs).order_by(surahs.c.surah_number)
+    ).mappings()]
+    resolver = SurahResolver(surah_rows)
+    offsets, offset = {}, 0
+    for surah in surah_rows:
+        offsets[surah['id']] = offset
+        offset += surah['number_of_ayahs']
+
+    update = hafalan.update().where(hafalan.c.id == sa.bindparam('hafalan_id')).values(
+        surah_id=sa.bindparam('surah_id'),
+        start_ayah=sa.bindparam('start_ayah'),
+        end_ayah=sa.bindparam('end_ayah'),
+        start_index=sa.bindparam('start_index'),
+        end_index=sa.bindparam('end_index'),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(hafalan.c.id, hafalan.c.surah_name, hafalan.c.ayah_range)
+            .where(hafalan.c.id > last_id)
+            .order_by(hafalan.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for row in rows:
+            surah = resolver.resolve(row.surah_name) if row.surah_name else None
+            try:
+                columns = range_columns(surah, offsets.get(surah['id'], 0) if surah else 0, row.ayah_range)
+            except AyahRangeError:
+                # Left NULL; the free text is kept as is
+                continue
+            updates.append(dict(columns, hafalan_id=row.id))
+        if updates:
+            bind.execute(update, updates)
+        last_id = rows[-1].id
+
+
+def upgrade():
+    with op.batch_alter_table('hafalan') as batch_op:
+        batch_op.add_column(sa.Column('surah_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('start_ayah', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('end_ayah', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('start_index', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('end_index', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            op.f('fk_hafalan_surah_id_surahs'), 'surahs', ['surah_id'], ['id'], ondelete='SET NULL'
+        )
+
+    backfill(op.get_bind())
+
+    # Built after the backfill so the updates do not maintain them row by row
+    op.create_index('ix_hafalan_surah_range', 'hafalan', ['surah_id', 'start_ayah', 'end_ayah'])
+    op.create_index('ix_hafalan_user_index_range', 'hafalan', ['user_id', 'start_index', 'end_index'])
+
+def downgrade():
+    op.drop_index('ix_hafalan_user_index_range', table_name='hafalan')
+    op.drop_index('ix_hafalan_surah_range', table_name='hafalan')
+    with op.batch_alter_table('hafalan') as batch_op:
+        batch_op.drop_constraint(op.f('fk_hafalan_surah_id_surahs'), type_='foreignkey')
+        batch_op.drop_column('end_index')
+        batch_op.drop_column('start_index')
+        batch_op.drop_column('end_ayah')
+        batch_op.drop_column('start_ayah')
+        batch_op.drop_column('surah_id')
@@ -0,0 +1,51 @@
+"""store SQLite timestamps as UTC YYYY-MM-DD HH:MM:SS.ffffff
+
+Revision ID: d3f92fbfb4a5
+Revises: 090be8608f2b
+Create Date: 2026-10-18 22:05:12.418301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f92fbfb4a5'
+down_revision = '090be8608f2b'
+branch_labels = None
+depends_on = None
+
+# Every timestamp column as of this revision
+TIMESTAMP_COLUMNS = {
+    'users': ('created_at',),
+    'hafalan': ('created_at', 'updated_at', 'last_reviewed_at', 'due_at'),
+    'reminders': (
+        'due_date', 'created_at', 'next_attempt_at', 'claimed_until', 'dispatched_at', 'recurrence_end',
+    ),
+    'reminder_occurrences': ('occurs_at', 'updated_at'),
+    'sync_tombstones': ('deleted_at',),
+    'user_progress': ('updated_at',),
+    'user_coverage': ('updated_at',),
+    'review_events': ('occurred_at',),
+}
+
+
+def upgrade():
+    # PostgreSQL compares timestamptz by instant already
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            # Values written by CURRENT_TIMESTAMP lack the fraction; strftime
+            # also moves values with an offset to UTC. Only values already in
+            # the format keep their microseconds.
+            op.execute(sa.text(
+                f"UPDATE {table} SET {column} = strftime('%Y-%m-%d %H:%M:%f', {column}) || '000' "
+                f"WHERE {column} IS NOT NULL AND ({column} NOT GLOB "
+                f"'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9][0-9][0-9][0-9][0-9]')"
+            ))
+
+
+def downgrade():
+    # The normalized values are read the same way by older code
+    pass
@@ -0,0 +1,41 @@
+"""ayah full-text search index
+
+Revision ID: e3357411ac62
+Revises: 40dd4687b0dd
+Create Date: 2026-10-18 11:27:08.640395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backend.models.search import rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3357411ac62'
+down_revision = '40dd4687b0dd'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE ayah_search USING fts5("
+            "text_normalized, translation_id, translation_en, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif bind.dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE ayah_search ("
+            "ayah_id INTEGER PRIMARY KEY REFERENCES ayahs (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_ayah_search_document ON ayah_search USING GIN (document)")
+    else:
+        return
+    # Index the ayahs that are already loaded
+    rebuild_search_index(bind)
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS ayah_search")
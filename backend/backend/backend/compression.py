@@ -0,0 +1,167 @@
+"""
+Response compression tween.
+
+Negotiates ``Accept-Encoding`` for compressible responses (JSON, text):
+zstd and brotli when their modules are installed, gzip otherwise. Small
+bodies are sent as is. Bodies of public responses with an ETag (the
+corpus routes) are compressed once and kept in an LRU keyed by
+``(etag, coding)``.
+
+Settings::
+
+    compression.enabled = true
+    compression.min_size = 1024     # bytes, smaller bodies are not compressed
+    compression.cache_size = 256    # compressed bodies kept for public responses
+    compression.gzip_level = 6
+"""
+import gzip
+import threading
+from collections import OrderedDict
+
+from pyramid.settings import asbool
+from pyramid.tweens import EXCVIEW
+
+from .utils.http_cache import accepts_encoding
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_GZIP_LEVEL = 6
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def _gzip(body, level):
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def available_codings(gzip_level=DEFAULT_GZIP_LEVEL):
+    """``[(coding, compress)]`` in order of preference."""
+    codings = []
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=10)
+        codings.append(('zstd', compressor.compress))
+    if brotli is not None:
+        codings.append(('br', lambda body: brotli.compress(body, quality=5)))
+    codings.append(('gzip', lambda body: _gzip(body, gzip_level)))
+    return codings
+
+
+class CompressedBodyCache:
+    """Thread-safe LRU of compressed bodies keyed by ``(etag, coding)``."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._bodies[key] = body
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.maxsize:
+                self._bodies.popitem(last=False)
+
+    def __len__(self):
+        return len(self._bodies)
+
+
+def is_compressible(response):
+    content_type = response.content_type or ''
+    if content_type == 'text/event-stream':
+        return False
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def _add_vary(response):
+    vary = tuple(response.vary or ())
+    if 'Accept-Encoding' not in vary:
+        response.vary = vary + ('Accept-Encoding',)
+
+
+def compression_tween_factory(handler, registry):
+    settings = registry.settings or {}
+    if not asbool(settings.get('compression.enabled', True)):
+        return handler
+    min_size = int(settings.get('compression.min_size', DEFAULT_MIN_SIZE))
+    codings = available_codings(int(settings.get('compression.gzip_level', DEFAULT_GZIP_LEVEL)))
+    cache = CompressedBodyCache(int(settings.get('compression.cache_size', DEFAULT_CACHE_SIZE)))
+
+    def compression_tween(request):
+        response = handler(request)
+        compress_response(request, response, codings, min_size, cache)
+        return response
+
+    compression_tween.cache = cache
+    return compression_tween
+
+
+def compress_response(request, response, codings, min_size, cache=None):
+    """Compress ``response`` in place if it is worth it and the client allows it."""
+    if request.method == 'HEAD' or response.status_code != 200:
+        return
+    if response.content_encoding or not is_compressible(response):
+        return
+    # Streamed bodies (files, event streams) are left alone
+    if not isinstance(response.app_iter, (list, tuple)):
+        return
+    if 'no-transform' in (response.headers.get('Cache-Control') or ''):
+        return
+    if (response.content_length or 0) < min_size:
+        return
+
+    # The representation depends on Accept-Encoding from here on
+    _add_vary(response)
+    for coding, compress in codings:
+        if accepts_encoding(request, coding):
+            break
+    else:
+        return
+
+    etag = response.headers.get('ETag')
+    cacheable = (
+        cache is not None and etag and not etag.startswith('W/')
+        and 'public' in (response.headers.get('Cache-Control') or '')
+    )
+    body = cache.get((etag, coding)) if cacheable else None
+    if body is None:
+        body = compress(response.body)
+        if cacheable:
+            cache.set((etag, coding), body)
+
+    response.body = body
+    response.content_encoding = coding
+    if etag and not etag.startswith('W/'):
+        # A distinct strong validator per coding; if_none_match strips the suffix
+        response.headers['ETag'] = '"%s-%s"' % (etag.strip('"'), coding)
+
+
+def includeme(config):
+    # Above EXCVIEW so responses rendered by exception views pass through it too
+    config.add_tween('backend.compression.compression_tween_factory', over=EXCVIEW)
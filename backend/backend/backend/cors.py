@@ -22,6 +22,7 @@ def add_cors_headers(event):
         headers['Access-Control-Allow-Origin'] = origin
         headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
         headers['Access-Control-Allow-Headers'] = 'Origin, Content-Type, Accept, Authorization'
+        headers['Access-Control-Expose-Headers'] = 'ETag, X-Next-Cursor'
         headers['Access-Control-Allow-Credentials'] = 'true'
         headers['Access-Control-Max-Age'] = '86400'  # 24 hours
 
@@ -5,7 +5,8 @@ import zope.sqlalchemy
 
 # Import or define all models here to ensure they are attached to the
 # ``Base.metadata`` prior to any initialization routines.
-from .mymodel import  User, Surah, Ayah, HafalanStatusEnum, Hafalan, Reminder # flake8: noqa
+from .mymodel import  User, Surah, Ayah, HafalanStatusEnum, Hafalan, Reminder, ReminderOccurrence, SyncTombstone, UserProgress, UserSurahProgress, UserCoverage, ReviewEvent, UserDailyActivity # flake8: noqa
+from . import search # flake8: noqa (registers the full-text index DDL)
 
 # Run ``configure_mappers`` after defining all of the models to ensure
 # all relationships can be setup.
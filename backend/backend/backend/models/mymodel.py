@@ -6,13 +6,20 @@ from sqlalchemy import (
     String,
     Text,
     ForeignKey,
-    TIMESTAMP,
+    Index,
+    Date,
     Boolean,
+    Float,
+    LargeBinary,
     Enum as SQLEnum, # Alias to avoid conflict with Python's enum
+    UniqueConstraint,
+    false as sa_false,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # For server_default=func.now()
 from .meta import Base
+from .types import UTCTimestamp, utc_now
 
 # Setup passlib
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -23,7 +30,13 @@ class User(Base):
     username = Column(String(50), unique=True, nullable=False)
     email = Column(String(100), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now())
+    # Bumped on every write to the user's collections; used as ETag validators
+    hafalan_version = Column(Integer, nullable=False, default=0, server_default='0')
+    reminder_version = Column(Integer, nullable=False, default=0, server_default='0')
+    # Last sequence number handed out to the user's hafalan, reminders and
+    # tombstones (see utils/sync.py)
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')
 
     hafalan = relationship("Hafalan", back_populates="user", cascade="all, delete-orphan")
     reminders = relationship("Reminder", back_populates="user", cascade="all, delete-orphan")
@@ -67,6 +80,8 @@ class Surah(Base):
 
 class Ayah(Base):
     __tablename__ = 'ayahs'
+    # Also the upsert target of the bulk corpus loader
+    __table_args__ = (UniqueConstraint('surah_id', 'ayah_number_in_surah'),)
     id = Column(Integer, primary_key=True, index=True)
     surah_id = Column(Integer, ForeignKey('surahs.id', ondelete="CASCADE"), nullable=False, index=True)
     ayah_number_in_surah = Column(Integer, nullable=False)
@@ -95,18 +110,49 @@ class HafalanStatusEnum(enum.Enum):
 
 class Hafalan(Base):
     __tablename__ = 'hafalan'
+    __table_args__ = (
+        # "Which entries cover 2:255": surah_id = 2 AND start_ayah <= 255 AND end_ayah >= 255
+        Index('ix_hafalan_surah_range', 'surah_id', 'start_ayah', 'end_ayah'),
+        # Per-user coverage over the whole mushaf
+        Index('ix_hafalan_user_index_range', 'user_id', 'start_index', 'end_index'),
+        # Progress stats bucket finished entries by review time
+        Index('ix_hafalan_user_status_reviewed', 'user_id', 'status', 'last_reviewed_at'),
+        # List filters and sorts; the (user_id, ...) prefixes also serve
+        # plain per-user lookups, so user_id has no index of its own
+        Index('ix_hafalan_user_status_updated', 'user_id', 'status', 'updated_at'),
+        Index('ix_hafalan_user_reviewed', 'user_id', 'last_reviewed_at'),
+        Index('ix_hafalan_user_change_seq', 'user_id', 'change_seq'),
+        # Review queue: due soonest first
+        Index('ix_hafalan_user_due', 'user_id', 'due_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     surah_name = Column(String(100)) # Can be denormalized or linked to Surah model
     ayah_range = Column(String(50)) # e.g., "1-10" or "5"
+    # Parsed from surah_name/ayah_range on write; surah_id and the mushaf
+    # indexes are NULL when the surah cannot be resolved
+    surah_id = Column(Integer, ForeignKey('surahs.id', ondelete="SET NULL"), nullable=True)
+    start_ayah = Column(Integer, nullable=True)
+    end_ayah = Column(Integer, nullable=True)
+    # Same range counted from the start of the mushaf (1..6236)
+    start_index = Column(Integer, nullable=True)
+    end_index = Column(Integer, nullable=True)
     status = Column(SQLEnum(HafalanStatusEnum), default=HafalanStatusEnum.belum, nullable=False)
     catatan = Column(Text)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
-    last_reviewed_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    created_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now())
+    updated_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now(), onupdate=utc_now())
+    last_reviewed_at = Column(UTCTimestamp(), nullable=True)
     
     # Optional: Link directly to an Ayah if memorization is per specific ayah
     ayah_id = Column(Integer, ForeignKey('ayahs.id', ondelete="SET NULL"), nullable=True)
+    # Position in the user's change sequence, for delta sync
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')
+    # Spaced-repetition schedule (see utils/review.py); due_at is NULL while
+    # the entry is not being memorized yet (status belum)
+    due_at = Column(UTCTimestamp(), nullable=True)
+    review_interval = Column(Integer, nullable=False, default=0, server_default='0') # days
+    ease_factor = Column(Float, nullable=False, default=2.5, server_default='2.5')
+    review_repetitions = Column(Integer, nullable=False, default=0, server_default='0')
 
 
     user = relationship("User", back_populates="hafalan")
@@ -118,23 +164,62 @@ class Hafalan(Base):
             "user_id": self.user_id,
             "surah_name": self.surah_name,
             "ayah_range": self.ayah_range,
+            "surah_id": self.surah_id,
+            "start_ayah": self.start_ayah,
+            "end_ayah": self.end_ayah,
+            "start_index": self.start_index,
+            "end_index": self.end_index,
             "status": self.status.value if self.status else None,
             "catatan": self.catatan,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "last_reviewed_at": self.last_reviewed_at.isoformat() if self.last_reviewed_at else None,
-            "ayah_id": self.ayah_id
+            "ayah_id": self.ayah_id,
+            "due_at": self.due_at.isoformat() if self.due_at else None,
+            "review_interval": self.review_interval,
+            "ease_factor": self.ease_factor,
+            "review_repetitions": self.review_repetitions
         }
 
 class Reminder(Base):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        Index('ix_reminders_user_change_seq', 'user_id', 'change_seq'),
+        # Reminder listings: a user's (open or completed) reminders by due date
+        Index('ix_reminders_user_completed_due', 'user_id', 'is_completed', 'due_date'),
+        # Due reminders still waiting for the dispatcher, oldest first
+        Index(
+            'ix_reminders_pending_due', 'due_date',
+            postgresql_where=text("dispatch_status = 'pending' AND is_completed IS NOT TRUE"),
+            sqlite_where=text("dispatch_status = 'pending' AND is_completed IS NOT 1"),
+        ),
+        Index('ix_reminders_claim_token', 'claim_token'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     surat = Column(String(100), nullable=False) # Surah name or number
     ayat = Column(String(50), nullable=False) # Ayah range or number
-    due_date = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    due_date = Column(UTCTimestamp(), nullable=False)
     is_completed = Column(Boolean, default=False)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now())
+    # Position in the user's change sequence, for delta sync
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')
+    # Delivery by the reminder dispatcher: 'pending', 'sent' or 'failed'
+    dispatch_status = Column(String(10), nullable=False, default='pending', server_default='pending')
+    dispatch_attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    # Earliest retry after a failed delivery
+    next_attempt_at = Column(UTCTimestamp(), nullable=True)
+    # Batch that claimed the reminder, and until when the claim holds
+    claim_token = Column(String(32), nullable=True)
+    claimed_until = Column(UTCTimestamp(), nullable=True)
+    dispatched_at = Column(UTCTimestamp(), nullable=True)
+    last_error = Column(Text, nullable=True)
+    # Sinks (space-separated names) that accepted the occurrence being retried
+    delivered_sinks = Column(Text, nullable=True)
+    # RRULE subset (utils/recurrence.py); due_date is then the first occurrence
+    recurrence = Column(String(255), nullable=True)
+    # Last occurrence of a recurring reminder, NULL while it repeats forever
+    recurrence_end = Column(UTCTimestamp(), nullable=True)
 
     user = relationship("User", back_populates="reminders")
 
@@ -146,6 +231,150 @@ class Reminder(Base):
             "ayat": self.ayat,
             "due_date": self.due_date.isoformat() if self.due_date else None,
             "is_completed": self.is_completed,
+            "recurrence": self.recurrence,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
 
+
+class ReminderOccurrence(Base):
+    """Completion of one occurrence of a recurring reminder; only overrides are stored."""
+    __tablename__ = 'reminder_occurrences'
+    reminder_id = Column(Integer, ForeignKey('reminders.id', ondelete="CASCADE"), primary_key=True)
+    occurs_at = Column(UTCTimestamp(), primary_key=True)
+    is_completed = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now(), onupdate=utc_now())
+
+
+class SyncTombstone(Base):
+    """A deleted hafalan or reminder, kept so delta sync can report it."""
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (
+        Index('ix_sync_tombstones_user_change_seq', 'user_id', 'change_seq'),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    entity = Column(String(20), nullable=False) # 'hafalan' or 'reminders'
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now())
+
+    def to_dict(self):
+        return {
+            "entity": self.entity,
+            "id": self.entity_id,
+            "change_seq": self.change_seq,
+            "deleted_at": self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+class UserProgress(Base):
+    """
+    Per-user memorization totals, kept up to date by the hafalan write views
+    (see ``utils/progress.py``) so the dashboard reads a single row.
+    """
+    __tablename__ = 'user_progress'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    total_entries = Column(Integer, nullable=False, default=0, server_default='0')
+    belum_count = Column(Integer, nullable=False, default=0, server_default='0')
+    sedang_count = Column(Integer, nullable=False, default=0, server_default='0')
+    selesai_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Ayahs in finished (selesai) entries
+    ayahs_memorized = Column(Integer, nullable=False, default=0, server_default='0')
+    surahs_completed = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now(), onupdate=utc_now())
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "total_entries": self.total_entries,
+            "status_counts": {
+                "belum": self.belum_count,
+                "sedang": self.sedang_count,
+                "selesai": self.selesai_count,
+            },
+            "ayahs_memorized": self.ayahs_memorized,
+            "surahs_completed": self.surahs_completed,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class UserSurahProgress(Base):
+    """Per-user, per-surah totals; only entries with a resolved surah count."""
+    __tablename__ = 'user_surah_progress'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    surah_id = Column(Integer, ForeignKey('surahs.id', ondelete="CASCADE"), primary_key=True)
+    entries = Column(Integer, nullable=False, default=0, server_default='0')
+    selesai_entries = Column(Integer, nullable=False, default=0, server_default='0')
+    ayahs_memorized = Column(Integer, nullable=False, default=0, server_default='0')
+    # ayahs_memorized reached the surah's number_of_ayahs
+    completed = Column(Boolean, nullable=False, default=False, server_default=sa_false())
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "surah_id": self.surah_id,
+            "entries": self.entries,
+            "selesai_entries": self.selesai_entries,
+            "ayahs_memorized": self.ayahs_memorized,
+            "completed": self.completed
+        }
+
+class UserCoverage(Base):
+    """
+    Ayahs covered by the user's finished (selesai) entries as a bitmap with
+    one bit per ayah of the mushaf (see ``utils/coverage.py``).
+    """
+    __tablename__ = 'user_coverage'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    bitmap = Column(LargeBinary, nullable=False)
+    covered_ayahs = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(UTCTimestamp(), default=utc_now(), server_default=func.now(), onupdate=utc_now())
+
+class ReviewEvent(Base):
+    """
+    Append-only log of murajaah and status changes of hafalan entries.
+    Old events can be archived and pruned (``prune_backend_review_events``);
+    the daily rollups in :class:`UserDailyActivity` are kept.
+    """
+    __tablename__ = 'review_events'
+    __table_args__ = (
+        Index('ix_review_events_user_occurred', 'user_id', 'occurred_at'),
+        # Pruning by age
+        Index('ix_review_events_occurred', 'occurred_at'),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    # Kept after the entry is deleted
+    hafalan_id = Column(Integer, ForeignKey('hafalan.id', ondelete="SET NULL"), nullable=True)
+    kind = Column(String(20), nullable=False) # 'review' or 'status'
+    status = Column(SQLEnum(HafalanStatusEnum), nullable=True) # status after the event
+    quality = Column(Integer, nullable=True) # 0-5, reviews only
+    ayahs = Column(Integer, nullable=False, default=0, server_default='0')
+    occurred_at = Column(UTCTimestamp(), nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "hafalan_id": self.hafalan_id,
+            "kind": self.kind,
+            "status": self.status.value if self.status else None,
+            "quality": self.quality,
+            "ayahs": self.ayahs,
+            "occurred_at": self.occurred_at.isoformat() if self.occurred_at else None
+        }
+
+class UserDailyActivity(Base):
+    """Per-user, per-day (UTC) counts of review events, kept up to date on write."""
+    __tablename__ = 'user_daily_activity'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    events = Column(Integer, nullable=False, default=0, server_default='0')
+    reviews = Column(Integer, nullable=False, default=0, server_default='0')
+    ayahs_reviewed = Column(Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        return {
+            "date": self.day.isoformat() if self.day else None,
+            "events": self.events,
+            "reviews": self.reviews,
+            "ayahs_reviewed": self.ayahs_reviewed
+        }
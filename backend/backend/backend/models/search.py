@@ -0,0 +1,189 @@
+"""
+Full-text search index over ayah text and translations.
+
+The index lives in the ``ayah_search`` table, picked by dialect:
+
+- SQLite: an FTS5 virtual table whose rowid is the ayah id.
+- PostgreSQL: a ``tsvector`` document per ayah with a GIN index.
+
+Other dialects have no index and are searched with ``LIKE``.
+
+Arabic text is normalized (see :mod:`backend.utils.arabic`) before it is
+indexed and queries get the same treatment, so a search without harakat
+still matches the Uthmani text. The index is maintained by the ayah admin
+views and rebuilt by the bulk corpus loader.
+"""
+import re
+
+from sqlalchemy import DDL, event, or_, select, text
+import zope.sqlalchemy
+
+from ..utils.arabic import arabic_search_document, normalize_arabic
+from .meta import Base
+from .mymodel import Ayah
+
+SEARCH_DIALECTS = ('sqlite', 'postgresql')
+
+_create_sqlite = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ayah_search USING fts5("
+    "text_normalized, translation_id, translation_en, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+).execute_if(dialect='sqlite')
+
+_create_postgresql = [
+    DDL(
+        "CREATE TABLE IF NOT EXISTS ayah_search ("
+        "ayah_id INTEGER PRIMARY KEY REFERENCES ayahs (id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)"
+    ).execute_if(dialect='postgresql'),
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_ayah_search_document "
+        "ON ayah_search USING GIN (document)"
+    ).execute_if(dialect='postgresql'),
+]
+
+_drop = DDL("DROP TABLE IF EXISTS ayah_search")
+
+# The index is not a mapped table, keep it in step with create_all/drop_all
+event.listen(Base.metadata, 'after_create', _create_sqlite)
+for _ddl in _create_postgresql:
+    event.listen(Base.metadata, 'after_create', _ddl)
+event.listen(Base.metadata, 'before_drop', _drop)
+
+_UPSERT = {
+    'sqlite': text(
+        "INSERT OR REPLACE INTO ayah_search (rowid, text_normalized, translation_id, translation_en) "
+        "VALUES (:id, :text_normalized, :translation_id, :translation_en)"
+    ),
+    'postgresql': text(
+        "INSERT INTO ayah_search (ayah_id, document) VALUES (:id, "
+        "setweight(to_tsvector('simple', :text_normalized), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(:translation_id, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(:translation_en, '')), 'B')) "
+        "ON CONFLICT (ayah_id) DO UPDATE SET document = EXCLUDED.document"
+    ),
+}
+
+_DELETE = {
+    'sqlite': text("DELETE FROM ayah_search WHERE rowid = :id"),
+    'postgresql': text("DELETE FROM ayah_search WHERE ayah_id = :id"),
+}
+
+_SEARCH = {
+    # fts5's rank is bm25(); lower is better
+    'sqlite': text(
+        "SELECT rowid AS ayah_id, rank AS score FROM ayah_search "
+        "WHERE ayah_search MATCH :query ORDER BY rank, rowid LIMIT :limit OFFSET :offset"
+    ),
+    'postgresql': text(
+        "SELECT ayah_id, -ts_rank_cd(document, to_tsquery('simple', :query)) AS score "
+        "FROM ayah_search WHERE document @@ to_tsquery('simple', :query) "
+        "ORDER BY score, ayah_id LIMIT :limit OFFSET :offset"
+    ),
+}
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _document(row):
+    return {
+        'id': row['id'],
+        'text_normalized': arabic_search_document(row['text_uthmani']),
+        'translation_id': row['translation_id'],
+        'translation_en': row['translation_en'],
+    }
+
+
+def index_rows(connection, rows):
+    """(Re)index ayah rows, given as mappings with the Ayah column names."""
+    dialect_name = connection.dialect.name
+    if dialect_name not in SEARCH_DIALECTS:
+        return
+    documents = [_document(row) for row in rows]
+    if documents:
+        connection.execute(_UPSERT[dialect_name], documents)
+
+
+def unindex_ids(connection, ayah_ids):
+    dialect_name = connection.dialect.name
+    if dialect_name not in SEARCH_DIALECTS:
+        return
+    ayah_ids = [{'id': ayah_id} for ayah_id in ayah_ids]
+    if ayah_ids:
+        connection.execute(_DELETE[dialect_name], ayah_ids)
+
+
+def index_ayahs(dbsession, ayahs):
+    """Index ``Ayah`` instances after an admin write."""
+    index_rows(dbsession.connection(), [ayah.to_dict() for ayah in ayahs])
+    zope.sqlalchemy.mark_changed(dbsession)
+
+
+def unindex_ayahs(dbsession, ayah_ids):
+    unindex_ids(dbsession.connection(), ayah_ids)
+    zope.sqlalchemy.mark_changed(dbsession)
+
+
+def rebuild_search_index(connection, batch_size=1000):
+    """Rebuild the whole index from the ayahs table. Returns the row count."""
+    dialect_name = connection.dialect.name
+    if dialect_name not in SEARCH_DIALECTS:
+        return 0
+    connection.execute(text("DELETE FROM ayah_search"))
+
+    columns = [Ayah.id, Ayah.text_uthmani, Ayah.translation_id, Ayah.translation_en]
+    result = connection.execution_options(stream_results=True).execute(
+        select(*columns).order_by(Ayah.id)
+    )
+    count = 0
+    while True:
+        rows = result.mappings().fetchmany(batch_size)
+        if not rows:
+            return count
+        index_rows(connection, rows)
+        count += len(rows)
+
+
+def build_query(dialect_name, query):
+    """
+    Turn user input into an FTS query: all terms must match, the last one
+    as a prefix. Returns None when there is nothing to search for.
+    """
+    tokens = _TOKEN_RE.findall(normalize_arabic(query))
+    if not tokens:
+        return None
+    if dialect_name == 'postgresql':
+        return ' & '.join(tokens[:-1] + [f'{tokens[-1]}:*'])
+    return ' '.join([f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*'])
+
+
+def search_ayah_ids(dbsession, query, limit, offset=0):
+    """Return ``[(ayah_id, score)]`` best match first."""
+    connection = dbsession.connection()
+    dialect_name = connection.dialect.name
+    if dialect_name not in SEARCH_DIALECTS:
+        return _like_search(connection, query, limit, offset)
+    fts_query = build_query(dialect_name, query)
+    if fts_query is None:
+        return []
+    result = connection.execute(
+        _SEARCH[dialect_name], {'query': fts_query, 'limit': limit, 'offset': offset}
+    )
+    return [(row.ayah_id, row.score) for row in result]
+
+
+def _like_search(connection, query, limit, offset):
+    """
+    Fallback for dialects without an index: every term must appear in the
+    text or a translation, unranked (score 0) and in id order. Terms
+    are not normalized against the stored text, so harakat must match.
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return []
+    columns = (Ayah.text_uthmani, Ayah.translation_id, Ayah.translation_en)
+    patterns = ['%' + token.replace('_', '\\_') + '%' for token in tokens]
+    stmt = select(Ayah.id).where(
+        *[or_(*[column.ilike(pattern, escape='\\') for column in columns]) for pattern in patterns]
+    ).order_by(Ayah.id).limit(limit).offset(offset)
+    return [(ayah_id, 0.0) for ayah_id, in connection.execute(stmt)]
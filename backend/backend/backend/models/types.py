@@ -0,0 +1,59 @@
+"""
+Timestamp storage.
+
+SQLite keeps timestamps as text and compares them as strings, so every
+timestamp is written in one format, UTC as ``YYYY-MM-DD HH:MM:SS.ffffff``.
+Text in that format sorts by instant, so comparisons, ORDER BY and keyset
+seeks work on the bare columns and their indexes supply the order.
+
+Values bound from Python go through :class:`UTCTimestamp`; times taken by
+the database come from :class:`utc_now`, which the models use as the
+``default``/``onupdate`` of their timestamp columns (the ``server_default``
+only serves rows inserted by hand).
+"""
+import datetime
+
+from sqlalchemy import TIMESTAMP
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+
+class UTCTimestamp(TypeDecorator):
+    """``TIMESTAMP WITH TIME ZONE`` holding UTC; naive values are UTC already."""
+
+    impl = TIMESTAMP
+    cache_ok = True
+
+    def __init__(self):
+        super().__init__(timezone=True)
+
+    def process_bind_param(self, value, dialect):
+        if not isinstance(value, datetime.datetime):
+            return value
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        else:
+            value = value.astimezone(datetime.timezone.utc)
+        if dialect.name == 'sqlite':
+            # Written with microseconds by SQLAlchemy's SQLite DATETIME
+            value = value.replace(tzinfo=None)
+        return value
+
+
+class utc_now(FunctionElement):
+    """The current time, written like :class:`UTCTimestamp` values."""
+
+    type = UTCTimestamp()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _compile_utc_now(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utc_now, 'sqlite')
+def _compile_utc_now_sqlite(element, compiler, **kw):
+    # strftime has milliseconds; CURRENT_TIMESTAMP has none
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')"
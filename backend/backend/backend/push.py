@@ -0,0 +1,345 @@
+"""
+Push channel: reminder-due and hafalan-changed events for connected clients.
+
+Each process keeps one ``PushHub``. Clients read their user's channel,
+a short backlog of numbered events, from ``GET /users/{id}/events``
+(``views/event_views.py``) either as a ``text/event-stream`` or by long
+polling.
+
+Due reminders come from a ``TimerWheel`` holding the occurrences of the
+connected users' reminders within the next ``push.horizon`` seconds. They
+are loaded through the ``(user_id, is_completed, due_date)`` index when a
+user connects and whenever the horizon rolls forward. Every write bumps
+the user's ``hafalan_version`` or ``reminder_version``
+(``bump_collection_version``); after commit the hub compares the versions
+of the users involved, and every ``push.poll_interval`` those of all
+connected users, so writes made by other processes are seen too. A changed
+``reminder_version`` reloads the user's timers, so creating, moving,
+completing or deleting a reminder reschedules its events.
+
+The hub ticks in a background thread, started by the first reader, and
+readers block while waiting, so push is meant for ``serve_backend_gevent``,
+which enables it: monkey patched, the thread is a greenlet and every
+connection costs a greenlet instead of one of waitress' worker threads.
+Scripts bootstrapping the same ini file get no hub unless it sets
+``push.enabled``, and even then never start it.
+
+Settings::
+
+    push.enabled = false       # true is implied by serve_backend_gevent
+    push.horizon = 3600        # seconds of upcoming reminders kept in the wheel
+    push.poll_interval = 5     # seconds between version checks of connected users
+    push.heartbeat = 15        # seconds between keep-alive comments on idle streams
+    push.backlog = 100         # events kept per user for reconnecting clients
+    push.linger = 60           # seconds a channel outlives its last reader
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from pyramid.settings import asbool
+from sqlalchemy import event, or_
+
+from .models import Reminder, User
+from .utils.http_cache import CHANGED_USERS
+from .utils.recurrence import completed_occurrences, occurrence_dict, occurrences, one_shot_window, series_window
+from .utils.timer_wheel import TimerWheel
+
+log = logging.getLogger(__name__)
+
+REMINDER_DUE = 'reminder-due'
+REMINDERS_CHANGED = 'reminders-changed'
+HAFALAN_CHANGED = 'hafalan-changed'
+# Sent instead of events a reader missed; the client refetches its data
+RESYNC = 'resync'
+
+DEFAULT_HORIZON = 3600
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_BACKLOG = 100
+DEFAULT_LINGER = 60.0
+# Seconds between ticks of the hub, the resolution of reminder-due events
+TICK = 1.0
+# Clients reconnect after this many milliseconds when a stream drops
+RETRY_MS = 5000
+
+
+class PushSettings:
+    """Hub tuning, read from the ``push.*`` settings."""
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+
+        def number(name, default, kind=float):
+            return kind(settings.get(f'push.{name}', default))
+
+        self.horizon = number('horizon', DEFAULT_HORIZON)
+        self.poll_interval = number('poll_interval', DEFAULT_POLL_INTERVAL)
+        self.heartbeat = number('heartbeat', DEFAULT_HEARTBEAT)
+        self.backlog = number('backlog', DEFAULT_BACKLOG, int)
+        self.linger = number('linger', DEFAULT_LINGER)
+
+
+class Channel:
+    """A user's recent events, numbered from 1, and the readers waiting on them."""
+
+    def __init__(self, backlog=DEFAULT_BACKLOG):
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.readers = 0
+        self.idle_since = None
+        self._changed = threading.Condition()
+
+    def publish(self, name, data):
+        with self._changed:
+            self.last_id += 1
+            self.events.append({'id': self.last_id, 'event': name, 'data': data})
+            self._changed.notify_all()
+
+    def since(self, after):
+        """
+        Events after id ``after``, or None when some of them are no longer
+        kept (or ``after`` comes from another process) and the reader must
+        resync.
+        """
+        with self._changed:
+            return self._since(after)
+
+    def wait(self, after, timeout):
+        """Like ``since``, waiting up to ``timeout`` seconds for an event."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.last_id != after, timeout)
+            return self._since(after)
+
+    def _since(self, after):
+        missing = self.last_id - after
+        if missing < 0 or missing > len(self.events):
+            return None
+        return list(self.events)[len(self.events) - missing:]
+
+
+def format_event(item):
+    """One ``text/event-stream`` message."""
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+        item['id'], item['event'], json.dumps(item['data'], separators=(',', ':')),
+    ).encode('utf-8')
+
+
+class EventStream:
+    """
+    WSGI body of a ``text/event-stream`` response. The server calls
+    ``close`` when the client goes away, even if iteration never started.
+    """
+
+    def __init__(self, hub, channel, after, heartbeat=DEFAULT_HEARTBEAT):
+        self.hub = hub
+        self.channel = channel
+        self.after = after
+        self.heartbeat = heartbeat
+        self._closed = False
+
+    def __iter__(self):
+        yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+        while not self._closed:
+            events = self.channel.wait(self.after, self.heartbeat)
+            if events is None:
+                self.after = self.channel.last_id
+                yield format_event({'id': self.after, 'event': RESYNC, 'data': {}})
+            elif events:
+                self.after = events[-1]['id']
+                yield b''.join(format_event(item) for item in events)
+            else:
+                # Keeps proxies from timing out and notices dead clients
+                yield b': keep-alive\n\n'
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.hub.disconnect(self.channel)
+
+
+def _utc(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+class PushHub:
+
+    def __init__(self, session_factory, settings=None, clock=time.time):
+        self.session_factory = session_factory
+        self.settings = settings or PushSettings()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._channels = {}
+        # Users whose versions are compared on the next tick
+        self._changed = set()
+        # The rest is only used by the ticking thread
+        self._versions = {}
+        self._timers = {}
+        self._wheel = None
+        self._horizon_end = None
+        self._next_poll = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def connect(self, user_id):
+        """The channel of ``user_id``, opened for one more reader."""
+        with self._lock:
+            channel = self._channels.get(user_id)
+            if channel is None:
+                channel = self._channels[user_id] = Channel(self.settings.backlog)
+                self._changed.add(user_id)
+            channel.readers += 1
+            channel.idle_since = None
+        return channel
+
+    def disconnect(self, channel):
+        with self._lock:
+            channel.readers -= 1
+            if channel.readers == 0:
+                # Kept for push.linger so long polls and reconnects miss nothing
+                channel.idle_since = self.clock()
+
+    def publish(self, user_id, name, data):
+        channel = self._channels.get(user_id)
+        if channel is not None:
+            channel.publish(name, data)
+
+    def changed(self, user_ids):
+        """Have the versions of ``user_ids`` compared on the next tick."""
+        with self._lock:
+            self._changed.update(user_id for user_id in user_ids if user_id in self._channels)
+
+    def watch(self, session_factory):
+        """Call ``changed`` for the users whose data a session committed."""
+        def after_commit(session):
+            user_ids = session.info.pop(CHANGED_USERS, None)
+            if user_ids:
+                self.changed(user_ids)
+
+        def after_rollback(session):
+            session.info.pop(CHANGED_USERS, None)
+
+        event.listen(session_factory, 'after_commit', after_commit)
+        event.listen(session_factory, 'after_rollback', after_rollback)
+
+    def tick(self, dbsession, now=None):
+        """
+        Compare versions and (re)load timers as needed, then publish the
+        reminders that came due by ``now``.
+        """
+        now = self.clock() if now is None else now
+        if self._wheel is None:
+            self._wheel = TimerWheel(now, tick=TICK)
+        with self._lock:
+            self._drop_idle(now)
+            connected = set(self._channels)
+            roll = self._horizon_end is None or now >= self._horizon_end - self.settings.horizon / 2
+            if roll or now >= self._next_poll:
+                self._next_poll = now + self.settings.poll_interval
+                checked = connected
+            else:
+                checked = self._changed & connected
+            self._changed.clear()
+        if roll:
+            self._horizon_end = now + self.settings.horizon
+        reload = self._compare_versions(dbsession, checked)
+        self._load(dbsession, connected if roll else reload)
+
+        for key, data in self._wheel.advance(now):
+            user_id = key[0]
+            self._timers.get(user_id, set()).discard(key)
+            self.publish(user_id, REMINDER_DUE, data)
+
+    def _drop_idle(self, now):
+        for user_id, channel in list(self._channels.items()):
+            if channel.readers == 0 and channel.idle_since is not None \
+                    and now - channel.idle_since >= self.settings.linger:
+                del self._channels[user_id]
+                self._versions.pop(user_id, None)
+                self._cancel(user_id)
+
+    def _cancel(self, user_id):
+        for key in self._timers.pop(user_id, ()):
+            self._wheel.cancel(key)
+
+    def _compare_versions(self, dbsession, user_ids):
+        """Publish what changed for ``user_ids``; returns those whose timers are stale."""
+        reload = set()
+        if not user_ids:
+            return reload
+        rows = dbsession.query(User.id, User.hafalan_version, User.reminder_version).filter(
+            User.id.in_(user_ids)
+        )
+        for user_id, hafalan_version, reminder_version in rows:
+            known = self._versions.get(user_id)
+            self._versions[user_id] = (hafalan_version, reminder_version)
+            if known is None:
+                reload.add(user_id)
+                continue
+            if hafalan_version != known[0]:
+                self.publish(user_id, HAFALAN_CHANGED, {'version': hafalan_version})
+            if reminder_version != known[1]:
+                self.publish(user_id, REMINDERS_CHANGED, {'version': reminder_version})
+                reload.add(user_id)
+        return reload
+
+    def _load(self, dbsession, user_ids):
+        """Replace the timers of ``user_ids`` with their occurrences up to the horizon."""
+        if not user_ids:
+            return
+        # Occurrences up to the last tick processed have been published
+        first = _utc(self._wheel.now) + datetime.timedelta(microseconds=1)
+        last = _utc(self._horizon_end)
+        reminders = dbsession.query(Reminder).filter(
+            Reminder.user_id.in_(user_ids),
+            Reminder.is_completed.isnot(True),
+            or_(one_shot_window(first, last), series_window(first, last)),
+        ).all()
+        completed = completed_occurrences(
+            dbsession, [reminder.id for reminder in reminders if reminder.recurrence], first, last,
+        )
+        for user_id in user_ids:
+            self._cancel(user_id)
+        for reminder in reminders:
+            for moment in occurrences(reminder, first, last):
+                if (reminder.id, moment) in completed:
+                    continue
+                key = (reminder.user_id, reminder.id, moment)
+                self._wheel.schedule(key, moment.timestamp(), occurrence_dict(reminder, moment, False))
+                self._timers.setdefault(reminder.user_id, set()).add(key)
+
+    def run(self):
+        while not self._stop.is_set():
+            dbsession = self.session_factory()
+            try:
+                self.tick(dbsession)
+            except Exception:
+                log.exception('Push hub tick failed')
+            finally:
+                dbsession.close()
+            self._stop.wait(TICK)
+
+    def start(self):
+        """Start ticking in the background (once)."""
+        if self.session_factory is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='push-hub', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def includeme(config):
+    settings = config.get_settings()
+    if not asbool(settings.get('push.enabled', False)):
+        return
+    session_factory = config.registry['dbsession_factory']
+    hub = PushHub(session_factory, PushSettings(settings))
+    hub.watch(session_factory)
+    config.registry['push_hub'] = hub
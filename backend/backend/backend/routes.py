@@ -16,16 +16,43 @@ def includeme(config):
     # Hafalan routes
     # Hafalan terkait user tertentu
     config.add_route('user_hafalan_collection', f'{api_prefix}/users/{{user_id}}/hafalan')
+    config.add_route('user_hafalan_batch', f'{api_prefix}/users/{{user_id}}/hafalan:batch')
+    config.add_route('user_hafalan_stats', f'{api_prefix}/users/{{user_id}}/hafalan/stats')
+    config.add_route('user_progress', f'{api_prefix}/users/{{user_id}}/progress')
+    config.add_route('user_surah_progress', f'{api_prefix}/users/{{user_id}}/progress/surahs')
+    config.add_route('user_coverage', f'{api_prefix}/users/{{user_id}}/coverage')
+    config.add_route('user_coverage_range', f'{api_prefix}/users/{{user_id}}/coverage/range')
+    # Streaks and heatmap from the daily review activity rollups
+    config.add_route('user_activity_streak', f'{api_prefix}/users/{{user_id}}/activity/streak')
+    config.add_route('user_activity_heatmap', f'{api_prefix}/users/{{user_id}}/activity/heatmap')
+    # Spaced-repetition review (murajaah) queue
+    config.add_route('user_review_queue', f'{api_prefix}/users/{{user_id}}/review-queue')
+    # Delta sync of hafalan and reminders
+    config.add_route('user_sync', f'{api_prefix}/users/{{user_id}}/sync')
+    # Push channel: reminder-due and hafalan-changed events (SSE or long poll)
+    config.add_route('user_events', f'{api_prefix}/users/{{user_id}}/events')
+    config.add_route('user_events_token', f'{api_prefix}/users/{{user_id}}/events/token')
     # Hafalan spesifik by ID (bisa juga di-nest di bawah user jika selalu terkait)
     config.add_route('hafalan_detail', f'{api_prefix}/hafalan/{{hafalan_id}}')
+    config.add_route('hafalan_review', f'{api_prefix}/hafalan/{{hafalan_id}}/review')
       # Surah routes
     config.add_route('surahs_collection', f'{api_prefix}/surahs')
     # Fix regex pattern for surah_id_or_number (using \d+ for digits)
+    # Must come before surah_detail, which would otherwise match "autocomplete" as a name
+    config.add_route('surahs_autocomplete', f'{api_prefix}/surahs/autocomplete')
     config.add_route('surah_detail', f'{api_prefix}/surahs/{{surah_id_or_number}}')
     config.add_route('surah_ayahs_collection', f'{api_prefix}/surahs/{{surah_id_or_number}}/ayahs')    # Ayah routes
     config.add_route('ayahs_collection', f'{api_prefix}/ayahs') # General collection, can be filtered by surah_id
+    # Must come before ayah_detail, which would otherwise match "search" as an id
+    config.add_route('ayahs_search', f'{api_prefix}/ayahs/search')
     config.add_route('ayah_detail', f'{api_prefix}/ayahs/{{ayah_id}}')
 
+    # alquran.cloud-shaped corpus (surah with combined editions) for the frontend
+    config.add_route('quran_surahs', f'{api_prefix}/quran/surahs')
+    config.add_route('quran_surah_detail', f'{api_prefix}/quran/surahs/{{surah_number}}')
+
     # Reminder routes
     config.add_route('user_reminders_collection', f'{api_prefix}/users/{{user_id}}/reminders')
+    config.add_route('user_reminders_bulk', f'{api_prefix}/users/{{user_id}}/reminders:bulk')
     config.add_route('reminder_detail', f'{api_prefix}/reminders/{{reminder_id}}')
+    config.add_route('reminder_occurrences', f'{api_prefix}/reminders/{{reminder_id}}/occurrences')
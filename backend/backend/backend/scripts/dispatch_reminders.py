@@ -0,0 +1,76 @@
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from pyramid.paster import bootstrap, setup_logging
+from sqlalchemy.exc import OperationalError
+
+from ..utils.reminder_dispatch import DispatchMetrics, DispatchSettings, dispatch_once
+from ..utils.reminder_sinks import load_sinks
+
+log = logging.getLogger(__name__)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Deliver due reminders to the sinks configured in reminders.sinks. '
+                    'Any number of workers can run against the same database.'
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='Deliver everything due now, then exit instead of polling',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        help='Reminders claimed per batch (default: reminders.dispatch.batch_size)',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+    settings = DispatchSettings(env['registry'].settings)
+    if args.batch_size:
+        settings.batch_size = args.batch_size
+    sinks = load_sinks(env['registry'].settings)
+    metrics = DispatchMetrics()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    request = env['request']
+    try:
+        while not stop.is_set():
+            claimed = dispatch_once(request.tm, request.dbsession, sinks, settings, metrics)
+            # A full batch means more are probably due; otherwise wait
+            if claimed < settings.batch_size:
+                if args.once:
+                    break
+                stop.wait(settings.poll_interval)
+    except OperationalError:
+        print('''
+Pyramid is having a problem using your SQL database.  The problem
+might be caused by one of the following things:
+
+1.  You may need to initialize your database tables with `alembic`.
+    Check your README.txt for description and try to run it.
+
+2.  Your database server may not be running.  Check that the
+    database server referred to by the "sqlalchemy.url" setting in
+    your "development.ini" file is running.
+            ''')
+        return 1
+
+    print('Reminder dispatcher stopped: {}'.format(', '.join(f'{k}={v}' for k, v in metrics.to_dict().items())))
+    return 0
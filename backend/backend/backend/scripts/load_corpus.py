@@ -0,0 +1,424 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+from pyramid.paster import bootstrap, setup_logging
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.exc import OperationalError
+import zope.sqlalchemy
+
+from ..models import Surah, Ayah
+from ..models.search import rebuild_search_index
+
+SURAH_COLUMNS = [
+    'surah_number', 'name_arabic', 'name_english',
+    'english_translation', 'number_of_ayahs', 'revelation_type',
+]
+AYAH_COLUMNS = ['ayah_number_in_surah', 'text_uthmani', 'translation_id', 'translation_en']
+# Dialects with INSERT ... ON CONFLICT; others look the keys up first
+UPSERT_DIALECTS = ('postgresql', 'sqlite')
+# Columns an input file may leave out; reloading keeps their stored values
+OPTIONAL_COLUMNS = {'english_translation', 'revelation_type', 'translation_id', 'translation_en'}
+
+# alquran.cloud style keys accepted as aliases in surah files
+SURAH_KEY_ALIASES = {
+    'number': 'surah_number',
+    'name': 'name_arabic',
+    'englishName': 'name_english',
+    'englishNameTranslation': 'english_translation',
+    'numberOfAyahs': 'number_of_ayahs',
+    'revelationType': 'revelation_type',
+}
+AYAH_KEY_ALIASES = {
+    'surah': 'surah_number',
+    'sura': 'surah_number',
+    'ayah': 'ayah_number_in_surah',
+    'aya': 'ayah_number_in_surah',
+    'numberInSurah': 'ayah_number_in_surah',
+    'text': 'text_uthmani',
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class CorpusFormatError(ValueError):
+    pass
+
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.json':
+        return 'json'
+    if ext == '.txt':
+        return 'tanzil'
+    raise CorpusFormatError(f'Unsupported corpus file format: {path}')
+
+
+def _iter_records(path):
+    """
+    Stream dict records from a CSV or JSON-lines file. A JSON file holds
+    one array of records and is read whole.
+    """
+    fmt = _file_format(path)
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        elif fmt == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        elif fmt == 'json':
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise CorpusFormatError(f'{path}: expected a JSON array of records')
+            yield from records
+        else:
+            raise CorpusFormatError(f'{path}: expected a CSV, JSON or JSON-lines file')
+
+
+def iter_tanzil(path):
+    """
+    Stream ``(surah_number, ayah_number, text)`` from a tanzil.net text file.
+
+    Lines look like ``1|1|text``; blank lines and ``#`` comments are skipped.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            parts = line.split('|', 2)
+            if len(parts) != 3:
+                raise CorpusFormatError(f'{path}:{line_number}: expected "surah|ayah|text"')
+            try:
+                yield int(parts[0]), int(parts[1]), parts[2]
+            except ValueError:
+                raise CorpusFormatError(f'{path}:{line_number}: surah and ayah must be integers')
+
+
+def _normalize_keys(record, aliases):
+    return {aliases.get(key, key): value for key, value in record.items()}
+
+
+def _optional(value):
+    return value if value not in (None, '') else None
+
+
+def iter_surahs(path):
+    """Stream surah rows (dicts keyed by ``SURAH_COLUMNS``)."""
+    for record in _iter_records(path):
+        record = _normalize_keys(record, SURAH_KEY_ALIASES)
+        try:
+            yield {
+                'surah_number': int(record['surah_number']),
+                'name_arabic': record['name_arabic'],
+                'name_english': record['name_english'],
+                'english_translation': _optional(record.get('english_translation')),
+                'number_of_ayahs': int(record['number_of_ayahs']),
+                'revelation_type': _optional(record.get('revelation_type')),
+            }
+        except (KeyError, ValueError) as e:
+            raise CorpusFormatError(f'{path}: invalid surah record {record!r}: {e}')
+
+
+def iter_ayahs(path, translation_id_path=None, translation_en_path=None):
+    """
+    Stream ayah rows keyed by surah_number plus ``AYAH_COLUMNS``.
+
+    Translation files are tanzil text files read in lockstep with the ayah
+    file, so nothing is held in memory beyond the current row.
+    """
+    if _file_format(path) == 'tanzil':
+        ayahs = ({
+            'surah_number': surah_number,
+            'ayah_number_in_surah': ayah_number,
+            'text_uthmani': text,
+        } for surah_number, ayah_number, text in iter_tanzil(path))
+    else:
+        ayahs = (_normalize_keys(record, AYAH_KEY_ALIASES) for record in _iter_records(path))
+
+    translations = [
+        (column, iter_tanzil(translation_path))
+        for column, translation_path in (
+            ('translation_id', translation_id_path),
+            ('translation_en', translation_en_path),
+        )
+        if translation_path
+    ]
+
+    for record in ayahs:
+        try:
+            row = {
+                'surah_number': int(record['surah_number']),
+                'ayah_number_in_surah': int(record['ayah_number_in_surah']),
+                'text_uthmani': record['text_uthmani'],
+                'translation_id': _optional(record.get('translation_id')),
+                'translation_en': _optional(record.get('translation_en')),
+            }
+        except (KeyError, ValueError) as e:
+            raise CorpusFormatError(f'{path}: invalid ayah record {record!r}: {e}')
+
+        key = (row['surah_number'], row['ayah_number_in_surah'])
+        for column, translation in translations:
+            try:
+                surah_number, ayah_number, text = next(translation)
+            except StopIteration:
+                raise CorpusFormatError(f'{column} file ended before ayah {key[0]}:{key[1]}')
+            if (surah_number, ayah_number) != key:
+                raise CorpusFormatError(
+                    f'{column} file is out of step: got {surah_number}:{ayah_number}, expected {key[0]}:{key[1]}'
+                )
+            row[column] = text
+        yield row
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _upserter(dialect_name, table, index_elements, update_columns):
+    """
+    A function upserting a batch of rows into ``table`` on
+    ``index_elements``. Optional columns missing from the input (NULL)
+    keep the value already stored, so loading a file without translations
+    does not erase them.
+    """
+    if dialect_name not in UPSERT_DIALECTS:
+        return lambda connection, batch: _upsert_portable(
+            connection, table, index_elements, update_columns, batch
+        )
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            column: func.coalesce(stmt.excluded[column], table.c[column])
+            if column in OPTIONAL_COLUMNS else stmt.excluded[column]
+            for column in update_columns
+        },
+    )
+    return lambda connection, batch: connection.execute(stmt, batch)
+
+
+def _upsert_portable(connection, table, index_elements, update_columns, batch):
+    """
+    Fallback for dialects without ``ON CONFLICT``: the stored keys of the
+    batch are looked up, then existing rows are updated and the others
+    inserted, each with one executemany.
+    """
+    # Later rows win, as with one upsert after another
+    rows = {tuple(row[column] for column in index_elements): row for row in batch}
+    key_columns = [table.c[column] for column in index_elements]
+    stored = {
+        tuple(key) for key in connection.execute(
+            select(*key_columns).where(key_columns[0].in_({key[0] for key in rows}))
+        )
+    }
+
+    updates = [
+        {f'new_{column}': value for column, value in row.items()}
+        for key, row in rows.items() if key in stored
+    ]
+    if updates:
+        connection.execute(
+            table.update()
+            .where(*[table.c[column] == bindparam(f'new_{column}') for column in index_elements])
+            .values({
+                column: func.coalesce(bindparam(f'new_{column}'), table.c[column])
+                if column in OPTIONAL_COLUMNS else bindparam(f'new_{column}')
+                for column in update_columns
+            }),
+            updates,
+        )
+    inserts = [row for key, row in rows.items() if key not in stored]
+    if inserts:
+        connection.execute(table.insert(), inserts)
+
+
+def _csv_field(value):
+    # COPY (FORMAT csv) reads an unquoted empty field as NULL and "" as ''
+    if value is None:
+        return ''
+    if isinstance(value, int):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def csv_row(values):
+    """One line of COPY csv input; None becomes NULL."""
+    return ','.join(_csv_field(value) for value in values) + '\n'
+
+
+def _copy_ayahs_postgresql(connection, batch):
+    """Upsert a batch of ayahs through COPY into a staging table."""
+    columns = ', '.join(['surah_id'] + AYAH_COLUMNS)
+    updates = ', '.join(
+        f'{column} = COALESCE(EXCLUDED.{column}, ayahs.{column})' if column in OPTIONAL_COLUMNS
+        else f'{column} = EXCLUDED.{column}'
+        for column in AYAH_COLUMNS[1:]
+    )
+
+    buffer = io.StringIO()
+    for row in batch:
+        buffer.write(csv_row([row['surah_id']] + [row[column] for column in AYAH_COLUMNS]))
+    buffer.seek(0)
+
+    connection.exec_driver_sql(
+        'CREATE TEMP TABLE IF NOT EXISTS ayahs_staging '
+        '(LIKE ayahs INCLUDING DEFAULTS) ON COMMIT DROP'
+    )
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY ayahs_staging ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+    connection.exec_driver_sql(
+        f'INSERT INTO ayahs ({columns}) SELECT {columns} FROM ayahs_staging '
+        f'ON CONFLICT (surah_id, ayah_number_in_surah) DO UPDATE SET {updates}'
+    )
+    connection.exec_driver_sql('TRUNCATE ayahs_staging')
+
+
+def load_corpus(dbsession, surah_rows=(), ayah_rows=(), batch_size=DEFAULT_BATCH_SIZE, report=print):
+    """
+    Upsert surahs and ayahs in batches within the session's transaction.
+
+    Ayah rows reference their surah by ``surah_number``. Batches go through
+    executemany on SQLite and other dialects and COPY on PostgreSQL, and
+    the full-text search index is rebuilt once the ayahs are in. Returns
+    ``(surah_count, ayah_count)``.
+    """
+    connection = dbsession.connection()
+    dialect_name = connection.dialect.name
+
+    started = time.perf_counter()
+    surah_count = 0
+    upsert_surahs = _upserter(dialect_name, Surah.__table__, ['surah_number'], SURAH_COLUMNS[1:])
+    for batch in _batches(surah_rows, batch_size):
+        upsert_surahs(connection, batch)
+        surah_count += len(batch)
+
+    surah_ids = dict(connection.execute(select(Surah.surah_number, Surah.id)).fetchall())
+
+    ayah_count = 0
+    upsert_ayahs = _upserter(
+        dialect_name, Ayah.__table__, ['surah_id', 'ayah_number_in_surah'], AYAH_COLUMNS[1:]
+    )
+    for batch in _batches(ayah_rows, batch_size):
+        for row in batch:
+            surah_number = row.pop('surah_number')
+            try:
+                row['surah_id'] = surah_ids[surah_number]
+            except KeyError:
+                raise CorpusFormatError(f'Ayah {surah_number}:{row["ayah_number_in_surah"]} refers to an unknown surah')
+        if dialect_name == 'postgresql':
+            _copy_ayahs_postgresql(connection, batch)
+        else:
+            upsert_ayahs(connection, batch)
+        ayah_count += len(batch)
+        elapsed = time.perf_counter() - started
+        report(f'{ayah_count} ayahs loaded ({ayah_count / elapsed:.0f} rows/s)')
+
+    if ayah_count:
+        indexed = rebuild_search_index(connection, batch_size=batch_size)
+        report(f'Search index rebuilt ({indexed} ayahs)')
+
+    # Core statements bypass the unit of work; tell the transaction manager
+    # there is something to commit
+    zope.sqlalchemy.mark_changed(dbsession)
+
+    elapsed = time.perf_counter() - started
+    total = surah_count + ayah_count
+    report(
+        f'Loaded {surah_count} surahs and {ayah_count} ayahs in {elapsed:.2f}s '
+        f'({total / elapsed if elapsed else total:.0f} rows/s)'
+    )
+    return surah_count, ayah_count
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Bulk load the Quran corpus (surahs and ayahs) into the database.'
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--surahs',
+        help='Surah metadata as CSV, a JSON array or JSON lines',
+    )
+    parser.add_argument(
+        '--ayahs',
+        help='Ayahs as CSV, a JSON array, JSON lines or tanzil text (surah|ayah|text)',
+    )
+    parser.add_argument(
+        '--translation-id',
+        help='Indonesian translation as tanzil text, in the same order as --ayahs',
+    )
+    parser.add_argument(
+        '--translation-en',
+        help='English translation as tanzil text, in the same order as --ayahs',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Rows per batch (default {DEFAULT_BATCH_SIZE})',
+    )
+    args = parser.parse_args(argv[1:])
+    if not args.surahs and not args.ayahs:
+        parser.error('nothing to load: pass --surahs and/or --ayahs')
+    if (args.translation_id or args.translation_en) and not args.ayahs:
+        parser.error('translations require --ayahs')
+    return args
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+
+    surah_rows = iter_surahs(args.surahs) if args.surahs else ()
+    ayah_rows = (
+        iter_ayahs(args.ayahs, args.translation_id, args.translation_en)
+        if args.ayahs else ()
+    )
+
+    try:
+        with env['request'].tm:
+            dbsession = env['request'].dbsession
+            load_corpus(dbsession, surah_rows, ayah_rows, batch_size=args.batch_size)
+    except CorpusFormatError as e:
+        print(f'Corpus file error: {e}')
+        return 1
+    except OperationalError:
+        print('''
+Pyramid is having a problem using your SQL database.  The problem
+might be caused by one of the following things:
+
+1.  You may need to initialize your database tables with `alembic`.
+    Check your README.txt for description and try to run it.
+
+2.  Your database server may not be running.  Check that the
+    database server referred to by the "sqlalchemy.url" setting in
+    your "development.ini" file is running.
+            ''')
@@ -0,0 +1,92 @@
+import argparse
+import datetime
+import gzip
+import json
+import sys
+
+from pyramid.paster import bootstrap, setup_logging
+from sqlalchemy.exc import OperationalError
+import zope.sqlalchemy
+
+from ..utils.activity import DEFAULT_PRUNE_BATCH_SIZE, prune_events
+
+DEFAULT_RETENTION_DAYS = 365
+
+
+def open_archive(path):
+    """Append-mode JSON lines file, gzip compressed when ``path`` ends in .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'at', encoding='utf-8')
+    return open(path, 'a', encoding='utf-8')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Delete review events older than the retention period, optionally archiving them first. '
+                    'The daily activity rollups are kept.'
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--older-than-days',
+        type=int,
+        default=DEFAULT_RETENTION_DAYS,
+        help=f'Retention period in days (default {DEFAULT_RETENTION_DAYS})',
+    )
+    parser.add_argument(
+        '--archive',
+        help='Append the deleted events to this JSON lines file (.gz to compress)',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_PRUNE_BATCH_SIZE,
+        help=f'Events deleted per transaction (default {DEFAULT_PRUNE_BATCH_SIZE})',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+    before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=args.older_than_days)
+
+    archive = open_archive(args.archive) if args.archive else None
+    pruned = 0
+    try:
+        # One transaction per batch keeps locks and the archive writes short
+        while True:
+            with env['request'].tm:
+                dbsession = env['request'].dbsession
+                events = prune_events(dbsession, before, batch_size=args.batch_size)
+                if not events:
+                    break
+                if archive is not None:
+                    # Written before the commit: an event may be archived twice, never lost
+                    for event in events:
+                        archive.write(json.dumps(event) + '\n')
+                    archive.flush()
+                zope.sqlalchemy.mark_changed(dbsession)
+            pruned += len(events)
+    except OperationalError:
+        print('''
+Pyramid is having a problem using your SQL database.  The problem
+might be caused by one of the following things:
+
+1.  You may need to initialize your database tables with `alembic`.
+    Check your README.txt for description and try to run it.
+
+2.  Your database server may not be running.  Check that the
+    database server referred to by the "sqlalchemy.url" setting in
+    your "development.ini" file is running.
+            ''')
+        return 1
+    finally:
+        if archive is not None:
+            archive.close()
+
+    print(f'{pruned} review events older than {before.date().isoformat()} pruned')
+    return 0
@@ -0,0 +1,82 @@
+import argparse
+import sys
+
+from pyramid.paster import bootstrap, setup_logging
+from sqlalchemy.exc import OperationalError
+import zope.sqlalchemy
+
+from ..utils.progress import DEFAULT_BATCH_SIZE, rebuild_progress
+
+
+def format_drift(drift):
+    row = f'user {drift.user_id}' + (f' surah {drift.surah_id}' if drift.surah_id is not None else '')
+    changes = ', '.join(
+        f'{column} {stored} -> {expected}'
+        for column, (stored, expected) in drift.changes.items()
+    )
+    return f'{row}: {changes}'
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Recompute the per-user progress summaries and coverage bitmaps from the hafalan table and report drift.'
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--user',
+        type=int,
+        action='append',
+        dest='user_ids',
+        help='Only rebuild this user (repeatable)',
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Report drift without rewriting the summaries',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Users per batch (default {DEFAULT_BATCH_SIZE})',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+
+    try:
+        with env['request'].tm:
+            dbsession = env['request'].dbsession
+            drift = rebuild_progress(
+                dbsession, user_ids=args.user_ids, dry_run=args.dry_run, batch_size=args.batch_size
+            )
+            for item in drift:
+                print(format_drift(item))
+            if drift and not args.dry_run:
+                zope.sqlalchemy.mark_changed(dbsession)
+    except OperationalError:
+        print('''
+Pyramid is having a problem using your SQL database.  The problem
+might be caused by one of the following things:
+
+1.  You may need to initialize your database tables with `alembic`.
+    Check your README.txt for description and try to run it.
+
+2.  Your database server may not be running.  Check that the
+    database server referred to by the "sqlalchemy.url" setting in
+    your "development.ini" file is running.
+            ''')
+        return 1
+
+    users = len({item.user_id for item in drift})
+    action = 'found' if args.dry_run else 'fixed'
+    print(f'{len(drift)} drifted rows for {users} users {action}')
+    # Non-zero in dry runs so monitoring can alert on drift
+    return 2 if drift and args.dry_run else 0
@@ -0,0 +1,71 @@
+# Patch before anything else creates sockets, locks or threads
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import signal
+import sys
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+import plaster
+from pyramid.paster import get_appsettings, setup_logging
+
+from backend import main as make_app
+
+DEFAULT_LISTEN = '*:6543'
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Serve the app with gevent: every connection is a greenlet, so idle '
+                    'event streams (GET /users/{id}/events) do not hold worker threads.'
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., production.ini',
+    )
+    parser.add_argument(
+        '--listen',
+        help='host:port to listen on (default: listen of [server:main], else %s)' % DEFAULT_LISTEN,
+    )
+    parser.add_argument(
+        '--max-connections',
+        type=int,
+        help='Open connections served at once; further ones wait (default: unlimited)',
+    )
+    parser.add_argument(
+        '--no-push',
+        action='store_true',
+        help='Keep push.enabled from the configuration file instead of enabling the push channel',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def parse_listen(listen):
+    host, _, port = listen.strip().rpartition(':')
+    return ('' if host in ('', '*') else host.strip('[]'), int(port))
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    listen = args.listen
+    if listen is None:
+        server_settings = plaster.get_loader(args.config_uri, protocols=['wsgi']).get_settings('server:main')
+        # waitress may list several addresses; the first one is served
+        listen = (server_settings.get('listen') or DEFAULT_LISTEN).split()[0]
+    settings = get_appsettings(args.config_uri, 'main')
+    if not args.no_push:
+        # Off in the ini file, so scripts bootstrapping it get no push hub
+        settings['push.enabled'] = 'true'
+    app = make_app(settings.global_conf, **settings)
+
+    spawn = Pool(args.max_connections) if args.max_connections else 'default'
+    server = WSGIServer(parse_listen(listen), app, spawn=spawn)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        gevent.signal_handler(signum, server.stop)
+    print(f'Serving on {listen} with gevent')
+    server.serve_forever()
+    return 0
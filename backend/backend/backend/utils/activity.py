@@ -0,0 +1,173 @@
+"""
+Review history: an append-only ``review_events`` log and per-day rollups.
+
+The hafalan write views log an event for every murajaah and every status
+change; :func:`record_events` adds them together with the matching
+increments of ``user_daily_activity`` (``INSERT ... ON CONFLICT DO
+UPDATE``, or UPDATE then INSERT on other dialects) in the request's
+transaction. Streaks and the activity heatmap read only the rollups, over
+their ``(user_id, day)`` primary key. Days are UTC dates, like the
+progress stats buckets.
+
+Events older than a retention period can be archived and deleted with
+:func:`prune_events`; the rollups stay, so streaks and heatmaps keep their
+history.
+"""
+import datetime
+from collections import Counter
+
+from sqlalchemy.exc import IntegrityError
+
+from ..models import ReviewEvent, UserDailyActivity
+
+ROLLUP_COUNTERS = ('events', 'reviews', 'ayahs_reviewed')
+DEFAULT_HEATMAP_DAYS = 365
+MAX_HEATMAP_DAYS = 366
+DEFAULT_PRUNE_BATCH_SIZE = 1000
+
+
+def _entry_ayahs(hafalan):
+    if hafalan.start_ayah is None or hafalan.end_ayah is None:
+        return 0
+    return hafalan.end_ayah - hafalan.start_ayah + 1
+
+
+def review_event(hafalan, quality, occurred_at):
+    return ReviewEvent(
+        user_id=hafalan.user_id, hafalan_id=hafalan.id, kind='review', status=hafalan.status,
+        quality=quality, ayahs=_entry_ayahs(hafalan), occurred_at=occurred_at,
+    )
+
+
+def status_event(hafalan, occurred_at):
+    return ReviewEvent(
+        user_id=hafalan.user_id, hafalan_id=hafalan.id, kind='status', status=hafalan.status,
+        ayahs=_entry_ayahs(hafalan), occurred_at=occurred_at,
+    )
+
+
+def status_changed(before, after):
+    """Whether a ``(before, after)`` pair of progress contributions changed status."""
+    return after is not None and (before is None or before.status != after.status)
+
+
+def _utc_day(moment):
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.date()
+
+
+def _add_activity(dbsession, user_id, day, deltas):
+    dialect_name = dbsession.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        _add_activity_portable(dbsession, user_id, day, deltas)
+        return
+    table = UserDailyActivity.__table__
+    statement = insert(table).values(user_id=user_id, day=day, **deltas)
+    dbsession.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={column: table.c[column] + statement.excluded[column] for column in deltas},
+    ))
+
+
+def _add_activity_portable(dbsession, user_id, day, deltas):
+    """
+    Fallback for dialects without ``ON CONFLICT``: add to the day's row,
+    else insert it in a savepoint, and add again if a concurrent request
+    inserted the day first.
+    """
+    table = UserDailyActivity.__table__
+    increment = table.update().where(table.c.user_id == user_id, table.c.day == day).values(
+        {column: table.c[column] + delta for column, delta in deltas.items()}
+    )
+    if dbsession.execute(increment).rowcount:
+        return
+    try:
+        with dbsession.begin_nested():
+            dbsession.execute(table.insert().values(user_id=user_id, day=day, **deltas))
+    except IntegrityError:
+        dbsession.execute(increment)
+
+
+def record_events(dbsession, user_id, events):
+    """Log ``events`` (unsaved :class:`ReviewEvent`) and add them to the daily rollups."""
+    if not events:
+        return
+    dbsession.add_all(events)
+    days = {}
+    for event in events:
+        deltas = days.setdefault(_utc_day(event.occurred_at), Counter())
+        deltas['events'] += 1
+        if event.kind == 'review':
+            deltas['reviews'] += 1
+            deltas['ayahs_reviewed'] += event.ayahs
+    for day, deltas in sorted(days.items()):
+        _add_activity(dbsession, int(user_id), day, {column: deltas[column] for column in ROLLUP_COUNTERS})
+
+
+def activity_days(dbsession, user_id, first=None, last=None):
+    """The user's active days between ``first`` and ``last``, oldest first."""
+    query = dbsession.query(UserDailyActivity).filter(UserDailyActivity.user_id == user_id)
+    if first is not None:
+        query = query.filter(UserDailyActivity.day >= first)
+    if last is not None:
+        query = query.filter(UserDailyActivity.day <= last)
+    return query.order_by(UserDailyActivity.day).populate_existing()
+
+
+def streaks(dbsession, user_id, today):
+    """
+    Current and longest runs of consecutive active days. The current streak
+    still counts when the last active day was yesterday.
+    """
+    longest = run = 0
+    previous = None
+    for day, in activity_days(dbsession, user_id).with_entities(UserDailyActivity.day):
+        run = run + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous is not None and (today - previous).days <= 1 else 0
+    return {
+        'current_streak': current,
+        'longest_streak': longest,
+        'last_active_day': previous.isoformat() if previous else None,
+        'today': today.isoformat(),
+    }
+
+
+def heatmap(dbsession, user_id, first, last):
+    """Activity per day between ``first`` and ``last``; only active days are listed."""
+    days = [row.to_dict() for row in activity_days(dbsession, user_id, first, last)]
+    return {
+        'from': first.isoformat(),
+        'to': last.isoformat(),
+        'days': days,
+        'active_days': len(days),
+        'total_events': sum(day['events'] for day in days),
+    }
+
+
+def prune_events(dbsession, before, batch_size=DEFAULT_PRUNE_BATCH_SIZE):
+    """
+    Delete up to ``batch_size`` events that occurred before ``before``,
+    oldest first. Returns the deleted events as dicts (for archiving);
+    an empty list means nothing is left to prune.
+    """
+    events = (
+        dbsession.query(ReviewEvent)
+        .filter(ReviewEvent.occurred_at < before)
+        .order_by(ReviewEvent.occurred_at, ReviewEvent.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not events:
+        return []
+    archived = [event.to_dict() for event in events]
+    dbsession.query(ReviewEvent).filter(
+        ReviewEvent.id.in_([event.id for event in events])
+    ).delete(synchronize_session='fetch')
+    return archived
@@ -0,0 +1,55 @@
+"""
+Arabic text normalization for search and name matching.
+
+Uthmani script carries harakat, Quranic annotation marks and several
+letter variants that users do not type. Both indexed text and queries go
+through :func:`normalize_arabic` so an undiacritized query still matches.
+"""
+import re
+
+# Harakat/tashkeel, superscript alef, Quranic annotation marks and tatweel
+_DIACRITICS_RE = re.compile(
+    '['
+    '\u0610-\u061a'  # honorifics and small high marks
+    '\u064b-\u065f'  # fathatan .. wavy hamza below
+    '\u0670'          # superscript (dagger) alef
+    '\u06d6-\u06ed'  # Quranic annotation signs, small waw/ya
+    '\u08d3-\u08ff'  # extended Arabic marks
+    '\u0640'          # tatweel
+    ']'
+)
+
+_LETTER_MAP = str.maketrans({
+    '\u0622': '\u0627',  # alef with madda -> alef
+    '\u0623': '\u0627',  # alef with hamza above -> alef
+    '\u0625': '\u0627',  # alef with hamza below -> alef
+    '\u0671': '\u0627',  # alef wasla -> alef
+    '\u0649': '\u064a',  # alef maksura -> ya
+    '\u06cc': '\u064a',  # farsi ya -> ya
+    '\u0629': '\u0647',  # ta marbuta -> ha
+    '\u0624': '\u0648',  # waw with hamza -> waw
+    '\u0626': '\u064a',  # ya with hamza -> ya
+})
+
+
+def normalize_arabic(text):
+    """Strip diacritics and unify letter variants; other scripts are lowercased."""
+    if not text:
+        return ''
+    return _DIACRITICS_RE.sub('', text).translate(_LETTER_MAP).lower()
+
+
+def arabic_search_document(text):
+    """
+    Normalized text to index for search.
+
+    The superscript alef is written as a full alef in standard spelling for
+    some words (الصراط) but not others (الرحمن), so words carrying it are
+    indexed in both spellings.
+    """
+    normalized = normalize_arabic(text)
+    if '\u0670' not in text:
+        return normalized
+    with_alef = normalize_arabic(text.replace('\u0670', '\u0627'))
+    extra = [word for word in with_alef.split() if word not in normalized.split()]
+    return ' '.join([normalized] + extra)
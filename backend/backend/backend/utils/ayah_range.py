@@ -0,0 +1,59 @@
+"""
+Parsing of the free-text ``surah_name``/``ayah_range`` of hafalan entries
+into the structured columns (``surah_id``, ``start_ayah``, ``end_ayah``,
+``start_index``, ``end_index``).
+"""
+import re
+
+_RANGE_RE = re.compile(r'^\s*(\d+)\s*(?:[-–—]\s*(\d+)\s*)?$')
+
+RANGE_COLUMNS = ('surah_id', 'start_ayah', 'end_ayah', 'start_index', 'end_index')
+
+
+class AyahRangeError(ValueError):
+    pass
+
+
+def parse_ayah_range(ayah_range):
+    """Parse ``"1-10"`` or ``"5"`` into ``(start, end)``."""
+    match = _RANGE_RE.match(ayah_range or '')
+    if not match:
+        raise AyahRangeError(f'Invalid ayah_range: {ayah_range!r}. Use "start-end" or a single ayah, e.g. "1-10"')
+    start = int(match.group(1))
+    end = int(match.group(2) or start)
+    if start < 1 or start > end:
+        raise AyahRangeError(f'Invalid ayah_range: {ayah_range!r}. Start must be between 1 and the end ayah')
+    return start, end
+
+
+def range_columns(surah, ayah_offset, ayah_range):
+    """
+    Structured column values for a hafalan entry.
+
+    ``surah`` is a surah dict (or None when the name could not be resolved)
+    and ``ayah_offset`` the number of ayahs before it in the mushaf. The
+    range is always validated; with an unknown surah the surah and mushaf
+    index columns are left NULL.
+    """
+    start, end = parse_ayah_range(ayah_range)
+    if surah is None:
+        return dict(dict.fromkeys(RANGE_COLUMNS), start_ayah=start, end_ayah=end)
+    if end > surah['number_of_ayahs']:
+        raise AyahRangeError(
+            f'Invalid ayah_range: {ayah_range!r}. Surah {surah["name_english"]} '
+            f'has {surah["number_of_ayahs"]} ayahs'
+        )
+    return {
+        'surah_id': surah['id'],
+        'start_ayah': start,
+        'end_ayah': end,
+        'start_index': ayah_offset + start,
+        'end_index': ayah_offset + end,
+    }
+
+
+def resolve_range(corpus, surah_name, ayah_range):
+    """:func:`range_columns` with the surah looked up in a corpus snapshot."""
+    surah = corpus.find_surah(surah_name) if surah_name else None
+    offset = corpus.ayah_offsets.get(surah['id'], 0) if surah else 0
+    return range_columns(surah, offset, ayah_range)
@@ -0,0 +1,250 @@
+"""
+In-process cache of the Quran corpus (surahs and ayahs).
+
+The corpus is read-mostly, so it is loaded once per process and the read
+endpoints answer from memory. Committed admin writes bump a generation
+counter and the next read rebuilds the snapshot.
+"""
+import bisect
+import gzip
+import json
+import threading
+
+from pyramid.settings import asbool
+from transaction.interfaces import NoTransaction
+
+from ..models import Surah, Ayah
+from .http_cache import CORPUS_CACHE_CONTROL, accepts_encoding, conditional_response, content_etag
+from .surah_resolver import SurahResolver
+
+
+class CorpusSnapshot:
+    """
+    Immutable view of the corpus at a given generation.
+
+    The dicts held here are shared between requests and must not be mutated
+    by callers.
+    """
+
+    def __init__(self, generation, surahs, ayahs):
+        self.generation = generation
+        # Ordered by surah_number, same as list_surahs_view used to return
+        self.surahs = [surah.to_dict() for surah in surahs]
+        self.surahs_by_id = {surah['id']: surah for surah in self.surahs}
+        self.surahs_by_number = {surah['surah_number']: surah for surah in self.surahs}
+        self.resolver = SurahResolver(self.surahs)
+
+        # Ordered by (surah_id, ayah_number_in_surah); the parallel key lists
+        # let pagination bisect instead of scanning
+        self.ayahs = [ayah.to_dict() for ayah in ayahs]
+        self.ayah_keys = [(ayah['surah_id'], ayah['ayah_number_in_surah']) for ayah in self.ayahs]
+        self.ayahs_by_id = {}
+        self.ayahs_by_surah = {}
+        self.ayah_numbers_by_surah = {}
+        for ayah in self.ayahs:
+            self.ayahs_by_id[ayah['id']] = ayah
+            self.ayahs_by_surah.setdefault(ayah['surah_id'], []).append(ayah)
+            self.ayah_numbers_by_surah.setdefault(ayah['surah_id'], []).append(ayah['ayah_number_in_surah'])
+
+        # Position of each surah's first ayah in the mushaf, from the surah
+        # metadata so it holds even when only part of the corpus is loaded
+        self.ayah_offsets = {}
+        offset = 0
+        for surah in self.surahs:
+            self.ayah_offsets[surah['id']] = offset
+            offset += surah['number_of_ayahs']
+
+        self._payloads = {}
+        self._etags = {}
+        self._bodies = {}
+
+    def payload(self, key, build):
+        """Return the payload stored under ``key``, building it once per snapshot."""
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = self._payloads[key] = build()
+        return payload
+
+    def global_ayah_number(self, ayah):
+        """Number of ``ayah`` counted from the start of the mushaf (1..6236)."""
+        return self.ayah_offsets.get(ayah['surah_id'], 0) + ayah['ayah_number_in_surah']
+
+    def etag(self, key, payload):
+        """Content ETag of ``payload``, computed once per snapshot."""
+        etag = self._etags.get(key)
+        if etag is None:
+            etag = self._etags[key] = content_etag(payload)
+        return etag
+
+    def encoded(self, key, payload, compress=False):
+        """
+        JSON body of ``payload`` as bytes, encoded once per snapshot.
+
+        Returns ``(body, gzip_body)``; ``gzip_body`` is None unless
+        ``compress`` was requested.
+        """
+        bodies = self._bodies.get(key)
+        if bodies is None or (compress and bodies[1] is None):
+            # Same output as the ``json`` renderer
+            body = bodies[0] if bodies else json.dumps(payload).encode('utf-8')
+            gzip_body = gzip.compress(body, compresslevel=9, mtime=0) if compress else None
+            bodies = self._bodies[key] = (body, gzip_body)
+        return bodies
+
+    def find_surah(self, surah_id_or_number):
+        """Find a surah dict by ID, surah_number or name (see :class:`SurahResolver`)."""
+        return self.resolver.resolve(surah_id_or_number)
+
+    def surah_ayahs(self, surah_id):
+        return self.ayahs_by_surah.get(surah_id, [])
+
+    def page_ayahs(self, limit, after=None, surah_id=None, first=None, last=None):
+        """
+        Return one page of ayahs in (surah_id, ayah_number_in_surah) order.
+
+        ``after`` is the key of the last ayah of the previous page. ``first``
+        and ``last`` bound ayah numbers and only apply with ``surah_id``.
+        Returns ``(ayahs, next_key)``; ``next_key`` is None on the last page.
+        """
+        if surah_id is None:
+            items, keys = self.ayahs, self.ayah_keys
+            start = bisect.bisect_right(keys, tuple(after)) if after else 0
+            stop = len(items)
+        else:
+            items = self.ayahs_by_surah.get(surah_id, [])
+            numbers = self.ayah_numbers_by_surah.get(surah_id, [])
+            start = bisect.bisect_left(numbers, first) if first is not None else 0
+            stop = bisect.bisect_right(numbers, last) if last is not None else len(items)
+            if after:
+                after_surah_id, after_number = after
+                if after_surah_id > surah_id:
+                    start = stop
+                elif after_surah_id == surah_id:
+                    start = max(start, bisect.bisect_right(numbers, after_number))
+
+        end = min(start + limit, stop)
+        page = items[start:end] if start < end else []
+        next_key = None
+        if page and end < stop:
+            next_key = [page[-1]['surah_id'], page[-1]['ayah_number_in_surah']]
+        return page, next_key
+
+
+class CorpusCache:
+    """Read-through cache holding the current :class:`CorpusSnapshot`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._snapshot = None
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, dbsession):
+        """Return the current snapshot, loading it with ``dbsession`` if stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.generation == self._generation:
+            return snapshot
+
+        with self._lock:
+            generation = self._generation
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.generation != generation:
+                snapshot = self._load(dbsession, generation)
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Bump the generation so the next read rebuilds the snapshot."""
+        with self._lock:
+            self._generation += 1
+
+    def load(self, dbsession):
+        """A snapshot read with ``dbsession`` that is not cached."""
+        return self._load(dbsession, self._generation)
+
+    def _load(self, dbsession, generation):
+        surahs = dbsession.query(Surah).order_by(Surah.surah_number).all()
+        ayahs = dbsession.query(Ayah).order_by(Ayah.surah_id, Ayah.ayah_number_in_surah).all()
+        return CorpusSnapshot(generation, surahs, ayahs)
+
+
+# One cache per process
+corpus_cache = CorpusCache()
+
+
+# request.environ key of the snapshot of a request that wrote to the corpus
+PRIVATE_SNAPSHOT = 'backend.corpus_snapshot'
+
+
+def get_corpus(request):
+    """Return the corpus snapshot for the current request."""
+    if PRIVATE_SNAPSHOT in request.environ:
+        snapshot = request.environ[PRIVATE_SNAPSHOT]
+        if snapshot is None:
+            snapshot = request.environ[PRIVATE_SNAPSHOT] = corpus_cache.load(request.dbsession)
+        return snapshot
+    return corpus_cache.get(request.dbsession)
+
+
+def corpus_response(request, corpus, key, payload):
+    """
+    Finish a corpus read view.
+
+    Sets the ETag and Cache-Control headers and answers 304 when the client
+    copy is current. With ``corpus.preserialize`` enabled the pre-encoded
+    bytes are returned as the response body, skipping the JSON renderer;
+    ``corpus.precompress`` additionally keeps and serves a gzip copy.
+    Otherwise ``payload`` is returned for the renderer.
+    """
+    etag = corpus.etag(key, payload)
+    not_modified = conditional_response(request, etag, CORPUS_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    settings = request.registry.settings or {}
+    if not asbool(settings.get('corpus.preserialize', False)):
+        return payload
+
+    compress = asbool(settings.get('corpus.precompress', False))
+    body, gzip_body = corpus.encoded(key, payload, compress=compress)
+    response = request.response
+    response.content_type = 'application/json'
+    if gzip_body is not None:
+        response.vary = ('Accept-Encoding',)
+        if accepts_encoding(request, 'gzip'):
+            response.headers['ETag'] = f'"{etag}-gzip"'
+            response.content_encoding = 'gzip'
+            body = gzip_body
+    response.body = body
+    return response
+
+
+def invalidate_corpus(request):
+    """
+    Invalidate the corpus cache after an admin write.
+
+    Until the transaction ends the writing request reads its own snapshot,
+    which sees its uncommitted changes and is never shared. The shared
+    cache is only invalidated once the write is committed, so a rollback
+    leaves it as it was.
+    """
+    request.environ[PRIVATE_SNAPSHOT] = None
+
+    tm = getattr(request, 'tm', None)
+    if tm is None:
+        corpus_cache.invalidate()
+        return
+    try:
+        txn = tm.get()
+    except NoTransaction:
+        corpus_cache.invalidate()
+        return
+    txn.addAfterCommitHook(_invalidate_after_commit)
+
+
+def _invalidate_after_commit(status):
+    if status:
+        corpus_cache.invalidate()
@@ -0,0 +1,242 @@
+"""
+Per-user ayah coverage as a bitmap over the whole mushaf.
+
+Bit ``i - 1`` is set when ayah ``i`` (counted from the start of the
+mushaf, 1..6236, the same numbering as ``Hafalan.start_index``) lies in one
+of the user's finished (``selesai``) entries. The bitmap is stored as 780
+bytes in ``user_coverage`` and handled as a Python int, so unions,
+intersections and popcounts over any range are a few big-integer
+operations.
+
+Writes go through :func:`update_coverage`: only the bits of the changed
+ranges are recomputed, from the finished entries overlapping them, read
+over the ``(user_id, start_index, end_index)`` index. Concurrent writers of
+the same user are already serialized by the change sequence bump of
+``utils/sync.py``. Surah and juz boundary masks are built once per corpus
+snapshot.
+"""
+from sqlalchemy import and_, or_
+
+from ..models import Hafalan, HafalanStatusEnum, UserCoverage
+
+TOTAL_AYAHS = 6236
+BITMAP_BYTES = (TOTAL_AYAHS + 7) // 8
+# Merged ranges beyond this are looked up as one enclosing range
+MAX_LOOKUP_RANGES = 50
+
+# First ayah of each juz as (surah_number, ayah_number_in_surah)
+JUZ_STARTS = (
+    (1, 1), (2, 142), (2, 253), (3, 93), (4, 24), (4, 148), (5, 82), (6, 111),
+    (7, 88), (8, 41), (9, 93), (11, 6), (12, 53), (15, 1), (17, 1), (18, 75),
+    (21, 1), (23, 1), (25, 21), (27, 56), (29, 46), (33, 31), (36, 28), (39, 32),
+    (41, 47), (46, 1), (51, 31), (58, 1), (67, 1), (78, 1),
+)
+
+
+def range_mask(start, end):
+    """Bits of the mushaf indexes ``start..end`` (inclusive)."""
+    return ((1 << (end - start + 1)) - 1) << (start - 1)
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def to_bitmap(bits):
+    return bits.to_bytes(BITMAP_BYTES, 'little')
+
+
+def from_bitmap(bitmap):
+    return int.from_bytes(bitmap, 'little') if bitmap else 0
+
+
+def covered_span(status, start_index, end_index):
+    """The ``(start_index, end_index)`` an entry covers, or None."""
+    if status != HafalanStatusEnum.selesai or start_index is None or end_index is None:
+        return None
+    return start_index, end_index
+
+
+def merge_spans(spans):
+    """Sorted, non-overlapping ranges covering ``spans``."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+
+def _finished_spans(dbsession):
+    return dbsession.query(Hafalan.user_id, Hafalan.start_index, Hafalan.end_index).filter(
+        Hafalan.status == HafalanStatusEnum.selesai,
+        Hafalan.start_index.isnot(None),
+        Hafalan.end_index.isnot(None),
+    )
+
+
+def update_coverage(dbsession, user_id, spans):
+    """
+    Recompute the bits of ``spans`` (the ranges covered before and after a
+    change) of ``user_id``'s bitmap. Call after the change is flushed.
+
+    Returns how many ayahs the user's coverage gained (negative when lost).
+    """
+    spans = merge_spans(set(spans))
+    if not spans:
+        return 0
+    user_id = int(user_id)
+    touched = 0
+    for start, end in spans:
+        touched |= range_mask(start, end)
+    if len(spans) > MAX_LOOKUP_RANGES:
+        lookup = [(spans[0][0], spans[-1][1])]
+    else:
+        lookup = spans
+    fresh = 0
+    for _, start, end in _finished_spans(dbsession).filter(
+        Hafalan.user_id == user_id,
+        or_(*[and_(Hafalan.start_index <= last, Hafalan.end_index >= first) for first, last in lookup]),
+    ):
+        fresh |= range_mask(start, end)
+
+    coverage = dbsession.get(UserCoverage, user_id, populate_existing=True, with_for_update=True)
+    if coverage is None:
+        coverage = UserCoverage(user_id=user_id)
+        dbsession.add(coverage)
+    stored = from_bitmap(coverage.bitmap)
+    bits = (stored & ~touched) | (fresh & touched)
+    coverage.bitmap = to_bitmap(bits)
+    coverage.covered_ayahs = popcount(bits)
+    return popcount(bits & touched) - popcount(stored & touched)
+
+
+def get_coverage(dbsession, user_id):
+    """The user's bitmap as an int (0 when nothing was finished yet)."""
+    coverage = dbsession.get(UserCoverage, int(user_id), populate_existing=True)
+    return from_bitmap(coverage.bitmap) if coverage is not None else 0
+
+
+def rebuild_coverage(dbsession, user_ids, dry_run=False):
+    """
+    Recompute the bitmaps of ``user_ids`` from the hafalan table.
+
+    Returns ``(user_id, stored_count, expected_count)`` for every bitmap
+    that differed; unless ``dry_run`` those bitmaps are rewritten.
+    """
+    expected = dict.fromkeys(user_ids, 0)
+    for user_id, start, end in _finished_spans(dbsession).filter(Hafalan.user_id.in_(user_ids)):
+        expected[user_id] |= range_mask(start, end)
+    stored = {
+        coverage.user_id: coverage
+        for coverage in dbsession.query(UserCoverage)
+        .filter(UserCoverage.user_id.in_(user_ids))
+        .populate_existing()
+    }
+    drift = []
+    for user_id in sorted(expected):
+        coverage = stored.get(user_id)
+        have = from_bitmap(coverage.bitmap) if coverage is not None else 0
+        want = expected[user_id]
+        if have == want and (coverage is None or coverage.covered_ayahs == popcount(want)):
+            continue
+        drift.append((user_id, coverage.covered_ayahs if coverage is not None else 0, popcount(want)))
+        if dry_run:
+            continue
+        if coverage is None:
+            coverage = UserCoverage(user_id=user_id)
+            dbsession.add(coverage)
+        coverage.bitmap = to_bitmap(want)
+        coverage.covered_ayahs = popcount(want)
+    return drift
+
+
+def _percentage(part, whole):
+    return round(100 * part / whole, 2) if whole else 0.0
+
+
+def _boundaries(corpus):
+    surahs = []
+    for surah in corpus.surahs:
+        start = corpus.ayah_offsets[surah['id']] + 1
+        end = start + surah['number_of_ayahs'] - 1
+        surahs.append((surah, start, end, range_mask(start, end)))
+
+    # A juz is known when the surahs of its first ayah and of the next
+    # juz's first ayah are in the corpus
+    total = sum(surah['number_of_ayahs'] for surah in corpus.surahs)
+    starts = []
+    for surah_number, ayah in JUZ_STARTS:
+        surah = corpus.surahs_by_number.get(surah_number)
+        starts.append(corpus.ayah_offsets[surah['id']] + ayah if surah else None)
+    juz = []
+    for number, start in enumerate(starts, 1):
+        following = starts[number] if number < len(starts) else total + 1
+        if start is not None and following is not None:
+            end = following - 1
+            juz.append((number, start, end, range_mask(start, end)))
+    return {'surahs': surahs, 'juz': juz, 'total': total}
+
+
+def boundaries(corpus):
+    """Surah and juz ranges and masks of a corpus snapshot, built once."""
+    return corpus.payload('coverage-boundaries', lambda: _boundaries(corpus))
+
+
+def juz_range(corpus, number):
+    """``(start, end)`` mushaf indexes of juz ``number``, or None."""
+    for juz, start, end, _ in boundaries(corpus)['juz']:
+        if juz == number:
+            return start, end
+    return None
+
+
+def coverage_summary(bits, corpus):
+    """Overall, per-surah and per-juz coverage of ``bits``."""
+    bounds = boundaries(corpus)
+    covered = popcount(bits)
+    surahs = []
+    for surah, start, end, mask in bounds['surahs']:
+        count = popcount(bits & mask)
+        surahs.append({
+            'surah_id': surah['id'],
+            'surah_number': surah['surah_number'],
+            'name': surah['name_english'],
+            'number_of_ayahs': surah['number_of_ayahs'],
+            'covered_ayahs': count,
+            'percentage': _percentage(count, surah['number_of_ayahs']),
+        })
+    juz = []
+    for number, start, end, mask in bounds['juz']:
+        count = popcount(bits & mask)
+        juz.append({
+            'juz': number,
+            'start_index': start,
+            'end_index': end,
+            'number_of_ayahs': end - start + 1,
+            'covered_ayahs': count,
+            'percentage': _percentage(count, end - start + 1),
+        })
+    return {
+        'total_ayahs': bounds['total'],
+        'covered_ayahs': covered,
+        'percentage': _percentage(covered, bounds['total']),
+        'surahs': surahs,
+        'juz': juz,
+    }
+
+
+def range_coverage(bits, start, end):
+    """How much of the mushaf range ``start..end`` ``bits`` covers."""
+    target = range_mask(start, end)
+    covered = popcount(bits & target)
+    return {
+        'start_index': start,
+        'end_index': end,
+        'number_of_ayahs': end - start + 1,
+        'covered_ayahs': covered,
+        'percentage': _percentage(covered, end - start + 1),
+        # Ayahs memorized anywhere plus the rest of the range
+        'union_ayahs': popcount(bits | target),
+    }
@@ -0,0 +1,143 @@
+"""
+Memorization progress per week, month or year.
+
+Finished (``selesai``) entries are bucketed by ``last_reviewed_at`` in SQL
+(``date_trunc`` on PostgreSQL, ``strftime``/``date`` on SQLite) over the
+``(user_id, status, last_reviewed_at)`` index; only the bucket sums come
+back to Python, where empty buckets are filled in and the cumulative
+counts computed. Buckets are in UTC and weeks start on Monday.
+"""
+import datetime
+
+from sqlalchemy import case, distinct, func
+
+from ..models import Hafalan, HafalanStatusEnum
+
+GRANULARITIES = ('week', 'month', 'year')
+# Default window per granularity, the same as the progress chart shows
+DEFAULT_WEEKS = 8
+MAX_BUCKETS = 1000
+
+
+def floor_date(day, granularity):
+    """First day of the bucket containing ``day``."""
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + datetime.timedelta(weeks=1)
+    if granularity == 'month':
+        return day.replace(year=day.year + day.month // 12, month=day.month % 12 + 1)
+    return day.replace(year=day.year + 1)
+
+
+def bucket_expression(dialect_name, granularity, column):
+    """SQL expression for the first day of the bucket of ``column``."""
+    if dialect_name == 'postgresql':
+        return func.date(func.date_trunc(granularity, column))
+    if granularity == 'week':
+        # Next Sunday (or the same day), then back to its Monday
+        return func.date(column, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return func.strftime('%Y-%m-01', column)
+    return func.strftime('%Y-01-01', column)
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def _start_of_day(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def hafalan_stats(dbsession, user_id, granularity, first=None, last=None, today=None):
+    """
+    Progress of ``user_id`` between the dates ``first`` and ``last`` (inclusive).
+
+    Without ``last`` the window ends today; without ``first`` it starts 8
+    weeks back for weeks, at the start of the year for months and at the
+    first finished entry for years. Cumulative counts include everything
+    finished before the window.
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    last = last or today
+    ayah_count = func.coalesce(Hafalan.end_ayah - Hafalan.start_ayah + 1, 0)
+    finished = dbsession.query(Hafalan).filter(
+        Hafalan.user_id == user_id,
+        Hafalan.status == HafalanStatusEnum.selesai,
+        Hafalan.last_reviewed_at.isnot(None),
+    )
+
+    if first is None:
+        if granularity == 'week':
+            first = floor_date(last, 'week') - datetime.timedelta(weeks=DEFAULT_WEEKS - 1)
+        elif granularity == 'month':
+            first = floor_date(last, 'year')
+        else:
+            oldest = finished.with_entities(func.min(Hafalan.last_reviewed_at)).scalar()
+            first = _as_date(oldest) if oldest is not None else last
+    first = floor_date(first, granularity)
+    if first > last:
+        raise ValueError('from must not be after to')
+
+    starts = []
+    start = first
+    while start <= last:
+        starts.append(start)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f'Too many buckets, at most {MAX_BUCKETS} per request')
+        start = next_bucket(start, granularity)
+
+    window_start = _start_of_day(first)
+    window_end = _start_of_day(last + datetime.timedelta(days=1))
+    dialect_name = dbsession.get_bind().dialect.name
+    bucket = bucket_expression(dialect_name, granularity, Hafalan.last_reviewed_at).label('bucket')
+    new_by_bucket = {
+        _as_date(row.bucket): int(row.new_ayahs or 0)
+        for row in finished.with_entities(bucket, func.sum(ayah_count).label('new_ayahs'))
+        .filter(Hafalan.last_reviewed_at >= window_start, Hafalan.last_reviewed_at < window_end)
+        .group_by(bucket)
+    }
+    cumulative = int(
+        finished.with_entities(func.sum(ayah_count))
+        .filter(Hafalan.last_reviewed_at < window_start)
+        .scalar() or 0
+    )
+
+    buckets = []
+    for start in starts:
+        new_ayahs = new_by_bucket.get(start, 0)
+        cumulative += new_ayahs
+        buckets.append({
+            'start': start.isoformat(),
+            'new_ayahs': new_ayahs,
+            'cumulative_ayahs': cumulative,
+        })
+
+    # Entries of an unresolved surah are told apart by name
+    total_ayahs, resolved_surahs, unresolved_surahs = finished.with_entities(
+        func.sum(ayah_count),
+        func.count(distinct(Hafalan.surah_id)),
+        func.count(distinct(case((Hafalan.surah_id.is_(None), Hafalan.surah_name)))),
+    ).one()
+
+    return {
+        'granularity': granularity,
+        'from': first.isoformat(),
+        'to': last.isoformat(),
+        'buckets': buckets,
+        'totals': {
+            'ayahs': int(total_ayahs or 0),
+            'surahs': resolved_surahs + unresolved_surahs,
+        },
+    }
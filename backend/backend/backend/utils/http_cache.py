@@ -0,0 +1,124 @@
+"""
+HTTP validators (ETag / If-None-Match) and Cache-Control policies.
+
+Views compute a strong ETag *before* building the body, so an unchanged
+resource is answered with ``304 Not Modified`` without serializing anything.
+"""
+import hashlib
+import json
+
+from pyramid.httpexceptions import HTTPNotModified
+
+from ..models import User
+
+# The corpus rarely changes; clients may reuse it for a day and revalidate after
+CORPUS_CACHE_CONTROL = 'public, max-age=86400'
+# Per-user data must always be revalidated and never stored by shared caches
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+# Content-coded representations get their own strong ETag, e.g. "abc-gzip"
+ENCODING_ETAG_SUFFIXES = ('-gzip', '-br', '-zstd')
+
+# dbsession.info key: ids of the users whose collections this session changed
+CHANGED_USERS = 'changed_users'
+
+
+def content_etag(payload):
+    """Strong ETag for a JSON-serializable payload."""
+    body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def collection_etag(name, user_id, version, request):
+    """
+    Strong ETag for a per-user collection at a given version.
+
+    Query parameters shape the body (filters, pages), so they are part of
+    the validator.
+    """
+    etag = f'{name}-{user_id}-{version}'
+    params = sorted(request.params.items())
+    if params:
+        digest = hashlib.blake2b(json.dumps(params).encode('utf-8'), digest_size=4).hexdigest()
+        etag = f'{etag}-{digest}'
+    return etag
+
+
+def if_none_match(request, etag):
+    """Whether the client's If-None-Match header already matches ``etag``."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        # If-None-Match uses the weak comparison function
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for suffix in ENCODING_ETAG_SUFFIXES:
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+                break
+        if candidate == etag:
+            return True
+    return False
+
+
+def accepts_encoding(request, coding):
+    """Whether the Accept-Encoding header allows ``coding`` (honours q=0)."""
+    header = request.headers.get('Accept-Encoding', '')
+    wildcard = False
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name == coding:
+            return quality > 0
+        if name == '*':
+            wildcard = quality > 0
+    return wildcard
+
+
+def conditional_response(request, etag, cache_control):
+    """
+    Attach ``etag`` and ``cache_control`` to the response.
+
+    Returns an ``HTTPNotModified`` response to send back when the client's
+    copy is still current, otherwise None and the view carries on.
+    """
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': cache_control}
+    if if_none_match(request, etag):
+        return HTTPNotModified(headers=headers)
+    request.response.headers.update(headers)
+    return None
+
+
+def get_collection_version(dbsession, user_id, column):
+    """
+    Return the user's version for ``column`` or None if the user does not exist.
+
+    This doubles as the user existence check of the collection views.
+    """
+    return dbsession.query(column).filter(User.id == user_id).scalar()
+
+
+def bump_collection_version(dbsession, user_id, column):
+    """Invalidate the ETags of a user's collection after a write."""
+    dbsession.query(User).filter(User.id == user_id).update(
+        {column: column + 1}, synchronize_session=False
+    )
+    collection_changed(dbsession, user_id)
+
+
+def collection_changed(dbsession, user_id):
+    """Note that a version of ``user_id`` was bumped in this transaction."""
+    # Read after commit by the push hub (backend/push.py)
+    dbsession.info.setdefault(CHANGED_USERS, set()).add(int(user_id))
@@ -0,0 +1,83 @@
+"""
+Request-scoped loading of users and a per-process cache of known user ids.
+
+Users are loaded through the session's identity map, so however many
+times a request asks for the same user, the row is read at most once.
+
+Views that only need to know a user exists ask :func:`user_exists`. With
+``identity.user_cache_ttl`` set (seconds, 0 disables it) ids that were
+found are remembered for that long per process, so repeated writes of the
+same user skip the lookup. A user deleted by another process may be
+reported as existing for up to the TTL; the writes that follow then fail
+on the foreign key.
+"""
+import threading
+import time
+
+from ..models import User
+
+
+class UserCache:
+    """Ids of users known to exist, each remembered until its expiry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expiry = {}
+
+    def __contains__(self, user_id):
+        expiry = self._expiry.get(user_id)
+        return expiry is not None and expiry > time.monotonic()
+
+    def add(self, user_id, ttl):
+        with self._lock:
+            self._expiry[user_id] = time.monotonic() + ttl
+
+    def discard(self, user_id):
+        with self._lock:
+            self._expiry.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+
+
+# One cache per process
+user_cache = UserCache()
+
+
+def cache_ttl(request):
+    settings = getattr(request, 'registry', None) and request.registry.settings or {}
+    return float(settings.get('identity.user_cache_ttl', 0) or 0)
+
+
+def load_user(request, user_id):
+    """The :class:`User` ``user_id`` (None if missing), read once per request."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return request.dbsession.get(User, user_id)
+
+
+def user_exists(request, user_id):
+    """Whether ``user_id`` exists, from the cache or the request's users."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return False
+    ttl = cache_ttl(request)
+    if ttl and user_id in user_cache:
+        return True
+    if load_user(request, user_id) is None:
+        return False
+    if ttl:
+        user_cache.add(user_id, ttl)
+    return True
+
+
+def forget_user(user_id):
+    """Drop a deleted user from this process's cache."""
+    try:
+        user_cache.discard(int(user_id))
+    except (TypeError, ValueError):
+        pass
@@ -6,10 +6,14 @@ import os
 JWT_SECRET = os.environ.get('JWT_SECRET', 'hafalan-quran-secret-key-122140122')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = timedelta(days=1)  # Token expires after 1 day by default
+# Path tokens end up in URLs (and access logs), so they are short-lived
+PATH_TOKEN_EXPIRATION_DELTA = timedelta(minutes=5)
 
-def create_token(user_id, username, expiration=JWT_EXPIRATION_DELTA):
+def create_token(user_id, username, expiration=JWT_EXPIRATION_DELTA, path=None):
     """
-    Create a JWT token for a user
+    Create a JWT token for a user. With ``path`` the token is only accepted
+    as the ``access_token`` query parameter of that path, for clients that
+    cannot send headers (EventSource)
     """
     payload = {
         'user_id': user_id,
@@ -17,6 +21,8 @@ def create_token(user_id, username, expiration=JWT_EXPIRATION_DELTA):
         'exp': datetime.utcnow() + expiration,
         'iat': datetime.utcnow()
     }
+    if path is not None:
+        payload['path'] = path
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_token(token):
@@ -50,9 +56,18 @@ def get_user_from_request(request):
     token = get_token_from_request(request)
     if token:
         payload = decode_token(token)
-        if payload:
-            return {
-                'user_id': payload.get('user_id'),
-                'username': payload.get('username')
-            }
+        # Path tokens are not accepted as bearer tokens
+        if payload and 'path' in payload:
+            payload = None
+    else:
+        token = request.GET.get('access_token')
+        payload = decode_token(token) if token else None
+        # ...only as access_token of the path they were issued for
+        if payload and payload.get('path') != request.path:
+            payload = None
+    if payload:
+        return {
+            'user_id': payload.get('user_id'),
+            'username': payload.get('username')
+        }
     return None
@@ -0,0 +1,90 @@
+"""
+Helpers for keyset (cursor based) pagination.
+
+Cursors are opaque to clients: the sort key of the last row of a page,
+JSON encoded and base64url'd. The cursor for the next page is returned in
+the ``X-Next-Cursor`` response header so collection bodies stay plain
+JSON arrays.
+"""
+import base64
+import binascii
+import json
+
+from pyramid.httpexceptions import HTTPBadRequest
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(values):
+    """Encode a list of JSON-serializable sort key values as a cursor."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Decode a cursor produced by :func:`encode_cursor`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != length:
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {cursor}'})
+    return values
+
+
+def parse_limit(request, default, maximum):
+    """Read the ``limit`` query parameter, bounded to ``1..maximum``."""
+    limit_str = request.params.get('limit')
+    if limit_str is None or limit_str == '':
+        return default
+    try:
+        limit = int(limit_str)
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > maximum:
+        raise HTTPBadRequest(json_body={'error': f'limit must be an integer between 1 and {maximum}'})
+    return limit
+
+
+def parse_int_param(request, name, minimum=None):
+    """Read an optional integer query parameter."""
+    value_str = request.params.get(name)
+    if value_str is None or value_str == '':
+        return None
+    try:
+        value = int(value_str)
+    except ValueError:
+        raise HTTPBadRequest(json_body={'error': f'{name} must be an integer'})
+    if minimum is not None and value < minimum:
+        raise HTTPBadRequest(json_body={'error': f'{name} must be at least {minimum}'})
+    return value
+
+
+def set_next_cursor(request, values):
+    """Expose the cursor of the next page, if there is one."""
+    if values is not None:
+        request.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(values)
+
+
+def keyset_order(key, id_column, descending):
+    """
+    ORDER BY for a nullable sort ``key`` with ``id_column`` breaking ties.
+
+    NULL keys (e.g. never reviewed) come first ascending and last descending.
+    """
+    if descending:
+        return [key.desc().nulls_last(), id_column.desc()]
+    return [key.asc().nulls_first(), id_column.asc()]
+
+
+def keyset_after(key, id_column, value, last_id, descending):
+    """Rows after ``(value, last_id)`` in :func:`keyset_order` order."""
+    if descending:
+        if value is None:
+            return and_(key.is_(None), id_column < last_id)
+        return or_(key < value, and_(key == value, id_column < last_id), key.is_(None))
+    if value is None:
+        return or_(and_(key.is_(None), id_column > last_id), key.isnot(None))
+    return or_(key > value, and_(key == value, id_column > last_id))
@@ -0,0 +1,358 @@
+"""
+Incrementally maintained memorization totals (``user_progress`` and
+``user_surah_progress``).
+
+The hafalan write views take the :func:`contribution` of an entry before
+and after the change and :func:`apply_progress` adds the difference with
+``UPDATE ... SET column = column + :delta`` in the request's transaction,
+so concurrent writes for the same user add up instead of overwriting each
+other. :func:`rebuild_progress` recomputes everything with GROUP BY
+queries and reports (and fixes) the rows that drifted. The coverage
+bitmap of ``utils/coverage.py`` is maintained and rebuilt alongside.
+
+``ayahs_memorized`` counts the union of the finished ranges, so entries
+that overlap count their shared ayahs once: the user's total follows the
+popcount of the coverage bitmap, and a surah whose finished ranges change
+is recounted from its entries. Finished entries of unresolved surahs
+cannot be placed in the mushaf and add their whole range.
+"""
+from collections import Counter, namedtuple
+
+from sqlalchemy import case, exists, func, select
+from sqlalchemy.exc import IntegrityError
+
+from .coverage import covered_span, merge_spans, rebuild_coverage, update_coverage
+from ..models import Hafalan, HafalanStatusEnum, Surah, User, UserProgress, UserSurahProgress
+
+STATUS_COLUMNS = {
+    HafalanStatusEnum.belum: 'belum_count',
+    HafalanStatusEnum.sedang: 'sedang_count',
+    HafalanStatusEnum.selesai: 'selesai_count',
+}
+USER_COUNTERS = (
+    'total_entries', 'belum_count', 'sedang_count', 'selesai_count',
+    'ayahs_memorized', 'surahs_completed',
+)
+SURAH_COUNTERS = ('entries', 'selesai_entries', 'ayahs_memorized', 'completed')
+
+DEFAULT_BATCH_SIZE = 1000
+
+# ``ayahs`` counts a finished entry of an unresolved surah; ``span`` is the
+# mushaf range a resolved entry covers once it is selesai
+Contribution = namedtuple('Contribution', 'status surah_id ayahs span')
+# ``surah_id`` is None for the user row; ``changes`` maps column -> (stored, expected)
+Drift = namedtuple('Drift', 'user_id surah_id changes')
+
+
+def finished_ayahs(status, start_ayah, end_ayah):
+    """Ayahs in an entry's range once it is selesai (0 before)."""
+    if status != HafalanStatusEnum.selesai or start_ayah is None or end_ayah is None:
+        return 0
+    return end_ayah - start_ayah + 1
+
+
+def contribution(hafalan):
+    """What ``hafalan`` adds to its user's totals (None for no entry)."""
+    if hafalan is None:
+        return None
+    status = HafalanStatusEnum(hafalan.status)
+    return Contribution(
+        status,
+        hafalan.surah_id,
+        finished_ayahs(status, hafalan.start_ayah, hafalan.end_ayah) if hafalan.surah_id is None else 0,
+        covered_span(status, hafalan.start_index, hafalan.end_index),
+    )
+
+
+def _deltas(changes):
+    user = Counter()
+    surahs = {}
+    for before, after in changes:
+        for sign, part in ((-1, before), (1, after)):
+            if part is None:
+                continue
+            user['total_entries'] += sign
+            user[STATUS_COLUMNS[part.status]] += sign
+            user['ayahs_memorized'] += sign * part.ayahs
+            if part.surah_id is not None:
+                surah = surahs.setdefault(part.surah_id, Counter())
+                surah['entries'] += sign
+                surah['selesai_entries'] += sign * (part.status == HafalanStatusEnum.selesai)
+    user = {column: delta for column, delta in user.items() if delta}
+    surahs = {
+        surah_id: {column: delta for column, delta in deltas.items() if delta}
+        for surah_id, deltas in surahs.items()
+    }
+    return user, {surah_id: deltas for surah_id, deltas in surahs.items() if deltas}
+
+
+def _insert_missing(dbsession, table, **key):
+    """Create the zeroed summary row for ``key`` unless it exists."""
+    dialect_name = dbsession.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        _insert_missing_portable(dbsession, table, key)
+        return
+    dbsession.execute(insert(table).values(**key).on_conflict_do_nothing())
+
+
+def _insert_missing_portable(dbsession, table, key):
+    """
+    Fallback for dialects without ``ON CONFLICT``: look the row up, then
+    insert it in a savepoint, so losing the race to a concurrent request
+    only rolls back the savepoint.
+    """
+    where = [table.c[column] == value for column, value in key.items()]
+    if dbsession.execute(select(exists().where(*where))).scalar():
+        return
+    try:
+        with dbsession.begin_nested():
+            dbsession.execute(table.insert().values(**key))
+    except IntegrityError:
+        pass
+
+
+def _increments(model, deltas):
+    return {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()}
+
+
+def _union_size(ranges):
+    return sum(end - start + 1 for start, end in merge_spans(ranges))
+
+
+def _finished_ranges(dbsession, user_ids):
+    """``{(user_id, surah_id): [(start_ayah, end_ayah)]}`` of the finished entries of resolved surahs."""
+    ranges = {}
+    for user_id, surah_id, start, end in dbsession.query(
+        Hafalan.user_id, Hafalan.surah_id, Hafalan.start_ayah, Hafalan.end_ayah,
+    ).filter(
+        Hafalan.user_id.in_(user_ids),
+        Hafalan.status == HafalanStatusEnum.selesai,
+        Hafalan.surah_id.isnot(None),
+    ):
+        ranges.setdefault((user_id, surah_id), []).append((start, end))
+    return ranges
+
+
+def apply_progress(dbsession, user_id, before, after):
+    """
+    Move the summaries of ``user_id`` from contribution ``before`` to
+    ``after`` (either may be None for a created or deleted entry).
+    """
+    apply_progress_changes(dbsession, user_id, [(before, after)])
+
+
+def apply_progress_changes(dbsession, user_id, changes):
+    """:func:`apply_progress` for many ``(before, after)`` pairs, summed first."""
+    spans = set()
+    # Surahs whose finished ranges changed, recounted below
+    recount = set()
+    for before, after in changes:
+        before_span = before.span if before is not None else None
+        after_span = after.span if after is not None else None
+        if before_span != after_span:
+            for part in (before, after):
+                if part is not None and part.span is not None:
+                    spans.add(part.span)
+                    recount.add(part.surah_id)
+    covered = update_coverage(dbsession, user_id, spans)
+
+    user_deltas, surah_deltas = _deltas(changes)
+    if covered:
+        user_deltas['ayahs_memorized'] = user_deltas.get('ayahs_memorized', 0) + covered
+    if not user_deltas and not surah_deltas and not recount:
+        return
+
+    user_id = int(user_id)
+    _insert_missing(dbsession, UserProgress.__table__, user_id=user_id)
+    values = _increments(UserProgress, user_deltas)
+
+    surah_ids = sorted(set(surah_deltas) | recount)
+    if surah_ids:
+        ranges = _finished_ranges(dbsession, [user_id]) if recount else {}
+        for surah_id in surah_ids:
+            _insert_missing(dbsession, UserSurahProgress.__table__, user_id=user_id, surah_id=surah_id)
+            surah_values = _increments(UserSurahProgress, surah_deltas.get(surah_id, {}))
+            if surah_id in recount:
+                surah_values[UserSurahProgress.ayahs_memorized] = _union_size(ranges.get((user_id, surah_id), ()))
+            dbsession.query(UserSurahProgress).filter_by(user_id=user_id, surah_id=surah_id).update(
+                surah_values, synchronize_session=False
+            )
+        touched = dbsession.query(UserSurahProgress).filter(
+            UserSurahProgress.user_id == user_id,
+            UserSurahProgress.surah_id.in_(surah_ids),
+        )
+        touched.filter(UserSurahProgress.entries <= 0).delete(synchronize_session=False)
+        number_of_ayahs = (
+            select(Surah.number_of_ayahs)
+            .where(Surah.id == UserSurahProgress.surah_id)
+            .scalar_subquery()
+        )
+        touched.update(
+            {UserSurahProgress.completed: UserSurahProgress.ayahs_memorized >= number_of_ayahs},
+            synchronize_session=False,
+        )
+        # At most 114 rows, read through the primary key
+        values[UserProgress.surahs_completed] = (
+            select(func.count())
+            .select_from(UserSurahProgress)
+            .where(UserSurahProgress.user_id == user_id, UserSurahProgress.completed.is_(True))
+            .scalar_subquery()
+        )
+
+    dbsession.query(UserProgress).filter_by(user_id=user_id).update(values, synchronize_session=False)
+
+
+def get_progress(dbsession, user_id):
+    """The user's summary row, or None when nothing was recorded yet."""
+    # Refreshed, as the counters are changed by UPDATE statements
+    return dbsession.get(UserProgress, user_id, populate_existing=True)
+
+
+def _expected(dbsession, user_ids):
+    # Finished ranges of resolved surahs are counted as unions below
+    ayahs = case(
+        (
+            (Hafalan.status == HafalanStatusEnum.selesai) & Hafalan.surah_id.is_(None),
+            func.coalesce(Hafalan.end_ayah - Hafalan.start_ayah + 1, 0),
+        ),
+        else_=0,
+    )
+
+    def count_status(status):
+        return func.sum(case((Hafalan.status == status, 1), else_=0))
+
+    users = {}
+    for row in dbsession.query(
+        Hafalan.user_id,
+        func.count(),
+        count_status(HafalanStatusEnum.belum),
+        count_status(HafalanStatusEnum.sedang),
+        count_status(HafalanStatusEnum.selesai),
+        func.sum(ayahs),
+    ).filter(Hafalan.user_id.in_(user_ids)).group_by(Hafalan.user_id):
+        users[row[0]] = dict(zip(USER_COUNTERS, [int(value or 0) for value in row[1:]] + [0]))
+
+    ranges = _finished_ranges(dbsession, user_ids)
+    for (user_id, _), finished in ranges.items():
+        users[user_id]['ayahs_memorized'] += _union_size(finished)
+
+    surahs = {}
+    for row in dbsession.query(
+        Hafalan.user_id,
+        Hafalan.surah_id,
+        func.count(),
+        count_status(HafalanStatusEnum.selesai),
+        Surah.number_of_ayahs,
+    ).join(Surah, Surah.id == Hafalan.surah_id).filter(
+        Hafalan.user_id.in_(user_ids)
+    ).group_by(Hafalan.user_id, Hafalan.surah_id, Surah.number_of_ayahs):
+        user_id, surah_id, entries, selesai_entries, number_of_ayahs = row
+        memorized = _union_size(ranges.get((user_id, surah_id), ()))
+        completed = memorized >= number_of_ayahs
+        surahs[user_id, surah_id] = {
+            'entries': entries,
+            'selesai_entries': int(selesai_entries or 0),
+            'ayahs_memorized': memorized,
+            'completed': completed,
+        }
+        if completed:
+            users[user_id]['surahs_completed'] += 1
+    return users, surahs
+
+
+def _stored(dbsession, user_ids):
+    # Plain rows, so the rewrite below does not clash with loaded instances
+    user_columns = [getattr(UserProgress, column) for column in USER_COUNTERS]
+    surah_columns = [getattr(UserSurahProgress, column) for column in SURAH_COUNTERS]
+    users = {
+        row[0]: dict(zip(USER_COUNTERS, row[1:]))
+        for row in dbsession.query(UserProgress.user_id, *user_columns)
+        .filter(UserProgress.user_id.in_(user_ids))
+    }
+    surahs = {
+        (row[0], row[1]): dict(zip(SURAH_COUNTERS, row[2:]))
+        for row in dbsession.query(UserSurahProgress.user_id, UserSurahProgress.surah_id, *surah_columns)
+        .filter(UserSurahProgress.user_id.in_(user_ids))
+    }
+    return users, surahs
+
+
+def _compare(stored, expected, columns, key_of):
+    zeros = dict.fromkeys(columns, 0)
+    drift = []
+    for key in sorted(set(stored) | set(expected)):
+        have = stored.get(key, zeros)
+        want = expected.get(key, zeros)
+        changes = {
+            column: (have[column], want[column])
+            for column in columns
+            if have[column] != want[column]
+        }
+        if changes:
+            drift.append(Drift(*key_of(key), changes))
+    return drift
+
+
+def _user_batches(dbsession, user_ids, batch_size):
+    if user_ids is not None:
+        user_ids = sorted(set(int(user_id) for user_id in user_ids))
+        for start in range(0, len(user_ids), batch_size):
+            yield user_ids[start:start + batch_size]
+        return
+    last_id = 0
+    while True:
+        batch = [
+            user_id for user_id, in dbsession.query(User.id)
+            .filter(User.id > last_id).order_by(User.id).limit(batch_size)
+        ]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def rebuild_progress(dbsession, user_ids=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute the summaries of ``user_ids`` (all users by default) from the
+    hafalan table, ``batch_size`` users at a time.
+
+    Returns the list of :class:`Drift` found; unless ``dry_run`` the
+    summaries of the drifted users are rewritten.
+    """
+    drift = []
+    for batch in _user_batches(dbsession, user_ids, batch_size):
+        expected_users, expected_surahs = _expected(dbsession, batch)
+        stored_users, stored_surahs = _stored(dbsession, batch)
+        batch_drift = (
+            _compare(stored_users, expected_users, USER_COUNTERS, lambda user_id: (user_id, None))
+            + _compare(stored_surahs, expected_surahs, SURAH_COUNTERS, lambda key: key)
+        )
+        drift.extend(batch_drift)
+        drift.extend(
+            Drift(user_id, None, {'covered_ayahs': (stored, expected)})
+            for user_id, stored, expected in rebuild_coverage(dbsession, batch, dry_run=dry_run)
+        )
+        if dry_run or not batch_drift:
+            continue
+
+        drifted = sorted({item.user_id for item in batch_drift})
+        dbsession.query(UserSurahProgress).filter(
+            UserSurahProgress.user_id.in_(drifted)
+        ).delete(synchronize_session='fetch')
+        dbsession.query(UserProgress).filter(
+            UserProgress.user_id.in_(drifted)
+        ).delete(synchronize_session='fetch')
+        dbsession.add_all(
+            UserProgress(user_id=user_id, **expected_users[user_id])
+            for user_id in drifted if user_id in expected_users
+        )
+        dbsession.add_all(
+            UserSurahProgress(user_id=user_id, surah_id=surah_id, **values)
+            for (user_id, surah_id), values in expected_surahs.items() if user_id in drifted
+        )
+        dbsession.flush()
+    return drift
@@ -0,0 +1,72 @@
+"""
+Field projection for collection endpoints (``?fields=id,surah_name``).
+
+Requested fields are selected as columns, so unrequested ones (the ayah
+text columns, hafalan notes) are never read from the database. Projected
+values are formatted the same way the models' ``to_dict`` formats them.
+"""
+import datetime
+import enum
+import functools
+
+from pyramid.httpexceptions import HTTPBadRequest
+
+
+@functools.lru_cache(maxsize=None)
+def projectable_fields(model):
+    """
+    Fields a client may request: the keys of ``to_dict`` that are columns,
+    in ``to_dict`` order.
+    """
+    columns = model.__mapper__.column_attrs.keys()
+    return tuple(field for field in model().to_dict() if field in columns)
+
+
+def parse_fields(request, model):
+    """
+    Read the ``fields`` query parameter.
+
+    Returns None when it is absent (full representation), otherwise the
+    requested fields in ``to_dict`` order so equivalent requests share a
+    representation.
+    """
+    fields_str = request.params.get('fields')
+    if fields_str is None or not fields_str.strip():
+        return None
+    requested = {field.strip() for field in fields_str.split(',') if field.strip()}
+    allowed = projectable_fields(model)
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise HTTPBadRequest(json_body={
+            'error': f'Unknown fields: {", ".join(unknown)}. Valid fields are: {", ".join(allowed)}'
+        })
+    return tuple(field for field in allowed if field in requested)
+
+
+def query_fields(dbsession, model, fields):
+    """Query ``model`` instances, or only the ``fields`` columns when given."""
+    if fields is None:
+        return dbsession.query(model)
+    return dbsession.query(*[getattr(model, field) for field in fields])
+
+
+def _format(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def serialize(results, fields):
+    """Dicts for the results of :func:`query_fields`."""
+    if fields is None:
+        return [item.to_dict() for item in results]
+    return [{field: _format(value) for field, value in zip(fields, row)} for row in results]
+
+
+def project(items, fields):
+    """Project already serialized dicts (e.g. from the corpus cache)."""
+    if fields is None:
+        return items
+    return [{field: item[field] for field in fields} for item in items]
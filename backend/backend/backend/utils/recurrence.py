@@ -0,0 +1,231 @@
+"""
+Recurring reminders: a subset of iCalendar RRULE, expanded on demand.
+
+A recurring reminder is one row whose ``due_date`` is the first occurrence
+and whose ``recurrence`` is a rule such as ``FREQ=WEEKLY;INTERVAL=2;COUNT=10``.
+Supported parts are ``FREQ`` (``DAILY`` or ``WEEKLY``), ``INTERVAL``, and
+at most one of ``COUNT`` and ``UNTIL``. Occurrences are evenly spaced in
+UTC, so the n-th one is computed directly; expanding a window costs only
+the occurrences inside it, whatever the age of the series.
+
+Occurrences are never stored. Completing a single occurrence adds a row
+to ``reminder_occurrences``, so the table grows with the schedules and
+the overrides users actually made, not with calendar time.
+"""
+import datetime
+
+from sqlalchemy import and_, or_
+
+from ..models import Reminder, ReminderOccurrence
+
+FREQUENCIES = {'DAILY': 1, 'WEEKLY': 7}
+# A rule may produce at most this many occurrences in one listed window
+MAX_WINDOW_OCCURRENCES = 1000
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+def as_utc(moment):
+    """``moment`` as an aware UTC datetime; naive values are UTC already."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
+
+
+def _parse_until(value):
+    try:
+        if 'T' in value and '-' not in value:
+            # iCalendar basic format, e.g. 20261231T235959Z
+            return as_utc(datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S'))
+        return as_utc(datetime.datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value))
+    except ValueError:
+        raise RecurrenceError(f'Invalid UNTIL: {value}')
+
+
+class Rule:
+    def __init__(self, freq, interval=1, count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        """Parse an RRULE (with or without the ``RRULE:`` prefix)."""
+        if not isinstance(text, str) or not text.strip():
+            raise RecurrenceError('recurrence must be an RRULE string, e.g. "FREQ=WEEKLY"')
+        text = text.strip()
+        if text.upper().startswith('RRULE:'):
+            text = text[len('RRULE:'):]
+        parts = {}
+        for part in text.split(';'):
+            name, sep, value = part.partition('=')
+            name = name.strip().upper()
+            if not sep or not name or name in parts:
+                raise RecurrenceError(f'Invalid recurrence: {text}')
+            parts[name] = value.strip()
+
+        unsupported = sorted(set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL'})
+        if unsupported:
+            raise RecurrenceError(f'Unsupported recurrence parts: {", ".join(unsupported)}')
+        freq = parts.get('FREQ', '').upper()
+        if freq not in FREQUENCIES:
+            raise RecurrenceError(f'FREQ must be one of: {", ".join(FREQUENCIES)}')
+        if 'COUNT' in parts and 'UNTIL' in parts:
+            raise RecurrenceError('Use COUNT or UNTIL, not both')
+
+        def positive(name):
+            value = parts[name]
+            if not value.isdigit() or int(value) < 1:
+                raise RecurrenceError(f'{name} must be a positive integer')
+            return int(value)
+
+        return cls(
+            freq,
+            interval=positive('INTERVAL') if 'INTERVAL' in parts else 1,
+            count=positive('COUNT') if 'COUNT' in parts else None,
+            until=_parse_until(parts['UNTIL']) if 'UNTIL' in parts else None,
+        )
+
+    @property
+    def step(self):
+        return datetime.timedelta(days=FREQUENCIES[self.freq] * self.interval)
+
+    def __str__(self):
+        text = f'FREQ={self.freq}'
+        if self.interval != 1:
+            text += f';INTERVAL={self.interval}'
+        if self.count is not None:
+            text += f';COUNT={self.count}'
+        if self.until is not None:
+            text += f';UNTIL={self.until.strftime("%Y%m%dT%H%M%SZ")}'
+        return text
+
+    def _last_index(self, start):
+        """Index of the last occurrence, or None for an endless series."""
+        if self.count is not None:
+            return self.count - 1
+        if self.until is not None:
+            return (self.until - start) // self.step
+        return None
+
+    def last(self, start):
+        """The last occurrence of a series starting at ``start`` (None if endless)."""
+        start = as_utc(start)
+        last = self._last_index(start)
+        if last is None:
+            return None
+        return start + max(last, 0) * self.step
+
+    def between(self, start, first, last):
+        """Occurrences of the series starting at ``start`` within ``first..last``."""
+        start, first, last = as_utc(start), as_utc(first), as_utc(last)
+        periods, rest = divmod(first - start, self.step)
+        index = max(0, periods + (1 if rest else 0))
+        final = self._last_index(start)
+        moments = []
+        while final is None or index <= final:
+            moment = start + index * self.step
+            if moment > last or len(moments) >= MAX_WINDOW_OCCURRENCES:
+                break
+            moments.append(moment)
+            index += 1
+        return moments
+
+    def latest(self, start, moment):
+        """The last occurrence at or before ``moment``, or None."""
+        start, moment = as_utc(start), as_utc(moment)
+        if moment < start:
+            return None
+        index = (moment - start) // self.step
+        final = self._last_index(start)
+        if final is not None:
+            index = min(index, final)
+        return start + index * self.step if index >= 0 else None
+
+    def following(self, start, moment):
+        """The first occurrence after ``moment``, or None when the series ended."""
+        start, moment = as_utc(start), as_utc(moment)
+        index = 0 if moment < start else (moment - start) // self.step + 1
+        final = self._last_index(start)
+        if final is not None and index > final:
+            return None
+        return start + index * self.step
+
+
+def reminder_rule(reminder):
+    return Rule.parse(reminder.recurrence) if reminder.recurrence else None
+
+
+def occurrences(reminder, first, last):
+    """Due times of ``reminder`` within ``first..last``: one for one-shot reminders."""
+    rule = reminder_rule(reminder)
+    if rule is None:
+        due = as_utc(reminder.due_date)
+        return [due] if as_utc(first) <= due <= as_utc(last) else []
+    return rule.between(reminder.due_date, first, last)
+
+
+def set_recurrence(reminder, text):
+    """
+    Set (or with an empty ``text``, clear) the rule of ``reminder`` and its
+    ``recurrence_end``. Call again whenever ``due_date`` changes.
+    """
+    if not text:
+        reminder.recurrence = None
+        reminder.recurrence_end = None
+        return
+    rule = Rule.parse(text)
+    if rule.until is not None and rule.until < as_utc(reminder.due_date):
+        raise RecurrenceError('UNTIL must not be before due_date')
+    reminder.recurrence = str(rule)
+    reminder.recurrence_end = rule.last(reminder.due_date)
+
+
+def one_shot_window(first, last):
+    """One-shot reminders due within ``first..last``."""
+    return and_(
+        Reminder.recurrence.is_(None),
+        Reminder.due_date >= first,
+        Reminder.due_date <= last,
+    )
+
+
+def series_window(first, last):
+    """Recurring reminders that may have an occurrence within ``first..last``."""
+    return and_(
+        Reminder.recurrence.isnot(None),
+        Reminder.due_date <= last,
+        or_(Reminder.recurrence_end.is_(None), Reminder.recurrence_end >= first),
+    )
+
+
+def completed_occurrences(dbsession, reminder_ids, first, last):
+    """``(reminder_id, occurs_at)`` of the occurrences completed within ``first..last``."""
+    if not reminder_ids:
+        return set()
+    rows = dbsession.query(ReminderOccurrence.reminder_id, ReminderOccurrence.occurs_at).filter(
+        ReminderOccurrence.reminder_id.in_(reminder_ids),
+        ReminderOccurrence.is_completed.is_(True),
+        ReminderOccurrence.occurs_at >= first,
+        ReminderOccurrence.occurs_at <= last,
+    )
+    return {(reminder_id, as_utc(moment)) for reminder_id, moment in rows}
+
+
+def occurrence_dict(reminder, moment, completed):
+    return dict(reminder.to_dict(), due_date=moment.isoformat(), is_completed=bool(reminder.is_completed or completed))
+
+
+def expand(dbsession, reminders, first, last):
+    """Every occurrence of ``reminders`` within ``first..last`` as dicts, soonest first."""
+    recurring = [reminder.id for reminder in reminders if reminder.recurrence]
+    completed = completed_occurrences(dbsession, recurring, first, last)
+    result = []
+    for reminder in reminders:
+        for moment in occurrences(reminder, first, last):
+            result.append(occurrence_dict(reminder, moment, (reminder.id, moment) in completed))
+    result.sort(key=lambda item: (item['due_date'], item['id']))
+    return result
@@ -0,0 +1,313 @@
+"""
+Delivery of due reminders by background dispatcher workers.
+
+A worker repeatedly claims a batch of due, uncompleted reminders, hands
+them to its sinks (``utils/reminder_sinks.py``) outside any transaction,
+then records the outcome. Claiming is one short transaction: the batch is
+stamped with a random ``claim_token`` and a lease (``claimed_until``), so
+other workers skip it until the lease runs out. On PostgreSQL the rows are
+picked with ``FOR UPDATE SKIP LOCKED``, so concurrent workers never wait on
+each other; on SQLite the claiming ``UPDATE`` is atomic on its own since
+writers are serialized.
+
+Outcomes are only recorded while the claim is still held. A worker that
+dies mid-batch leaves its reminders to be claimed again once the lease
+expires, so delivery is at least once; keep the lease well above the
+sinks' timeouts. Failed deliveries are retried with exponential backoff up
+to ``max_attempts``, then marked ``failed``. A retry only goes to the sinks
+that have not accepted the reminder yet (``delivered_sinks``), so one
+failing sink does not make the others deliver it again.
+
+A recurring reminder stays ``pending`` across its series: each delivery
+sends the latest occurrence due (missed ones are not sent one by one) and
+sets ``next_attempt_at`` to the following occurrence.
+"""
+import datetime
+import logging
+import time
+import uuid
+
+from sqlalchemy import and_, or_, select
+
+from .recurrence import as_utc, completed_occurrences, occurrence_dict, reminder_rule
+from ..models import Reminder, User
+
+log = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 60
+DEFAULT_MAX_BACKOFF_SECONDS = 3600
+
+
+class DispatchSettings:
+    """Worker tuning, read from the ``reminders.dispatch.*`` settings."""
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+
+        def number(name, default, kind=int):
+            return kind(settings.get(f'reminders.dispatch.{name}', default))
+
+        self.batch_size = number('batch_size', DEFAULT_BATCH_SIZE)
+        self.poll_interval = number('poll_interval', DEFAULT_POLL_INTERVAL, float)
+        self.lease = datetime.timedelta(seconds=number('lease_seconds', DEFAULT_LEASE_SECONDS))
+        self.max_attempts = number('max_attempts', DEFAULT_MAX_ATTEMPTS)
+        self.backoff_seconds = number('backoff_seconds', DEFAULT_BACKOFF_SECONDS)
+        self.max_backoff_seconds = number('max_backoff_seconds', DEFAULT_MAX_BACKOFF_SECONDS)
+
+    def backoff(self, attempts):
+        """Delay before retrying a reminder that failed ``attempts`` times."""
+        seconds = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+        return datetime.timedelta(seconds=seconds)
+
+
+class DispatchMetrics:
+    """Counters of one worker, with its overall delivery rate."""
+
+    COUNTERS = ('batches', 'claimed', 'sent', 'skipped', 'retried', 'failed', 'lost')
+
+    def __init__(self):
+        self.started = time.monotonic()
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def add(self, outcome):
+        self.batches += 1
+        for name in self.COUNTERS[1:]:
+            setattr(self, name, getattr(self, name) + outcome.get(name, 0))
+
+    def rate(self):
+        """Reminders sent per second since the worker started."""
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result['sent_per_second'] = round(self.rate(), 2)
+        return result
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+# Dispatch state of a reminder that was never delivered
+DISPATCH_RESET = {
+    'dispatch_status': PENDING,
+    'dispatch_attempts': 0,
+    'next_attempt_at': None,
+    'claim_token': None,
+    'claimed_until': None,
+    'dispatched_at': None,
+    'last_error': None,
+    'delivered_sinks': None,
+}
+
+
+def reset_dispatch(reminder):
+    """Make ``reminder`` deliverable again, e.g. after its due date moved."""
+    for column, value in DISPATCH_RESET.items():
+        setattr(reminder, column, value)
+
+
+def delivered_sinks(reminder):
+    """Names of the sinks that already accepted ``reminder``'s current delivery."""
+    return set((reminder.delivered_sinks or '').split())
+
+
+def due_filter(now):
+    """Reminders ready for delivery at ``now`` and not claimed by anyone."""
+    return and_(
+        Reminder.dispatch_status == PENDING,
+        Reminder.is_completed.isnot(True),
+        Reminder.due_date <= now,
+        or_(Reminder.next_attempt_at.is_(None), Reminder.next_attempt_at <= now),
+        or_(Reminder.claimed_until.is_(None), Reminder.claimed_until < now),
+    )
+
+
+def claim_batch(dbsession, batch_size, lease, now=None):
+    """
+    Claim up to ``batch_size`` due reminders for ``lease`` (a timedelta).
+    Returns ``(claim_token, reminders)``, oldest due first; commit right
+    after so other workers see the claim.
+    """
+    now = now or utcnow()
+    dialect_name = dbsession.get_bind().dialect.name
+    token = uuid.uuid4().hex
+    candidates = (
+        select(Reminder.id)
+        .where(due_filter(now))
+        .order_by(Reminder.due_date, Reminder.id)
+        .limit(batch_size)
+    )
+    if dialect_name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+    dbsession.query(Reminder).filter(Reminder.id.in_(candidates.scalar_subquery())).update(
+        {Reminder.claim_token: token, Reminder.claimed_until: now + lease},
+        synchronize_session=False,
+    )
+    reminders = (
+        dbsession.query(Reminder)
+        .filter(Reminder.claim_token == token)
+        .order_by(Reminder.due_date, Reminder.id)
+        .populate_existing()
+        .all()
+    )
+    return token, reminders
+
+
+def notifications(dbsession, reminders, now=None):
+    """
+    What the sinks deliver: each reminder's current occurrence with its
+    user's contact details. ``completed`` marks occurrences the user
+    already completed, which need no delivery.
+    """
+    now = now or utcnow()
+    users = {
+        user.id: user
+        for user in dbsession.query(User).filter(User.id.in_({reminder.user_id for reminder in reminders}))
+    }
+    moments = {}
+    for reminder in reminders:
+        rule = reminder_rule(reminder)
+        moments[reminder.id] = rule.latest(reminder.due_date, now) if rule else as_utc(reminder.due_date)
+    recurring = [reminder.id for reminder in reminders if reminder.recurrence]
+    completed = completed_occurrences(
+        dbsession, recurring, min(moments.values(), default=now), max(moments.values(), default=now),
+    )
+    result = []
+    for reminder in reminders:
+        user = users.get(reminder.user_id)
+        moment = moments[reminder.id]
+        result.append({
+            'reminder': occurrence_dict(reminder, moment, False) if reminder.recurrence else reminder.to_dict(),
+            'occurs_at': moment.isoformat(),
+            'user': {'id': user.id, 'username': user.username, 'email': user.email} if user else None,
+            'attempt': reminder.dispatch_attempts + 1,
+            'completed': (reminder.id, moment) in completed,
+        })
+    return result
+
+
+def _advance(reminder, now):
+    """
+    Move a recurring reminder on to its next occurrence after ``now``.
+    Returns False for one-shot reminders and series that have ended.
+    """
+    rule = reminder_rule(reminder)
+    following = rule.following(reminder.due_date, now) if rule else None
+    if following is None:
+        return False
+    reminder.dispatch_status = PENDING
+    reminder.dispatch_attempts = 0
+    reminder.next_attempt_at = following
+    reminder.delivered_sinks = None
+    return True
+
+
+def finish_batch(dbsession, token, errors, settings, now=None, delivered=None):
+    """
+    Record the outcome of a claimed batch. ``errors`` maps each delivered
+    reminder id to None (sent) or an error message, and ``delivered`` the
+    ids of reminders to retry to the sinks that accepted them. Recurring
+    reminders then wait for their next occurrence. Reminders whose claim
+    was lost in the meantime are left alone and counted as ``lost``.
+    Returns the counts of each outcome.
+    """
+    delivered = delivered or {}
+    now = now or utcnow()
+    outcome = {'sent': 0, 'retried': 0, 'failed': 0, 'lost': 0}
+    held = {
+        reminder.id: reminder
+        for reminder in dbsession.query(Reminder)
+        .filter(Reminder.claim_token == token, Reminder.id.in_(list(errors)))
+        .populate_existing()
+    }
+    for reminder_id, error in errors.items():
+        reminder = held.get(reminder_id)
+        if reminder is None:
+            outcome['lost'] += 1
+            continue
+        reminder.claim_token = None
+        reminder.claimed_until = None
+        reminder.dispatch_attempts += 1
+        reminder.delivered_sinks = None
+        if error is None:
+            reminder.dispatched_at = now
+            reminder.last_error = None
+            if not _advance(reminder, now):
+                reminder.dispatch_status = SENT
+                reminder.next_attempt_at = None
+            outcome['sent'] += 1
+            continue
+        reminder.last_error = error
+        if reminder.dispatch_attempts >= settings.max_attempts:
+            # A recurring reminder gives up on this occurrence only
+            if not _advance(reminder, now):
+                reminder.dispatch_status = FAILED
+                reminder.next_attempt_at = None
+            outcome['failed'] += 1
+        else:
+            reminder.next_attempt_at = now + settings.backoff(reminder.dispatch_attempts)
+            reminder.delivered_sinks = ' '.join(sorted(delivered.get(reminder_id, ()))) or None
+            outcome['retried'] += 1
+    dbsession.flush()
+    return outcome
+
+
+def deliver(sinks, batch, delivered=None):
+    """
+    Hand ``batch`` to every sink; a reminder is sent only if all accept it.
+    ``delivered`` maps reminder ids to the names of the sinks that already
+    accepted them, which are skipped; the sinks accepting now are added.
+    """
+    delivered = {} if delivered is None else delivered
+    errors = dict.fromkeys((notification['reminder']['id'] for notification in batch), None)
+    for sink in sinks:
+        pending = [
+            notification for notification in batch
+            if sink.name not in delivered.get(notification['reminder']['id'], ())
+        ]
+        if not pending:
+            continue
+        for reminder_id, error in sink.send_batch(pending).items():
+            if error is None:
+                delivered.setdefault(reminder_id, set()).add(sink.name)
+            elif errors[reminder_id] is None:
+                errors[reminder_id] = f'{sink.name}: {error}'
+    return errors
+
+
+def dispatch_once(tm, dbsession, sinks, settings, metrics=None, now=None):
+    """
+    Claim, deliver and finish one batch, each step in its own transaction
+    of ``tm``. Returns the number of reminders claimed (0 when idle).
+    """
+    with tm:
+        token, reminders = claim_batch(dbsession, settings.batch_size, settings.lease, now=now)
+        batch = notifications(dbsession, reminders, now=now)
+        delivered = {reminder.id: delivered_sinks(reminder) for reminder in reminders}
+    if not batch:
+        return 0
+    pending = [notification for notification in batch if not notification['completed']]
+    errors = deliver(sinks, pending, delivered)
+    skipped = len(batch) - len(pending)
+    # Occurrences completed in advance only move on to the next one
+    errors.update((notification['reminder']['id'], None) for notification in batch if notification['completed'])
+    with tm:
+        outcome = finish_batch(dbsession, token, errors, settings, now=now, delivered=delivered)
+    outcome['claimed'] = len(batch)
+    outcome['sent'] -= skipped
+    outcome['skipped'] = skipped
+    if metrics is not None:
+        metrics.add(outcome)
+        log.info('Dispatched a batch of %d reminders: %s', len(batch), metrics.to_dict())
+    return len(batch)
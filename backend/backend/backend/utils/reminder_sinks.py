@@ -0,0 +1,140 @@
+"""
+Where the reminder dispatcher delivers reminders.
+
+``reminders.sinks`` lists the sinks of a worker, by name (``log``,
+``smtp``, ``webhook``) or as a dotted path to a factory taking the
+settings. Each sink reads its own ``reminders.sink.<name>.*`` settings and
+reports, per reminder id, None when the reminder was delivered or an error
+message.
+"""
+import json
+import logging
+import smtplib
+import urllib.request
+from email.message import EmailMessage
+
+from pyramid.path import DottedNameResolver
+from pyramid.settings import aslist
+
+log = logging.getLogger(__name__)
+
+
+class Sink:
+    name = 'sink'
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def option(self, key, default=None):
+        return self.settings.get(f'reminders.sink.{self.name}.{key}', default)
+
+    def send(self, notification):
+        raise NotImplementedError
+
+    def send_batch(self, batch):
+        errors = {}
+        for notification in batch:
+            reminder_id = notification['reminder']['id']
+            try:
+                self.send(notification)
+                errors[reminder_id] = None
+            except Exception as e:
+                errors[reminder_id] = str(e) or e.__class__.__name__
+        return errors
+
+
+class LogSink(Sink):
+    """Logs each reminder and, with ``path`` set, appends it to a JSON lines file."""
+    name = 'log'
+
+    def send_batch(self, batch):
+        for notification in batch:
+            log.info('Reminder %s due for user %s', notification['reminder']['id'], notification['reminder']['user_id'])
+        path = self.option('path')
+        if path:
+            try:
+                with open(path, 'a', encoding='utf-8') as out:
+                    for notification in batch:
+                        out.write(json.dumps(notification) + '\n')
+            except OSError as e:
+                return {notification['reminder']['id']: str(e) for notification in batch}
+        return {notification['reminder']['id']: None for notification in batch}
+
+
+class SmtpSink(Sink):
+    """Emails each user, over one SMTP connection per batch."""
+    name = 'smtp'
+
+    def message(self, notification):
+        reminder = notification['reminder']
+        message = EmailMessage()
+        message['From'] = self.option('sender', 'noreply@localhost')
+        message['To'] = notification['user']['email']
+        message['Subject'] = f'Pengingat hafalan: {reminder["surat"]} {reminder["ayat"]}'
+        message.set_content(
+            f'Assalamu\'alaikum {notification["user"]["username"]},\n\n'
+            f'Saatnya murajaah {reminder["surat"]} ayat {reminder["ayat"]} '
+            f'(jadwal {reminder["due_date"]}).\n'
+        )
+        return message
+
+    def send_batch(self, batch):
+        host = self.option('host', 'localhost')
+        port = int(self.option('port', 25))
+        timeout = float(self.option('timeout', 10))
+        try:
+            connection = smtplib.SMTP(host, port, timeout=timeout)
+        except (OSError, smtplib.SMTPException) as e:
+            return {notification['reminder']['id']: str(e) for notification in batch}
+        try:
+            if self.option('starttls', 'false').lower() in ('true', 'yes', 'on', '1'):
+                connection.starttls()
+            if self.option('username'):
+                connection.login(self.option('username'), self.option('password', ''))
+            self.connection = connection
+            return super().send_batch(batch)
+        except (OSError, smtplib.SMTPException) as e:
+            return {notification['reminder']['id']: str(e) for notification in batch}
+        finally:
+            self.connection = None
+            try:
+                connection.quit()
+            except (OSError, smtplib.SMTPException):
+                pass
+
+    def send(self, notification):
+        if not notification['user']:
+            raise ValueError('User not found')
+        self.connection.send_message(self.message(notification))
+
+
+class WebhookSink(Sink):
+    """POSTs each reminder as JSON to ``url``; any non-2xx response is a failure."""
+    name = 'webhook'
+
+    def send(self, notification):
+        url = self.option('url')
+        if not url:
+            raise ValueError('reminders.sink.webhook.url is not set')
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(notification).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=float(self.option('timeout', 10))) as response:
+            if not 200 <= response.status < 300:
+                raise ValueError(f'HTTP {response.status}')
+
+
+SINKS = {sink.name: sink for sink in (LogSink, SmtpSink, WebhookSink)}
+
+
+def load_sinks(settings):
+    """The sinks listed in ``reminders.sinks`` (default: ``log``)."""
+    resolver = DottedNameResolver()
+    sinks = []
+    for name in aslist(settings.get('reminders.sinks', 'log')):
+        factory = SINKS.get(name) or resolver.resolve(name)
+        sinks.append(factory(settings))
+    return sinks
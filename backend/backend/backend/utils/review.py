@@ -0,0 +1,63 @@
+"""
+Spaced-repetition scheduling of murajaah (review) with SM-2.
+
+Each hafalan entry carries its own interval (days), ease factor and count
+of consecutive successful reviews. A review is graded 0 (forgotten) to 5
+(perfect); :func:`schedule_review` moves the entry's ``due_at`` forward by
+the new interval. Entries still ``belum`` are not memorized yet and have
+no ``due_at``; an entry joins the queue (due immediately) as soon as it is
+being memorized or finished. The queue is read from the
+``(user_id, due_at)`` index, due soonest first.
+"""
+import datetime
+
+from ..models import HafalanStatusEnum
+
+MIN_QUALITY = 0
+MAX_QUALITY = 5
+# Grades below this count as forgotten: the entry starts over
+PASSING_QUALITY = 3
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def next_schedule(interval, ease, repetitions, quality):
+    """SM-2: the ``(interval, ease, repetitions)`` after a review graded ``quality``."""
+    ease = max(MIN_EASE, ease + 0.1 - (MAX_QUALITY - quality) * (0.08 + (MAX_QUALITY - quality) * 0.02))
+    if quality < PASSING_QUALITY:
+        return 1, ease, 0
+    repetitions += 1
+    if repetitions == 1:
+        interval = 1
+    elif repetitions == 2:
+        interval = 6
+    else:
+        interval = max(1, round(interval * ease))
+    return interval, round(ease, 2), repetitions
+
+
+def schedule_review(hafalan, quality, reviewed_at):
+    """Record a review of ``hafalan`` graded ``quality`` at ``reviewed_at``."""
+    hafalan.review_interval, hafalan.ease_factor, hafalan.review_repetitions = next_schedule(
+        hafalan.review_interval or 0,
+        hafalan.ease_factor if hafalan.ease_factor is not None else DEFAULT_EASE,
+        hafalan.review_repetitions or 0,
+        quality,
+    )
+    hafalan.last_reviewed_at = reviewed_at
+    hafalan.due_at = reviewed_at + datetime.timedelta(days=hafalan.review_interval)
+
+
+def schedule_values(status, due_at, now):
+    """
+    Schedule columns to set when an entry's status becomes ``status``
+    (``due_at`` is its current one): entries enter the queue once they
+    are being memorized and leave it, reset, when they go back to belum.
+    """
+    if status == HafalanStatusEnum.belum:
+        if due_at is None:
+            return {}
+        return {'due_at': None, 'review_interval': 0, 'ease_factor': DEFAULT_EASE, 'review_repetitions': 0}
+    if due_at is None:
+        return {'due_at': now}
+    return {}
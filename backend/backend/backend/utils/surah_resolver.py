@@ -0,0 +1,181 @@
+"""
+Resolve surah identifiers (ids, numbers, names, transliterations) in memory.
+
+Built from the surah dicts of a corpus snapshot, so it is rebuilt whenever
+the corpus cache is invalidated by a surah write and never queries the
+database.
+"""
+import bisect
+import difflib
+import re
+
+from .arabic import normalize_arabic
+
+# Assimilated forms of the Arabic article in transliterations (Ash-Shams, An-Nas)
+LATIN_ARTICLES = ('al', 'an', 'ar', 'as', 'ash', 'at', 'ath', 'ad', 'adh', 'az')
+ARABIC_ARTICLE = '\u0627\u0644'  # al-
+ARABIC_SURAH_PREFIX = '\u0633\u0648\u0631\u0647'  # "surah", normalized
+
+_ARABIC_LETTER_RE = re.compile('[\u0600-\u06ff]')
+
+FUZZY_CUTOFF = 0.8
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+
+_NON_LATIN_RE = re.compile(r'[^a-z0-9]')
+_DOUBLED_RE = re.compile(r'(.)\1+')
+_WORD_SPLIT_RE = re.compile(r"[\s\-'`’]+")
+
+
+def latin_key(text):
+    """
+    Lookup key for a Latin name: lowercase letters and digits only, doubled
+    letters collapsed and a trailing "h" dropped, so "Al-Baqarah",
+    "albaqara" and "Al Baqqarah" share a key.
+    """
+    key = _DOUBLED_RE.sub(r'\1', _NON_LATIN_RE.sub('', text.lower()))
+    if len(key) > 2 and key.endswith('h'):
+        key = key[:-1]
+    return key
+
+
+def arabic_key(text):
+    """Lookup key for an Arabic name: normalized, without spaces or a "surah" prefix."""
+    key = normalize_arabic(text).replace(' ', '')
+    if key.startswith(ARABIC_SURAH_PREFIX):
+        key = key[len(ARABIC_SURAH_PREFIX):]
+    return key
+
+
+def _latin_variants(name):
+    """Keys for a Latin name with and without its article."""
+    words = [word for word in _WORD_SPLIT_RE.split(name.lower()) if word]
+    if not words:
+        return set()
+    if words[0] == 'the':
+        words = words[1:]
+    variants = {latin_key(''.join(words))}
+    if len(words) > 1 and words[0] in LATIN_ARTICLES:
+        variants.add(latin_key(''.join(words[1:])))
+    return variants - {''}
+
+
+def _arabic_variants(name):
+    key = arabic_key(name)
+    variants = {key}
+    if key.startswith(ARABIC_ARTICLE) and len(key) > len(ARABIC_ARTICLE):
+        variants.add(key[len(ARABIC_ARTICLE):])
+    return variants - {''}
+
+
+def query_keys(query):
+    """Candidate keys for user input, Arabic or Latin."""
+    if _ARABIC_LETTER_RE.search(query):
+        return _arabic_variants(query)
+    return _latin_variants(query)
+
+
+class SurahResolver:
+    """
+    Maps identifiers to surah dicts.
+
+    Integers resolve by id first and surah number second, as the surah
+    routes always have. Names resolve through exact keys, then a unique key
+    prefix, then a fuzzy match; a key shared by several surahs never
+    resolves.
+    """
+
+    def __init__(self, surahs):
+        self.surahs = list(surahs)
+        self.by_id = {surah['id']: surah for surah in self.surahs}
+        self.by_number = {surah['surah_number']: surah for surah in self.surahs}
+
+        by_key = {}
+        for surah in self.surahs:
+            keys = set()
+            for name in (surah['name_english'], surah['english_translation']):
+                if name:
+                    keys |= _latin_variants(name)
+            if surah['name_arabic']:
+                keys |= _arabic_variants(surah['name_arabic'])
+            for key in keys:
+                by_key.setdefault(key, set()).add(surah['surah_number'])
+
+        # Ambiguous keys are kept (as None) so they also block fuzzy matches
+        self.by_key = {
+            key: self.by_number[numbers.pop()] if len(numbers) == 1 else None
+            for key, numbers in by_key.items()
+        }
+        self._sorted_keys = sorted(self.by_key)
+
+    def resolve(self, identifier):
+        """Return the surah dict for ``identifier`` or None."""
+        if identifier is None:
+            return None
+        if isinstance(identifier, int) or str(identifier).strip().isdigit():
+            number = int(identifier)
+            return self.by_id.get(number) or self.by_number.get(number)
+
+        keys = query_keys(str(identifier).strip())
+        if not keys:
+            return None
+        exact = [self.by_key[key] for key in keys if key in self.by_key]
+        if exact:
+            return self._unique(exact)
+        return (
+            self._unique(self._prefixed(key) for key in keys)
+            or self._unique(self._fuzzy(key) for key in keys)
+        )
+
+    def autocomplete(self, query, limit=DEFAULT_AUTOCOMPLETE_LIMIT):
+        """Surahs whose number or any name key starts with ``query``, by surah number."""
+        query = str(query).strip()
+        if not query:
+            return []
+        if query.isdigit():
+            numbers = [number for number in self.by_number if str(number).startswith(query)]
+        else:
+            numbers = set()
+            for key in query_keys(query):
+                numbers |= {surah['surah_number'] for surah in self._prefix_matches(key)}
+            if not numbers:
+                fuzzy = self.resolve(query)
+                numbers = {fuzzy['surah_number']} if fuzzy else set()
+        return [self.by_number[number] for number in sorted(numbers)[:limit]]
+
+    def _prefix_matches(self, key):
+        matches = []
+        start = bisect.bisect_left(self._sorted_keys, key)
+        for candidate in self._sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            surah = self.by_key[candidate]
+            if surah is not None and surah not in matches:
+                matches.append(surah)
+        return matches
+
+    def _prefixed(self, key):
+        matches = self._prefix_matches(key)
+        return matches[0] if len(matches) == 1 else None
+
+    def _fuzzy(self, key):
+        matches = difflib.get_close_matches(key, self._sorted_keys, n=2, cutoff=FUZZY_CUTOFF)
+        surahs = [self.by_key[match] for match in matches]
+        if not surahs or surahs[0] is None:
+            return None
+        # A close runner-up for another surah makes the guess ambiguous
+        if len(surahs) > 1 and surahs[1] is not surahs[0]:
+            ratios = [difflib.SequenceMatcher(None, key, match).ratio() for match in matches]
+            if ratios[0] == ratios[1]:
+                return None
+        return surahs[0]
+
+    @staticmethod
+    def _unique(candidates):
+        found = None
+        for surah in candidates:
+            if surah is None:
+                continue
+            if found is not None and surah is not found:
+                return None
+            found = surah
+        return found
@@ -0,0 +1,195 @@
+"""
+Delta sync of a user's hafalan and reminders.
+
+Every write stamps the rows it changes with the next numbers of the
+user's change sequence (``users.change_seq``) and deletions leave a
+:class:`SyncTombstone` with their own number. The sequence is bumped with
+an UPDATE of the user row, which serializes concurrent writers of the same
+user, so numbers become visible in order and a client that remembers the
+last number it saw misses nothing. Numbers are unique per user, which lets
+pages end anywhere.
+
+Set-based writes (:func:`update_where`, :func:`delete_where`) count the
+matching rows, reserve their numbers and bump the collection version in
+one UPDATE of the user row, then number the rows they touch with
+``row_number()`` in the writing statement.
+"""
+from pyramid.httpexceptions import HTTPNotFound
+from sqlalchemy import delete, exists, func, insert, literal, select, update
+
+from .http_cache import collection_changed
+from ..models import Hafalan, Reminder, SyncTombstone, User
+
+SYNC_ENTITIES = {'hafalan': Hafalan, 'reminders': Reminder}
+ENTITY_NAMES = {model: name for name, model in SYNC_ENTITIES.items()}
+
+DEFAULT_SYNC_PAGE_SIZE = 500
+MAX_SYNC_PAGE_SIZE = 1000
+
+
+def reserve_change_seqs(dbsession, user_id, count=1):
+    """
+    Reserve ``count`` consecutive sequence numbers; returns the first.
+    Raises HTTPNotFound when the user is gone, e.g. deleted by another
+    process while still in the user cache (``utils/identity.py``).
+    """
+    with dbsession.no_autoflush:
+        dbsession.query(User).filter(User.id == user_id).update(
+            {User.change_seq: User.change_seq + count}, synchronize_session=False
+        )
+        last = dbsession.query(User.change_seq).filter(User.id == user_id).scalar()
+    if last is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    return last - count + 1
+
+
+def record_changes(dbsession, user_id, changed=(), deleted=()):
+    """
+    Stamp the ``changed`` rows (new or modified, before they are flushed)
+    and tombstone the ``deleted`` ones.
+    """
+    changed, deleted = list(changed), list(deleted)
+    if not changed and not deleted:
+        return
+    seq = reserve_change_seqs(dbsession, user_id, len(changed) + len(deleted))
+    for row in changed:
+        row.change_seq = seq
+        seq += 1
+    for row in deleted:
+        dbsession.add(SyncTombstone(
+            user_id=row.user_id, entity=ENTITY_NAMES[type(row)], entity_id=row.id, change_seq=seq
+        ))
+        seq += 1
+
+
+def _numbered(model, criteria, cte=False):
+    """The ids of ``model`` rows matching ``criteria`` with their position by id."""
+    numbered = select(
+        model.id, model.user_id, func.row_number().over(order_by=model.id).label('position')
+    ).where(*criteria)
+    return numbered.cte('numbered') if cte else numbered.subquery()
+
+
+def _reserve_matching(dbsession, user_id, model, criteria, version):
+    """
+    Reserve a sequence number for each ``model`` row matching ``criteria``
+    and bump the user's ``version`` column, counted inside one UPDATE of
+    the user row that is skipped when nothing matches.
+
+    Returns ``(first, count)``, or None when no row matches.
+    """
+    users = User.__table__
+    count = select(func.count(model.id)).where(*criteria).scalar_subquery()
+    statement = update(users).where(users.c.id == user_id, exists().where(*criteria)).values({
+        users.c.change_seq: users.c.change_seq + count,
+        users.c[version.key]: users.c[version.key] + 1,
+    })
+    if dbsession.get_bind().dialect.name == 'postgresql':
+        # Evaluated in the UPDATE's snapshot, so both agree
+        row = dbsession.execute(statement.returning(users.c.change_seq, count)).first()
+    elif dbsession.execute(statement).rowcount:
+        # No RETURNING for SQLite in SQLAlchemy 1.4; the UPDATE took the
+        # write lock, so nothing changes before this read
+        row = dbsession.execute(select(users.c.change_seq, count).where(users.c.id == user_id)).first()
+    else:
+        row = None
+    if row is None:
+        return None
+    collection_changed(dbsession, user_id)
+    last, count = row
+    return last - count + 1, count
+
+
+def update_where(dbsession, user_id, model, criteria, values, version):
+    """
+    Set ``values`` on the user's ``model`` rows matching ``criteria`` in one
+    UPDATE, each stamped with its own sequence number, and bump the user's
+    ``version`` column when any matched. Returns the number of rows updated.
+    """
+    reserved = _reserve_matching(dbsession, user_id, model, criteria, version)
+    if reserved is None:
+        return 0
+    first, count = reserved
+    statement = update(model).execution_options(synchronize_session=False)
+    # Rows that started matching after the count are left alone
+    if dbsession.get_bind().dialect.name == 'postgresql':
+        numbered = _numbered(model, criteria)
+        statement = statement.where(model.id == numbered.c.id, numbered.c.position <= count)
+        position = numbered.c.position
+        return dbsession.execute(statement.values(change_seq=first + position - 1, **values)).rowcount
+    # No UPDATE ... FROM for SQLite in SQLAlchemy 1.4. The rows are
+    # numbered once in a WITH clause, which SQLite materializes as it is
+    # read twice, and each row looks its position up by id
+    numbered = _numbered(model, criteria, cte=True)
+    statement = statement.add_cte(numbered).where(
+        model.id.in_(select(numbered.c.id).where(numbered.c.position <= count))
+    )
+    position = select(numbered.c.position).where(numbered.c.id == model.id).scalar_subquery()
+    dbsession.execute(statement.values(change_seq=first + position - 1, **values))
+    # pysqlite reports no rowcount for statements starting with WITH; under
+    # the write lock every counted row is updated
+    return count
+
+
+def delete_where(dbsession, user_id, model, criteria, version):
+    """
+    Delete the user's ``model`` rows matching ``criteria``, tombstoned
+    with one INSERT ... SELECT, and bump the user's ``version`` column when
+    any matched. Returns the number of rows deleted.
+    """
+    reserved = _reserve_matching(dbsession, user_id, model, criteria, version)
+    if reserved is None:
+        return 0
+    first, count = reserved
+    numbered = _numbered(model, criteria)
+    entity = ENTITY_NAMES[model]
+    dbsession.execute(insert(SyncTombstone).from_select(
+        ['user_id', 'entity', 'entity_id', 'change_seq'],
+        select(numbered.c.user_id, literal(entity), numbered.c.id, first + numbered.c.position - 1)
+        .where(numbered.c.position <= count),
+    ))
+    tombstoned = select(SyncTombstone.entity_id).where(
+        SyncTombstone.user_id == user_id,
+        SyncTombstone.entity == entity,
+        SyncTombstone.change_seq.between(first, first + count - 1),
+    )
+    result = dbsession.execute(
+        delete(model).where(model.id.in_(tombstoned)).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def changes_since(dbsession, user_id, since, limit):
+    """
+    The first ``limit`` changes after sequence number ``since``.
+
+    Returns ``(changes, last_seq, has_more)``: the changed rows per entity,
+    the ids deleted per entity and the number to resume from. Rows carry
+    their current state, so deletions can be applied before upserts.
+    """
+    items = []
+    for name, model in SYNC_ENTITIES.items():
+        rows = dbsession.query(model).filter(
+            model.user_id == user_id, model.change_seq > since
+        ).order_by(model.change_seq).limit(limit + 1)
+        items.extend((row.change_seq, name, row) for row in rows)
+    tombstones = dbsession.query(SyncTombstone).filter(
+        SyncTombstone.user_id == user_id, SyncTombstone.change_seq > since
+    ).order_by(SyncTombstone.change_seq).limit(limit + 1)
+    items.extend((tombstone.change_seq, None, tombstone) for tombstone in tombstones)
+
+    # Each query holds everything up to its last number, so the merged
+    # first ``limit`` items are exactly the next ``limit`` changes
+    items.sort(key=lambda item: item[0])
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    changes = {name: [] for name in SYNC_ENTITIES}
+    changes['deleted'] = {name: [] for name in SYNC_ENTITIES}
+    for seq, name, row in items:
+        if name is None:
+            changes['deleted'][row.entity].append(row.entity_id)
+        else:
+            changes[name].append(row.to_dict())
+    last_seq = items[-1][0] if items else since
+    return changes, last_seq, has_more
@@ -0,0 +1,96 @@
+"""
+Hierarchical timer wheel.
+
+Timers are kept in ``levels`` rings of ``slots`` buckets. A bucket of
+level 0 holds the timers of a single tick; a bucket of level ``n`` spans
+``slots ** n`` ticks. When the wheel reaches the start of a higher bucket,
+its timers cascade into the lower levels, so scheduling, cancelling and
+firing a timer each cost O(1) however many timers are pending. Timers
+beyond the span of the top level wait there and cascade once per turn.
+
+Times are plain numbers (seconds since the epoch for the push hub). A
+timer never fires early: it fires on the first tick at or after its time.
+"""
+import math
+
+DEFAULT_TICK = 1.0
+DEFAULT_SLOTS = 64
+DEFAULT_LEVELS = 4
+
+
+class TimerWheel:
+
+    def __init__(self, start, tick=DEFAULT_TICK, slots=DEFAULT_SLOTS, levels=DEFAULT_LEVELS):
+        self.tick = tick
+        self.slots = slots
+        self.current = math.floor(start / tick)
+        self._levels = [[{} for _ in range(slots)] for _ in range(levels)]
+        # Timers due by the last tick processed, fired by the next advance
+        self._overdue = {}
+        # key -> the bucket holding it
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def __contains__(self, key):
+        return key in self._buckets
+
+    @property
+    def now(self):
+        """The time of the last tick processed."""
+        return self.current * self.tick
+
+    def schedule(self, key, when, value=None):
+        """Fire ``value`` under ``key`` at ``when``, replacing any timer with that key."""
+        self.cancel(key)
+        self._place(key, math.ceil(when / self.tick), value)
+
+    def cancel(self, key):
+        """Drop the timer ``key``; returns whether there was one."""
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            return False
+        del bucket[key]
+        return True
+
+    def advance(self, now):
+        """Process every tick up to ``now``; returns the fired ``[(key, value)]``."""
+        target = math.floor(now / self.tick)
+        fired = []
+        while self.current < target:
+            if not self._buckets:
+                self.current = target
+                break
+            self.current += 1
+            for level in range(len(self._levels) - 1, 0, -1):
+                span = self.slots ** level
+                if self.current % span == 0:
+                    bucket = self._levels[level][(self.current // span) % self.slots]
+                    for key, (deadline, value) in self._take(bucket):
+                        self._place(key, deadline, value)
+            fired.extend(
+                (key, value)
+                for key, (deadline, value) in self._take(self._levels[0][self.current % self.slots])
+            )
+        fired.extend((key, value) for key, (deadline, value) in self._take(self._overdue))
+        return fired
+
+    def _take(self, bucket):
+        entries = list(bucket.items())
+        bucket.clear()
+        for key, _ in entries:
+            del self._buckets[key]
+        return entries
+
+    def _place(self, key, deadline, value):
+        delta = deadline - self.current
+        if delta <= 0:
+            bucket = self._overdue
+        else:
+            level = 0
+            while level < len(self._levels) - 1 and delta >= self.slots ** (level + 1):
+                level += 1
+            bucket = self._levels[level][(deadline // self.slots ** level) % self.slots]
+        bucket[key] = (deadline, value)
+        self._buckets[key] = bucket
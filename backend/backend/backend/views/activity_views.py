@@ -0,0 +1,50 @@
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest
+from datetime import datetime, timedelta, timezone
+
+from ..models import User
+from ..utils.activity import DEFAULT_HEATMAP_DAYS, MAX_HEATMAP_DAYS, heatmap, streaks
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.pagination import parse_int_param
+from .hafalan_views import parse_date_param
+
+
+def activity_etag(request, name, user_id, today):
+    """ETag of an activity response; raises HTTPNotFound for unknown users."""
+    version = get_collection_version(request.dbsession, user_id, User.hafalan_version)
+    if version is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # Review events are only written by hafalan writes; the day moves the window
+    return collection_etag(f'{name}-{today.isoformat()}', user_id, version, request)
+
+@view_config(route_name='user_activity_streak', request_method='GET', renderer='json')
+def user_activity_streak_view(request):
+    # Example: GET /api/v1/users/1/activity/streak
+    user_id = request.matchdict.get('user_id')
+    today = datetime.now(timezone.utc).date()
+    not_modified = conditional_response(request, activity_etag(request, 'streak', user_id, today), PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+    return streaks(request.dbsession, user_id, today)
+
+@view_config(route_name='user_activity_heatmap', request_method='GET', renderer='json')
+def user_activity_heatmap_view(request):
+    # Example: GET /api/v1/users/1/activity/heatmap?to=2026-10-18&days=365
+    user_id = request.matchdict.get('user_id')
+    today = datetime.now(timezone.utc).date()
+    last = parse_date_param(request, 'to') or today
+    days = parse_int_param(request, 'days', minimum=1)
+    if days is None:
+        days = DEFAULT_HEATMAP_DAYS
+    if days > MAX_HEATMAP_DAYS:
+        raise HTTPBadRequest(json_body={'error': f'days must be at most {MAX_HEATMAP_DAYS}'})
+
+    not_modified = conditional_response(request, activity_etag(request, 'heatmap', user_id, today), PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+    return heatmap(request.dbsession, user_id, last - timedelta(days=days - 1), last)
@@ -2,6 +2,15 @@ from pyramid.view import view_config
 from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPConflict
 
 from ..models import Ayah, Surah # Adjust path if necessary
+from ..models.search import index_ayahs, search_ayah_ids, unindex_ayahs
+from ..utils.corpus_cache import get_corpus, invalidate_corpus
+from ..utils.pagination import decode_cursor, parse_int_param, parse_limit, set_next_cursor
+from ..utils.projection import parse_fields, project
+
+DEFAULT_AYAH_PAGE_SIZE = 100
+MAX_AYAH_PAGE_SIZE = 500
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
 
 @view_config(route_name='ayahs_collection', request_method='POST', renderer='json', permission='admin') # Assuming admin permission
 def create_ayah_view(request):
@@ -32,6 +41,8 @@ def create_ayah_view(request):
         )
         request.dbsession.add(new_ayah)
         request.dbsession.flush() # To get ID
+        index_ayahs(request.dbsession, [new_ayah])
+        invalidate_corpus(request)
         return new_ayah.to_dict()
     except (HTTPBadRequest, HTTPConflict) as e:
         request.response.status_code = e.code
@@ -42,23 +53,69 @@ def create_ayah_view(request):
 
 @view_config(route_name='ayahs_collection', request_method='GET', renderer='json')
 def list_ayahs_view(request):
-    # Consider pagination for large number of ayahs
-    # Example: GET /api/v1/ayahs?surah_id=1&page=1&limit=30
-    surah_id_filter = request.params.get('surah_id')
-    query = request.dbsession.query(Ayah)
-    if surah_id_filter:
-        query = query.filter(Ayah.surah_id == surah_id_filter)
-    
-    ayahs = query.order_by(Ayah.surah_id, Ayah.ayah_number_in_surah).all()
-    return [ayah.to_dict() for ayah in ayahs]
+    # Keyset pagination on (surah_id, ayah_number_in_surah)
+    # Example: GET /api/v1/ayahs?surah_id=2&from=250&to=260&limit=30&after=<cursor>
+    # The cursor for the next page is returned in the X-Next-Cursor header.
+    limit = parse_limit(request, default=DEFAULT_AYAH_PAGE_SIZE, maximum=MAX_AYAH_PAGE_SIZE)
+    fields = parse_fields(request, Ayah)
+    surah_id = parse_int_param(request, 'surah_id')
+    first = parse_int_param(request, 'from', minimum=1)
+    last = parse_int_param(request, 'to', minimum=1)
+    if surah_id is None and (first is not None or last is not None):
+        raise HTTPBadRequest(json_body={'error': 'from/to ayah bounds require surah_id'})
+    if first is not None and last is not None and first > last:
+        raise HTTPBadRequest(json_body={'error': 'from must not be greater than to'})
+
+    after = request.params.get('after')
+    if after:
+        after = decode_cursor(after, 2)
+        if not all(isinstance(value, int) for value in after):
+            raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {request.params["after"]}'})
+
+    ayahs, next_key = get_corpus(request).page_ayahs(
+        limit, after=after, surah_id=surah_id, first=first, last=last
+    )
+    set_next_cursor(request, next_key)
+    return project(ayahs, fields)
+
+@view_config(route_name='ayahs_search', request_method='GET', renderer='json')
+def search_ayahs_view(request):
+    # Ranked full-text search over the Arabic text and both translations
+    # Example: GET /api/v1/ayahs/search?q=ar-rahman&limit=20&after=<cursor>
+    query = request.params.get('q', '').strip()
+    if not query:
+        raise HTTPBadRequest(json_body={'error': 'Query parameter q is required'})
+    limit = parse_limit(request, default=DEFAULT_SEARCH_PAGE_SIZE, maximum=MAX_SEARCH_PAGE_SIZE)
+    offset = 0
+    after = request.params.get('after')
+    if after:
+        offset, = decode_cursor(after, 1)
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+
+    # Fetch one extra hit to know whether there is a next page
+    hits = search_ayah_ids(request.dbsession, query, limit + 1, offset)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        set_next_cursor(request, [offset + limit])
+
+    ayahs_by_id = get_corpus(request).ayahs_by_id
+    return [
+        dict(ayahs_by_id[ayah_id], score=score)
+        for ayah_id, score in hits
+        if ayah_id in ayahs_by_id
+    ]
 
 @view_config(route_name='ayah_detail', request_method='GET', renderer='json')
 def get_ayah_view(request):
     ayah_id = request.matchdict.get('ayah_id')
-    ayah = request.dbsession.query(Ayah).filter_by(id=ayah_id).first()
+    try:
+        ayah = get_corpus(request).ayahs_by_id.get(int(ayah_id))
+    except ValueError:
+        ayah = None
     if not ayah:
         raise HTTPNotFound(json_body={'error': f'Ayah with id {ayah_id} not found'})
-    return ayah.to_dict()
+    return ayah
 
 @view_config(route_name='ayah_detail', request_method='PUT', renderer='json', permission='admin') # Assuming admin permission
 def update_ayah_view(request):
@@ -96,6 +153,8 @@ def update_ayah_view(request):
             ayah.translation_en = data.get('translation_en')
         
         request.dbsession.flush()
+        index_ayahs(request.dbsession, [ayah])
+        invalidate_corpus(request)
         return ayah.to_dict()
     except (HTTPBadRequest, HTTPConflict) as e:
         request.response.status_code = e.code
@@ -113,5 +172,7 @@ def delete_ayah_view(request):
     
     request.dbsession.delete(ayah)
     request.dbsession.flush()
+    unindex_ayahs(request.dbsession, [ayah.id])
+    invalidate_corpus(request)
     request.response.status_code = 204 # No Content
     return {}
@@ -0,0 +1,70 @@
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest
+
+from ..models import User
+from ..utils.ayah_range import AyahRangeError, range_columns
+from ..utils.corpus_cache import get_corpus
+from ..utils.coverage import JUZ_STARTS, coverage_summary, get_coverage, juz_range, range_coverage
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.pagination import parse_int_param
+
+
+def coverage_etag(request, name, user_id):
+    """ETag of a coverage response; raises HTTPNotFound for unknown users."""
+    version = get_collection_version(request.dbsession, user_id, User.hafalan_version)
+    if version is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # Surah and juz boundaries come from the corpus
+    return collection_etag(f'{name}-{get_corpus(request).generation}', user_id, version, request)
+
+@view_config(route_name='user_coverage', request_method='GET', renderer='json')
+def user_coverage_view(request):
+    # Example: GET /api/v1/users/1/coverage
+    # Percentages per surah and per juz from the user's coverage bitmap
+    user_id = request.matchdict.get('user_id')
+    not_modified = conditional_response(request, coverage_etag(request, 'coverage', user_id), PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    return dict(coverage_summary(get_coverage(request.dbsession, user_id), get_corpus(request)), user_id=int(user_id))
+
+@view_config(route_name='user_coverage_range', request_method='GET', renderer='json')
+def user_coverage_range_view(request):
+    # Example: GET /api/v1/users/1/coverage/range?juz=30
+    #          GET /api/v1/users/1/coverage/range?surah=al-mulk&ayah_range=1-15
+    user_id = request.matchdict.get('user_id')
+    corpus = get_corpus(request)
+    juz = parse_int_param(request, 'juz', minimum=1)
+    surah_param = request.params.get('surah')
+
+    if juz is not None:
+        if juz > len(JUZ_STARTS):
+            raise HTTPBadRequest(json_body={'error': f'juz must be between 1 and {len(JUZ_STARTS)}'})
+        span = juz_range(corpus, juz)
+        if span is None:
+            raise HTTPNotFound(json_body={'error': f'Juz {juz} is not in the corpus'})
+        target = {'juz': juz}
+    elif surah_param:
+        surah = corpus.find_surah(surah_param)
+        if surah is None:
+            raise HTTPNotFound(json_body={'error': f'Surah {surah_param} not found'})
+        ayah_range = request.params.get('ayah_range') or f'1-{surah["number_of_ayahs"]}'
+        try:
+            columns = range_columns(surah, corpus.ayah_offsets[surah['id']], ayah_range)
+        except AyahRangeError as e:
+            raise HTTPBadRequest(json_body={'error': str(e)})
+        span = columns['start_index'], columns['end_index']
+        target = {'surah_id': surah['id'], 'ayah_range': ayah_range}
+    else:
+        raise HTTPBadRequest(json_body={'error': 'Specify juz, or surah and optionally ayah_range'})
+
+    not_modified = conditional_response(request, coverage_etag(request, 'coverage-range', user_id), PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    return dict(range_coverage(get_coverage(request.dbsession, user_id), *span), **target)
@@ -0,0 +1,89 @@
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPBadRequest, HTTPForbidden, HTTPServiceUnavailable
+from pyramid.response import Response
+
+from ..push import EventStream
+from ..utils.jwt_helper import PATH_TOKEN_EXPIRATION_DELTA, create_token
+from ..utils.pagination import parse_int_param
+
+DEFAULT_POLL_WAIT = 25
+MAX_POLL_WAIT = 60
+
+
+def parse_last_event_id(request):
+    """``after`` or, from a reconnecting EventSource, the ``Last-Event-ID`` header."""
+    after = parse_int_param(request, 'after', minimum=0)
+    header = request.headers.get('Last-Event-ID')
+    if after is None and header:
+        if not header.isdigit():
+            raise HTTPBadRequest(json_body={'error': f'Invalid Last-Event-ID: {header}'})
+        after = int(header)
+    return after
+
+@view_config(route_name='user_events_token', request_method='POST', renderer='json')
+def user_events_token_view(request):
+    # Example: POST /api/v1/users/1/events/token
+    # EventSource cannot send the Authorization header: open the returned
+    # url instead. Its access_token only opens this user's events and
+    # expires after a few minutes, so get a new one to reconnect later.
+    user_id = request.matchdict.get('user_id')
+
+    # Authorization: Ensure the authenticated user reads their own events
+    if not request.user or str(request.user['user_id']) != user_id:
+        raise HTTPForbidden(json_body={'error': 'Not authorized to read events of this user'})
+
+    path = request.route_path('user_events', user_id=user_id)
+    token = create_token(
+        request.user['user_id'], request.user['username'], expiration=PATH_TOKEN_EXPIRATION_DELTA, path=path,
+    )
+    return {
+        'token': token,
+        'expires_in': int(PATH_TOKEN_EXPIRATION_DELTA.total_seconds()),
+        'url': request.route_path('user_events', user_id=user_id, _query={'access_token': token}),
+    }
+
+@view_config(route_name='user_events', request_method='GET', renderer='json')
+def user_events_view(request):
+    # Example: GET /api/v1/users/1/events with Accept: text/event-stream, or
+    # long polling: GET /api/v1/users/1/events?after=12&wait=25
+    # Authenticated by the bearer token or, for EventSource, the
+    # access_token from POST /api/v1/users/1/events/token.
+    # Events: reminder-due, reminders-changed, hafalan-changed and resync
+    # (some events were missed; refetch).
+    user_id = request.matchdict.get('user_id')
+
+    # Authorization: Ensure the authenticated user reads their own events
+    if not request.user or str(request.user['user_id']) != user_id:
+        raise HTTPForbidden(json_body={'error': 'Not authorized to read events of this user'})
+
+    hub = request.registry.get('push_hub')
+    if hub is None:
+        raise HTTPServiceUnavailable(json_body={'error': 'Push channel is not enabled'})
+    # Only served apps tick the hub; scripts loading the same settings never get here
+    hub.start()
+
+    after = parse_last_event_id(request)
+    streaming = 'text/event-stream' in request.headers.get('Accept', '')
+    wait = None
+    if not streaming:
+        wait = parse_int_param(request, 'wait', minimum=0)
+        wait = DEFAULT_POLL_WAIT if wait is None else min(wait, MAX_POLL_WAIT)
+
+    channel = hub.connect(int(user_id))
+    if after is None:
+        after = channel.last_id
+    if streaming:
+        response = Response(content_type='text/event-stream', charset='utf-8')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Stops nginx from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.app_iter = EventStream(hub, channel, after, hub.settings.heartbeat)
+        return response
+
+    try:
+        events = channel.wait(after, wait)
+    finally:
+        hub.disconnect(channel)
+    if events is None:
+        return {'events': [], 'last_id': channel.last_id, 'resync': True}
+    return {'events': events, 'last_id': events[-1]['id'] if events else after, 'resync': False}
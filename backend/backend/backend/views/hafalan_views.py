@@ -2,8 +2,112 @@ from pyramid.view import view_config
 from pyramid.response import Response
 from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPForbidden
 import json
+from datetime import date, datetime, timezone
+
+from ..models import Hafalan, User, HafalanStatusEnum, UserProgress, UserSurahProgress # Sesuaikan path jika perlu
+from ..utils.activity import record_events, status_changed, status_event
+from ..utils.ayah_range import AyahRangeError, resolve_range
+from ..utils.corpus_cache import get_corpus
+from ..utils.hafalan_stats import GRANULARITIES, hafalan_stats
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    bump_collection_version,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.identity import user_exists
+from ..utils.pagination import (
+    decode_cursor,
+    keyset_after,
+    keyset_order,
+    parse_limit,
+    set_next_cursor,
+)
+from ..utils.progress import USER_COUNTERS, apply_progress, apply_progress_changes, contribution, get_progress
+from ..utils.projection import parse_fields, query_fields, serialize
+from ..utils.review import schedule_values
+from ..utils.sync import record_changes
+
+
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+MAX_BATCH_OPERATIONS = 500
+HAFALAN_SORTS = ('id', 'updated_at', 'last_reviewed_at')
+DEFAULT_HAFALAN_SORT = 'id'
+MAX_HAFALAN_PAGE_SIZE = 200
+
+
+def parse_status(value):
+    try:
+        return HafalanStatusEnum(value)
+    except ValueError:
+        raise HTTPBadRequest(json_body={'error': f'Invalid status value: {value}. Valid values are: {", ".join([s.value for s in HafalanStatusEnum])}'})
+
+
+def parse_reviewed_at(value, current):
+    # Ensure it's parsed correctly, handling potential 'Z' for UTC
+    try:
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError, AttributeError):
+        # Keep existing if parsing fails
+        return current
+
+
+def hafalan_values(request, data, hafalan=None):
+    """
+    Validated column values for a new entry (``hafalan`` is None) or for
+    an update of ``hafalan`` from a request payload.
+
+    Nothing is changed here, so a payload is either applied as a whole or
+    rejected with HTTPBadRequest.
+    """
+    if not isinstance(data, dict):
+        raise HTTPBadRequest(json_body={'error': 'Expected a JSON object'})
+    if hafalan is None and (not data.get('surah_name') or not data.get('ayah_range')): # Minimal surah dan ayah_range
+        raise HTTPBadRequest(json_body={'error': 'Missing required fields: surah_name, ayah_range'})
+
+    values = {}
+    if hafalan is None or 'surah_name' in data or 'ayah_range' in data:
+        surah_name = data.get('surah_name', hafalan.surah_name if hafalan else None)
+        ayah_range = data.get('ayah_range', hafalan.ayah_range if hafalan else None)
+        try:
+            columns = resolve_range(get_corpus(request), surah_name, ayah_range)
+        except AyahRangeError as e:
+            raise HTTPBadRequest(json_body={'error': str(e)})
+        values.update(columns, surah_name=surah_name, ayah_range=ayah_range)
+
+    if hafalan is None:
+        values['status'] = parse_status(data.get('status', 'belum')) # default ke 'belum'
+        values['catatan'] = data.get('catatan')
+        values['ayah_id'] = data.get('ayah_id') # Optional
+        values.update(schedule_values(values['status'], None, datetime.now(timezone.utc)))
+        return values
+
+    if 'status' in data:
+        new_status = parse_status(data['status'])
+        # If status is changing to 'selesai' and was not 'selesai' before,
+        # and last_reviewed_at is not provided in payload, set it to now
+        if new_status == HafalanStatusEnum.selesai and hafalan.status != HafalanStatusEnum.selesai:
+            if not data.get('last_reviewed_at'):
+                values['last_reviewed_at'] = datetime.now(timezone.utc)
+        values['status'] = new_status
+        values.update(schedule_values(new_status, hafalan.due_at, datetime.now(timezone.utc)))
+
+    if 'catatan' in data:
+        values['catatan'] = data['catatan']
+
+    # Allow manual update of last_reviewed_at if provided
+    if 'last_reviewed_at' in data and data['last_reviewed_at']:
+        values['last_reviewed_at'] = parse_reviewed_at(data['last_reviewed_at'], hafalan.last_reviewed_at)
+    elif 'last_reviewed_at' in data and data['last_reviewed_at'] is None: # Allow explicitly setting to null
+        values['last_reviewed_at'] = None
+
+    if 'ayah_id' in data:
+        values['ayah_id'] = data.get('ayah_id')
+    return values
 
-from ..models import Hafalan, User, HafalanStatusEnum # Sesuaikan path jika perlu
 
 # --- Views for Hafalan related to a specific user ---
 @view_config(route_name='user_hafalan_collection', request_method='POST', renderer='json')
@@ -13,53 +117,315 @@ def create_user_hafalan_view(request):
     # dan memverifikasi bahwa user yang membuat hafalan adalah user yang terautentikasi
     # atau admin. Untuk saat ini, kita asumsikan user_id dari path valid.
     
-    db_user = request.dbsession.query(User).filter_by(id=user_id).first()
-    if not db_user:
+    if not user_exists(request, user_id):
         raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
 
     try:
-        data = request.json_body
-        surah_name = data.get('surah_name')
-        ayah_range = data.get('ayah_range')
-        status_str = data.get('status', 'belum') # default ke 'belum'
-        catatan = data.get('catatan')
-        ayah_id = data.get('ayah_id') # Optional
+        new_hafalan = Hafalan(user_id=user_id, **hafalan_values(request, request.json_body))
+        request.dbsession.add(new_hafalan)
+        record_changes(request.dbsession, user_id, changed=[new_hafalan])
+        request.dbsession.flush()
+        apply_progress(request.dbsession, user_id, None, contribution(new_hafalan))
+        record_events(request.dbsession, user_id, [status_event(new_hafalan, datetime.now(timezone.utc))])
+        bump_collection_version(request.dbsession, user_id, User.hafalan_version)
+        return new_hafalan.to_dict()
+    except (HTTPBadRequest, HTTPNotFound) as e:
+        request.response.status_code = e.code
+        return e.json_body
+    except Exception as e:
+        request.response.status_code = 500
+        return {'error': str(e)}
 
-        if not surah_name or not ayah_range: # Minimal surah dan ayah_range
-            raise HTTPBadRequest(json_body={'error': 'Missing required fields: surah_name, ayah_range'})
+def plan_batch_operation(request, operation, existing, seen):
+    """
+    Validate one operation of a batch; returns ``(op, hafalan, values)``.
 
-        try:
-            status_enum = HafalanStatusEnum(status_str)
-        except ValueError:
-            raise HTTPBadRequest(json_body={'error': f'Invalid status value: {status_str}. Valid values are: {", ".join([s.value for s in HafalanStatusEnum])}'})
-
-        new_hafalan = Hafalan(
-            user_id=user_id,
-            surah_name=surah_name,
-            ayah_range=ayah_range,
-            status=status_enum,
-            catatan=catatan,
-            ayah_id=ayah_id
+    ``existing`` maps the ids of the user's entries named in the batch to
+    the loaded rows and ``seen`` collects the ids already planned.
+    """
+    if not isinstance(operation, dict):
+        raise HTTPBadRequest(json_body={'error': 'Each operation must be a JSON object'})
+    op = operation.get('op')
+    if op not in BATCH_OPERATIONS:
+        raise HTTPBadRequest(json_body={'error': f'Invalid op: {op}. Valid values are: {", ".join(BATCH_OPERATIONS)}'})
+    if op == 'create':
+        return op, None, hafalan_values(request, operation.get('data'))
+
+    hafalan_id = operation.get('id')
+    hafalan = existing.get(hafalan_id)
+    if hafalan is None:
+        raise HTTPNotFound(json_body={'error': f'Hafalan {hafalan_id} not found'})
+    if hafalan_id in seen:
+        raise HTTPBadRequest(json_body={'error': f'Hafalan {hafalan_id} appears in more than one operation'})
+    seen.add(hafalan_id)
+    if op == 'update':
+        return op, hafalan, hafalan_values(request, operation.get('data'), hafalan)
+    return op, hafalan, None
+
+@view_config(route_name='user_hafalan_batch', request_method='POST', renderer='json')
+def batch_user_hafalan_view(request):
+    # Example: POST /api/v1/users/1/hafalan:batch
+    # [{"op": "create", "data": {"surah_name": "Al-Mulk", "ayah_range": "1-10"}},
+    #  {"op": "update", "id": 5, "data": {"status": "selesai"}},
+    #  {"op": "delete", "id": 7}]
+    user_id = request.matchdict.get('user_id')
+    if get_collection_version(request.dbsession, user_id, User.hafalan_version) is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # The batch may update and delete entries, so the same check as hafalan_detail
+    if not request.user or ('user_id' in request.user and str(request.user['user_id']) != str(user_id)):
+        raise HTTPForbidden(json_body={'error': 'Not authorized to change this hafalan'})
+
+    try:
+        operations = request.json_body
+        if not isinstance(operations, list) or not operations:
+            raise HTTPBadRequest(json_body={'error': 'Expected a non-empty JSON array of operations'})
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise HTTPBadRequest(json_body={'error': f'Too many operations, at most {MAX_BATCH_OPERATIONS} per batch'})
+
+        # All named entries of the user in one query
+        ids = {
+            operation.get('id') for operation in operations
+            if isinstance(operation, dict) and isinstance(operation.get('id'), int)
+        }
+        existing = {
+            hafalan.id: hafalan
+            for hafalan in request.dbsession.query(Hafalan).filter(
+                Hafalan.user_id == user_id, Hafalan.id.in_(ids)
+            )
+        } if ids else {}
+
+        # Everything is validated before anything is applied
+        planned, errors, seen = [], [], set()
+        for index, operation in enumerate(operations):
+            try:
+                planned.append(plan_batch_operation(request, operation, existing, seen))
+            except (HTTPBadRequest, HTTPNotFound) as e:
+                errors.append(dict(e.json_body, index=index, status=e.code))
+        if errors:
+            raise HTTPBadRequest(json_body={
+                'error': f'{len(errors)} of {len(operations)} operations are invalid; nothing was applied',
+                'errors': errors,
+            })
+
+        applied, changes = [], []
+        for op, hafalan, values in planned:
+            if op == 'create':
+                hafalan = Hafalan(user_id=user_id, **values)
+                request.dbsession.add(hafalan)
+                changes.append((None, contribution(hafalan)))
+            elif op == 'update':
+                before = contribution(hafalan)
+                for column, value in values.items():
+                    setattr(hafalan, column, value)
+                changes.append((before, contribution(hafalan)))
+            else:
+                changes.append((contribution(hafalan), None))
+                request.dbsession.delete(hafalan)
+            applied.append((op, hafalan))
+        record_changes(
+            request.dbsession, user_id,
+            changed=[hafalan for op, hafalan in applied if op != 'delete'],
+            deleted=[hafalan for op, hafalan in applied if op == 'delete'],
         )
-        request.dbsession.add(new_hafalan)
+        # One flush: updates with the same columns and the deletes go out as
+        # executemany batches. Inserts need their new ids back: psycopg2
+        # batches them with RETURNING, on SQLite each is its own statement
         request.dbsession.flush()
-        return new_hafalan.to_dict()
-    except HTTPBadRequest as e:
+        apply_progress_changes(request.dbsession, user_id, changes)
+        now = datetime.now(timezone.utc)
+        record_events(request.dbsession, user_id, [
+            status_event(hafalan, now)
+            for (op, hafalan), (before, after) in zip(applied, changes) if status_changed(before, after)
+        ])
+        bump_collection_version(request.dbsession, user_id, User.hafalan_version)
+
+        # Server-side defaults of all written rows in one SELECT
+        written_ids = [hafalan.id for op, hafalan in applied if op != 'delete']
+        if written_ids:
+            request.dbsession.query(Hafalan).filter(Hafalan.id.in_(written_ids)).populate_existing().all()
+
+        results = []
+        for index, (op, hafalan) in enumerate(applied):
+            if op == 'delete':
+                results.append({'index': index, 'op': op, 'status': 204, 'id': hafalan.id})
+            else:
+                results.append({
+                    'index': index, 'op': op, 'status': 201 if op == 'create' else 200,
+                    'hafalan': hafalan.to_dict(),
+                })
+        return results
+    except (HTTPBadRequest, HTTPNotFound) as e:
         request.response.status_code = e.code
         return e.json_body
     except Exception as e:
         request.response.status_code = 500
         return {'error': str(e)}
 
+def parse_datetime_param(request, name):
+    value = request.params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        raise HTTPBadRequest(json_body={'error': f'Invalid {name}: {value}. Use an ISO 8601 date or datetime'})
+    # Naive values are UTC, like the stored timestamps
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def parse_sort(request):
+    """Read ``sort`` (``-`` prefix for descending); returns ``(field, descending)``."""
+    sort = request.params.get('sort') or DEFAULT_HAFALAN_SORT
+    field = sort[1:] if sort.startswith('-') else sort
+    if field not in HAFALAN_SORTS:
+        raise HTTPBadRequest(json_body={'error': f'Invalid sort: {sort}. Valid values are: {", ".join(HAFALAN_SORTS)} (prefix with - for descending)'})
+    return field, sort.startswith('-')
+
+def decode_hafalan_cursor(request, sort):
+    after = request.params.get('after')
+    if not after:
+        return None
+    if sort == 'id':
+        cursor = decode_cursor(after, 1)
+        if not isinstance(cursor[0], int):
+            raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+        return cursor
+    value, last_id = decode_cursor(after, 2)
+    try:
+        if value is not None:
+            value = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    if not isinstance(last_id, int):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    return [value, last_id]
+
 @view_config(route_name='user_hafalan_collection', request_method='GET', renderer='json')
 def list_user_hafalan_view(request):
+    # Example: GET /api/v1/users/1/hafalan?status=sedang,selesai&surah=al-mulk&sort=-updated_at&limit=20&after=<cursor>
+    # Without limit the whole (filtered, sorted) list is returned; with it the
+    # cursor for the next page is returned in the X-Next-Cursor header.
     user_id = request.matchdict.get('user_id')
-    db_user = request.dbsession.query(User).filter_by(id=user_id).first()
-    if not db_user:
+    version = get_collection_version(request.dbsession, user_id, User.hafalan_version)
+    if version is None:
         raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
 
-    hafalan_list = request.dbsession.query(Hafalan).filter_by(user_id=user_id).all()
-    return [h.to_dict() for h in hafalan_list]
+    fields = parse_fields(request, Hafalan)
+    sort, descending = parse_sort(request)
+    limit = parse_limit(request, default=None, maximum=MAX_HAFALAN_PAGE_SIZE)
+    statuses = [
+        parse_status(value.strip())
+        for value in request.params.get('status', '').split(',') if value.strip()
+    ]
+    surah = request.params.get('surah')
+    updated_since = parse_datetime_param(request, 'updated_since')
+    reviewed_before = parse_datetime_param(request, 'reviewed_before')
+    cursor = decode_hafalan_cursor(request, sort)
+
+    etag = collection_etag('hafalan', user_id, version, request)
+    not_modified = conditional_response(request, etag, PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    # ?fields=id,surah_name,status selects only those columns
+    query = query_fields(request.dbsession, Hafalan, fields).filter(Hafalan.user_id == user_id)
+    if statuses:
+        query = query.filter(Hafalan.status.in_(statuses))
+    if surah:
+        # Entries of a known surah by id, others by their free-text name
+        resolved = get_corpus(request).find_surah(surah)
+        query = query.filter(Hafalan.surah_id == resolved['id'] if resolved else Hafalan.surah_name == surah)
+    if updated_since is not None:
+        query = query.filter(Hafalan.updated_at >= updated_since)
+    if reviewed_before is not None:
+        query = query.filter(Hafalan.last_reviewed_at < reviewed_before)
+
+    if sort == 'id':
+        if cursor:
+            query = query.filter(Hafalan.id < cursor[0] if descending else Hafalan.id > cursor[0])
+        query = query.order_by(Hafalan.id.desc() if descending else Hafalan.id.asc())
+    else:
+        key = getattr(Hafalan, sort)
+        if cursor:
+            value, last_id = cursor
+            query = query.filter(keyset_after(key, Hafalan.id, value, last_id, descending))
+        query = query.order_by(*keyset_order(key, Hafalan.id, descending))
+
+    if limit is None:
+        return serialize(query.all(), fields)
+
+    # The sort key of the last row makes the cursor, projected or not
+    key_columns = [Hafalan.id] if sort == 'id' else [getattr(Hafalan, sort), Hafalan.id]
+    if fields is not None:
+        query = query.add_columns(*key_columns)
+    # Fetch one extra row to know whether there is a next page
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if fields is None:
+            key = [getattr(last, column.key) for column in key_columns]
+        else:
+            key = list(last[len(fields):])
+        set_next_cursor(request, [value.isoformat() if isinstance(value, datetime) else value for value in key])
+    if fields is not None:
+        rows = [row[:len(fields)] for row in rows]
+    return serialize(rows, fields)
+
+def parse_date_param(request, name):
+    value = request.params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPBadRequest(json_body={'error': f'Invalid {name} date: {value}. Use YYYY-MM-DD'})
+
+@view_config(route_name='user_hafalan_stats', request_method='GET', renderer='json')
+def user_hafalan_stats_view(request):
+    # Example: GET /api/v1/users/1/hafalan/stats?granularity=month&from=2026-01-01&to=2026-10-18
+    user_id = request.matchdict.get('user_id')
+    granularity = request.params.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise HTTPBadRequest(json_body={'error': f'Invalid granularity: {granularity}. Valid values are: {", ".join(GRANULARITIES)}'})
+    first = parse_date_param(request, 'from')
+    last = parse_date_param(request, 'to')
+
+    version = get_collection_version(request.dbsession, user_id, User.hafalan_version)
+    if version is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # Without explicit dates the window moves with the calendar
+    etag = collection_etag(f'hafalan-stats-{datetime.now(timezone.utc).date().isoformat()}', user_id, version, request)
+    not_modified = conditional_response(request, etag, PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        return hafalan_stats(request.dbsession, user_id, granularity, first=first, last=last)
+    except ValueError as e:
+        raise HTTPBadRequest(json_body={'error': str(e)})
+
+@view_config(route_name='user_progress', request_method='GET', renderer='json')
+def user_progress_view(request):
+    # Totals kept up to date by the hafalan writes: one primary-key lookup
+    user_id = request.matchdict.get('user_id')
+    progress = get_progress(request.dbsession, user_id)
+    if progress is not None:
+        return progress.to_dict()
+    if not user_exists(request, user_id):
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # No hafalan written yet
+    return UserProgress(user_id=int(user_id), **dict.fromkeys(USER_COUNTERS, 0)).to_dict()
+
+@view_config(route_name='user_surah_progress', request_method='GET', renderer='json')
+def user_surah_progress_view(request):
+    user_id = request.matchdict.get('user_id')
+    rows = request.dbsession.query(UserSurahProgress).filter_by(user_id=user_id).order_by(UserSurahProgress.surah_id).all()
+    # Only an empty result needs the existence check
+    if not rows and not user_exists(request, user_id):
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    return [row.to_dict() for row in rows]
 
 # --- Views for specific Hafalan (by hafalan_id) ---
 @view_config(route_name='hafalan_detail', request_method='GET', renderer='json')
@@ -83,51 +449,21 @@ def update_hafalan_view(request):
     if not request.user or ('user_id' in request.user and hafalan.user_id != request.user['user_id']):
         # Add admin check here if you have roles, e.g. and not request.user.is_admin()
         raise HTTPForbidden(json_body={'error': 'Not authorized to update this hafalan'})
-        
-    try:
-        data = request.json_body
-        if 'surah_name' in data:
-            hafalan.surah_name = data['surah_name']
-        if 'ayah_range' in data:
-            hafalan.ayah_range = data['ayah_range']
 
-        if 'status' in data:
-            try:
-                new_status = HafalanStatusEnum(data['status'])
-                # If status is changing to 'selesai' and was not 'selesai' before
-                if new_status == HafalanStatusEnum.selesai and hafalan.status != HafalanStatusEnum.selesai:
-                    # If last_reviewed_at is not provided in payload or is null, set it to now
-                    if not data.get('last_reviewed_at'):
-                        from datetime import datetime, timezone
-                        hafalan.last_reviewed_at = datetime.now(timezone.utc)
-                hafalan.status = new_status
-            except ValueError:
-                raise HTTPBadRequest(json_body={'error': f'Invalid status value: {data["status"]}. Valid values are: {", ".join([s.value for s in HafalanStatusEnum])}'})
-        
-        if 'catatan' in data:
-            hafalan.catatan = data['catatan']
-        
-        # Allow manual update of last_reviewed_at if provided
-        if 'last_reviewed_at' in data and data['last_reviewed_at']:
-            from datetime import datetime
-            try:
-                # Ensure it's parsed correctly, handling potential 'Z' for UTC
-                dt_str = data['last_reviewed_at']
-                if dt_str.endswith('Z'):
-                    dt_str = dt_str[:-1] + '+00:00'
-                hafalan.last_reviewed_at = datetime.fromisoformat(dt_str)
-            except (ValueError, TypeError):
-                 # Keep existing or set to None if parsing fails and it was intended to be cleared
-                 hafalan.last_reviewed_at = hafalan.last_reviewed_at if hafalan.last_reviewed_at else None
-        elif 'last_reviewed_at' in data and data['last_reviewed_at'] is None: # Allow explicitly setting to null
-            hafalan.last_reviewed_at = None
-
-        if 'ayah_id' in data:
-            hafalan.ayah_id = data.get('ayah_id')
+    before = contribution(hafalan)
+    try:
+        for column, value in hafalan_values(request, request.json_body, hafalan).items():
+            setattr(hafalan, column, value)
 
+        record_changes(request.dbsession, hafalan.user_id, changed=[hafalan])
         request.dbsession.flush()
+        after = contribution(hafalan)
+        apply_progress(request.dbsession, hafalan.user_id, before, after)
+        if status_changed(before, after):
+            record_events(request.dbsession, hafalan.user_id, [status_event(hafalan, datetime.now(timezone.utc))])
+        bump_collection_version(request.dbsession, hafalan.user_id, User.hafalan_version)
         return hafalan.to_dict()
-    except HTTPBadRequest as e:
+    except (HTTPBadRequest, HTTPNotFound) as e:
         request.response.status_code = e.code
         return e.json_body
     except Exception as e:
@@ -146,7 +482,11 @@ def delete_hafalan_view(request):
         # Add admin check here
         raise HTTPForbidden(json_body={'error': 'Not authorized to delete this hafalan'})
 
+    before = contribution(hafalan)
+    record_changes(request.dbsession, hafalan.user_id, deleted=[hafalan])
     request.dbsession.delete(hafalan)
     request.dbsession.flush()
+    apply_progress(request.dbsession, hafalan.user_id, before, None)
+    bump_collection_version(request.dbsession, hafalan.user_id, User.hafalan_version)
     request.response.status_code = 204 # No Content
     return {}
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Corpus in the shape of the alquran.cloud API.
+
+The frontend used to fetch ``/surah`` and the quran-uthmani, en.sahih and
+id.indonesian editions of ``/surah/{n}`` from alquran.cloud and zip them in
+the browser. These views serve the same combined payloads from the corpus
+cache.
+"""
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPNotFound
+
+from ..utils.corpus_cache import corpus_response, get_corpus
+
+SOURCE = 'local'
+
+
+def quran_surah(surah):
+    """Surah metadata as alquran.cloud returns it."""
+    return {
+        'number': surah['surah_number'],
+        'name': surah['name_arabic'],
+        'englishName': surah['name_english'],
+        'englishNameTranslation': surah['english_translation'],
+        'numberOfAyahs': surah['number_of_ayahs'],
+        'revelationType': surah['revelation_type'],
+    }
+
+
+def quran_surah_with_ayahs(corpus, surah):
+    """Same payload as the frontend's ``quranService.getSurahWithAyahs``."""
+    return {
+        'surah': quran_surah(surah),
+        'ayahs': [
+            {
+                'number': corpus.global_ayah_number(ayah),
+                'text': ayah['text_uthmani'],
+                'numberInSurah': ayah['ayah_number_in_surah'],
+                'translation': {
+                    'en': ayah['translation_en'],
+                    'id': ayah['translation_id'],
+                },
+            }
+            for ayah in corpus.surah_ayahs(surah['id'])
+        ],
+        'source': SOURCE,
+    }
+
+
+@view_config(route_name='quran_surahs', request_method='GET', renderer='json')
+def list_quran_surahs_view(request):
+    corpus = get_corpus(request)
+    payload = corpus.payload(
+        'quran:surahs', lambda: [quran_surah(surah) for surah in corpus.surahs]
+    )
+    return corpus_response(request, corpus, 'quran:surahs', payload)
+
+
+@view_config(route_name='quran_surah_detail', request_method='GET', renderer='json')
+def get_quran_surah_view(request):
+    surah_number = request.matchdict.get('surah_number')
+    corpus = get_corpus(request)
+    try:
+        surah = corpus.surahs_by_number.get(int(surah_number))
+    except ValueError:
+        surah = None
+    if not surah:
+        raise HTTPNotFound(json_body={'error': f'Surah number {surah_number} not found'})
+
+    key = f'quran:surah:{surah["surah_number"]}'
+    payload = corpus.payload(key, lambda: quran_surah_with_ayahs(corpus, surah))
+    return corpus_response(request, corpus, key, payload)
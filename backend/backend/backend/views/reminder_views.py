@@ -1,8 +1,39 @@
 from pyramid.view import view_config
 from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPForbidden
-from datetime import datetime
+from sqlalchemy import func
+from datetime import datetime, timedelta
 
-from ..models import Reminder, User # Adjust path if necessary
+from ..models import Reminder, ReminderOccurrence, User # Adjust path if necessary
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    bump_collection_version,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.identity import user_exists
+from ..utils.pagination import decode_cursor, keyset_after, parse_limit, set_next_cursor
+from ..utils.projection import parse_fields, project, query_fields, serialize
+from ..utils.recurrence import (
+    RecurrenceError,
+    as_utc,
+    expand,
+    occurrence_dict,
+    occurrences,
+    one_shot_window,
+    series_window,
+    set_recurrence,
+)
+from ..utils.reminder_dispatch import DISPATCH_RESET, reset_dispatch
+from ..utils.sync import delete_where, record_changes, update_where
+from .hafalan_views import parse_datetime_param
+
+# Longest window of occurrences one listing may expand
+MAX_WINDOW_DAYS = 366
+MAX_REMINDER_PAGE_SIZE = 200
+BULK_ACTIONS = ('complete', 'snooze', 'delete')
+MAX_BULK_IDS = 1000
+MAX_SNOOZE_MINUTES = 366 * 24 * 60
 
 @view_config(route_name='user_reminders_collection', request_method='POST', renderer='json')
 def create_user_reminder_view(request):
@@ -12,8 +43,7 @@ def create_user_reminder_view(request):
     if not request.user or str(request.user['user_id']) != user_id_from_path:
         raise HTTPForbidden(json_body={'error': 'Not authorized to create reminder for this user'})
 
-    db_user = request.dbsession.query(User).filter_by(id=user_id_from_path).first()
-    if not db_user:
+    if not user_exists(request, user_id_from_path):
         raise HTTPNotFound(json_body={'error': f'User with id {user_id_from_path} not found'})
 
     try:
@@ -35,39 +65,140 @@ def create_user_reminder_view(request):
             due_date=due_date_dt,
             is_completed=data.get('is_completed', False)
         )
+        try:
+            set_recurrence(new_reminder, data.get('recurrence'))
+        except RecurrenceError as e:
+            raise HTTPBadRequest(json_body={'error': str(e)})
         request.dbsession.add(new_reminder)
+        record_changes(request.dbsession, user_id_from_path, changed=[new_reminder])
         request.dbsession.flush()
+        bump_collection_version(request.dbsession, user_id_from_path, User.reminder_version)
         return new_reminder.to_dict()
-    except HTTPBadRequest as e:
+    except (HTTPBadRequest, HTTPNotFound) as e:
         request.response.status_code = e.code
         return e.json_body
     except Exception as e:
         request.response.status_code = 500
         return {'error': str(e)}
 
+def parse_window(request):
+    """``(from, to)`` of an occurrence listing, or None to list the reminders themselves."""
+    first = parse_datetime_param(request, 'from')
+    last = parse_datetime_param(request, 'to')
+    if first is None and last is None:
+        return None
+    if first is None or last is None:
+        raise HTTPBadRequest(json_body={'error': 'Specify both from and to to list occurrences'})
+    if last < first:
+        raise HTTPBadRequest(json_body={'error': 'to must not be before from'})
+    if last - first > timedelta(days=MAX_WINDOW_DAYS):
+        raise HTTPBadRequest(json_body={'error': f'The window between from and to must not exceed {MAX_WINDOW_DAYS} days'})
+    return first, last
+
+def parse_completed(request):
+    # Optional filtering: ?completed=true or ?completed=false
+    return {'true': True, 'false': False}.get((request.params.get('completed') or '').lower())
+
+def decode_reminder_cursor(request):
+    after = request.params.get('after')
+    if not after:
+        return None
+    due_date, last_id = decode_cursor(after, 2)
+    try:
+        due_date = as_utc(datetime.fromisoformat(due_date))
+    except (TypeError, ValueError):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    if not isinstance(last_id, int):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    return due_date, last_id
+
+def occurrence_key(item):
+    return as_utc(datetime.fromisoformat(item['due_date'])), item['id']
+
+def list_occurrences(request, user_id, window, fields, completed, limit, cursor):
+    # One-shot reminders are read in due_date order from the
+    # (user_id, is_completed, due_date) index, at most a page of them;
+    # recurring reminders (one row per schedule) are expanded in the window
+    first, last = window
+    if cursor is not None:
+        first = max(first, cursor[0])
+    query = request.dbsession.query(Reminder).filter(Reminder.user_id == user_id)
+    one_shot = query.filter(one_shot_window(first, last))
+    series = query.filter(series_window(first, last))
+    if completed is not None:
+        one_shot = one_shot.filter(Reminder.is_completed == completed)
+        if not completed:
+            # A completed series has no open occurrences
+            series = series.filter(Reminder.is_completed == False)
+    if cursor is not None:
+        one_shot = one_shot.filter(keyset_after(Reminder.due_date, Reminder.id, cursor[0], cursor[1], False))
+    one_shot = one_shot.order_by(Reminder.due_date, Reminder.id)
+    if limit is not None:
+        one_shot = one_shot.limit(limit + 1)
+
+    items = expand(request.dbsession, one_shot.all() + series.all(), first, last)
+    if completed is not None:
+        items = [item for item in items if item['is_completed'] == completed]
+    if cursor is not None:
+        items = [item for item in items if occurrence_key(item) > cursor]
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        set_next_cursor(request, [items[-1]['due_date'], items[-1]['id']])
+    return project(items, fields)
+
 @view_config(route_name='user_reminders_collection', request_method='GET', renderer='json')
 def list_user_reminders_view(request):
+    # Example: GET /api/v1/users/1/reminders?completed=false&from=2026-10-18&to=2026-10-25&limit=20&after=<cursor>
+    # Soonest first; with limit the cursor for the next page is returned in
+    # the X-Next-Cursor header.
     user_id_from_path = request.matchdict.get('user_id')
 
     # Authorization: Ensure the authenticated user is listing their own reminders
     if not request.user or str(request.user['user_id']) != user_id_from_path:
         raise HTTPForbidden(json_body={'error': 'Not authorized to view reminders for this user'})
 
-    db_user = request.dbsession.query(User).filter_by(id=user_id_from_path).first()
-    if not db_user:
+    version = get_collection_version(request.dbsession, user_id_from_path, User.reminder_version)
+    if version is None:
         raise HTTPNotFound(json_body={'error': f'User with id {user_id_from_path} not found'})
 
-    # Optional filtering: ?completed=true or ?completed=false
-    completed_filter_str = request.params.get('completed')
-    query = request.dbsession.query(Reminder).filter_by(user_id=user_id_from_path)
-    if completed_filter_str:
-        if completed_filter_str.lower() == 'true':
-            query = query.filter_by(is_completed=True)
-        elif completed_filter_str.lower() == 'false':
-            query = query.filter_by(is_completed=False)
-            
-    reminders = query.order_by(Reminder.due_date).all()
-    return [reminder.to_dict() for reminder in reminders]
+    fields = parse_fields(request, Reminder)
+    window = parse_window(request)
+    limit = parse_limit(request, default=None, maximum=MAX_REMINDER_PAGE_SIZE)
+    cursor = decode_reminder_cursor(request)
+    etag = collection_etag('reminders', user_id_from_path, version, request)
+    not_modified = conditional_response(request, etag, PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    completed = parse_completed(request)
+    if window is not None:
+        return list_occurrences(request, user_id_from_path, window, fields, completed, limit, cursor)
+
+    # Served in order by the (user_id, is_completed, due_date) index when
+    # filtered by completion
+    query = query_fields(request.dbsession, Reminder, fields).filter(Reminder.user_id == user_id_from_path)
+    if completed is not None:
+        query = query.filter(Reminder.is_completed == completed)
+    if cursor is not None:
+        query = query.filter(keyset_after(Reminder.due_date, Reminder.id, cursor[0], cursor[1], False))
+    query = query.order_by(Reminder.due_date, Reminder.id)
+
+    if limit is None:
+        return serialize(query.all(), fields)
+
+    # The cursor is made of the last row's due_date and id, projected or not
+    if fields is not None:
+        query = query.add_columns(Reminder.due_date, Reminder.id)
+    # Fetch one extra row to know whether there is a next page
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key = [last.due_date, last.id] if fields is None else list(last[len(fields):])
+        set_next_cursor(request, [as_utc(key[0]).isoformat(), key[1]])
+    if fields is not None:
+        rows = [row[:len(fields)] for row in rows]
+    return serialize(rows, fields)
 
 @view_config(route_name='reminder_detail', request_method='GET', renderer='json')
 def get_reminder_view(request):
@@ -101,15 +232,30 @@ def update_reminder_view(request):
             reminder.ayat = data['ayat']
         if 'due_date' in data:
             try:
-                reminder.due_date = datetime.fromisoformat(data['due_date'])
+                due_date = datetime.fromisoformat(data['due_date'])
             except ValueError:
                 raise HTTPBadRequest(json_body={'error': 'Invalid due_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS).'})
+            # Compared as aware UTC: PostgreSQL loads aware values, SQLite naive ones
+            if as_utc(due_date) != as_utc(reminder.due_date):
+                # Rescheduled: deliver again at the new time
+                reminder.due_date = due_date
+                reset_dispatch(reminder)
+        if 'recurrence' in data or 'due_date' in data:
+            recurrence = data['recurrence'] if 'recurrence' in data else reminder.recurrence
+            if recurrence != reminder.recurrence:
+                reset_dispatch(reminder)
+            try:
+                set_recurrence(reminder, recurrence)
+            except RecurrenceError as e:
+                raise HTTPBadRequest(json_body={'error': str(e)})
         if 'is_completed' in data:
             reminder.is_completed = bool(data['is_completed'])
         
+        record_changes(request.dbsession, reminder.user_id, changed=[reminder])
         request.dbsession.flush()
+        bump_collection_version(request.dbsession, reminder.user_id, User.reminder_version)
         return reminder.to_dict()
-    except HTTPBadRequest as e:
+    except (HTTPBadRequest, HTTPNotFound) as e:
         request.response.status_code = e.code
         return e.json_body
     except Exception as e:
@@ -127,7 +273,157 @@ def delete_reminder_view(request):
     if not request.user or reminder.user_id != request.user['user_id']:
         raise HTTPForbidden(json_body={'error': 'Not authorized to delete this reminder'})
 
+    record_changes(request.dbsession, reminder.user_id, deleted=[reminder])
     request.dbsession.delete(reminder)
     request.dbsession.flush()
+    bump_collection_version(request.dbsession, reminder.user_id, User.reminder_version)
     request.response.status_code = 204 # No Content
     return {}
+
+@view_config(route_name='reminder_occurrences', request_method='PUT', renderer='json')
+def update_reminder_occurrence_view(request):
+    # Example: PUT /api/v1/reminders/3/occurrences {"occurs_at": "2026-10-23T05:00:00Z", "is_completed": true}
+    reminder_id = request.matchdict.get('reminder_id')
+    reminder = request.dbsession.query(Reminder).filter_by(id=reminder_id).first()
+    if not reminder:
+        raise HTTPNotFound(json_body={'error': f'Reminder with id {reminder_id} not found'})
+
+    # Authorization: Ensure the authenticated user owns this reminder
+    if not request.user or reminder.user_id != request.user['user_id']:
+        raise HTTPForbidden(json_body={'error': 'Not authorized to update this reminder'})
+
+    try:
+        data = request.json_body
+        if not reminder.recurrence:
+            raise HTTPBadRequest(json_body={'error': 'Only occurrences of recurring reminders can be updated; update the reminder instead'})
+        if not isinstance(data, dict) or 'occurs_at' not in data or not isinstance(data.get('is_completed'), bool):
+            raise HTTPBadRequest(json_body={'error': 'Expected occurs_at and a boolean is_completed'})
+        try:
+            occurs_at = as_utc(datetime.fromisoformat(str(data['occurs_at']).replace('Z', '+00:00')))
+        except ValueError:
+            raise HTTPBadRequest(json_body={'error': 'Invalid occurs_at format. Use ISO format (YYYY-MM-DDTHH:MM:SS).'})
+        if not occurrences(reminder, occurs_at, occurs_at):
+            raise HTTPBadRequest(json_body={'error': f'{occurs_at.isoformat()} is not an occurrence of this reminder'})
+
+        override = request.dbsession.get(ReminderOccurrence, (reminder.id, occurs_at))
+        if data['is_completed'] and override is None:
+            request.dbsession.add(ReminderOccurrence(reminder_id=reminder.id, occurs_at=occurs_at, is_completed=True))
+        elif not data['is_completed'] and override is not None:
+            # Only completed occurrences are stored
+            request.dbsession.delete(override)
+
+        record_changes(request.dbsession, reminder.user_id, changed=[reminder])
+        request.dbsession.flush()
+        bump_collection_version(request.dbsession, reminder.user_id, User.reminder_version)
+        return occurrence_dict(reminder, occurs_at, data['is_completed'])
+    except (HTTPBadRequest, HTTPNotFound) as e:
+        request.response.status_code = e.code
+        return e.json_body
+    except Exception as e:
+        request.response.status_code = 500
+        return {'error': str(e)}
+
+def parse_bulk_datetime(value, name):
+    try:
+        return as_utc(datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value))
+    except (AttributeError, TypeError, ValueError):
+        raise HTTPBadRequest(json_body={'error': f'Invalid {name}: {value}. Use an ISO 8601 datetime'})
+
+def bulk_criteria(request, user_id, data):
+    """SQL criteria selecting the user's reminders named by ``ids`` or ``filter``."""
+    criteria = [Reminder.user_id == user_id]
+    if ('ids' in data) == ('filter' in data):
+        raise HTTPBadRequest(json_body={'error': 'Specify either ids or filter'})
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise HTTPBadRequest(json_body={'error': 'ids must be a non-empty array of reminder ids'})
+        if len(ids) > MAX_BULK_IDS:
+            raise HTTPBadRequest(json_body={'error': f'Too many ids, at most {MAX_BULK_IDS} per request'})
+        return criteria + [Reminder.id.in_(set(ids))]
+
+    conditions = data['filter']
+    if not isinstance(conditions, dict) or not conditions:
+        raise HTTPBadRequest(json_body={'error': 'filter must be an object with due_before, due_after and/or completed'})
+    unknown = sorted(set(conditions) - {'due_before', 'due_after', 'completed'})
+    if unknown:
+        raise HTTPBadRequest(json_body={'error': f'Unknown filter fields: {", ".join(unknown)}'})
+    if 'due_before' in conditions:
+        criteria.append(Reminder.due_date < parse_bulk_datetime(conditions['due_before'], 'due_before'))
+    if 'due_after' in conditions:
+        criteria.append(Reminder.due_date >= parse_bulk_datetime(conditions['due_after'], 'due_after'))
+    if 'completed' in conditions:
+        if not isinstance(conditions['completed'], bool):
+            raise HTTPBadRequest(json_body={'error': 'filter.completed must be a boolean'})
+        criteria.append(Reminder.is_completed == conditions['completed'])
+    return criteria
+
+def shifted(dialect_name, column, minutes):
+    """
+    ``column`` (a timestamp) moved ``minutes`` later, computed by the
+    database; None on dialects without a known way to shift timestamps.
+    """
+    if dialect_name == 'postgresql':
+        return column + timedelta(minutes=minutes)
+    if dialect_name == 'sqlite':
+        # Whole minutes leave the stored fractional seconds as they are
+        return func.datetime(column, f'+{minutes} minutes').concat(func.substr(column, 20))
+    return None
+
+@view_config(route_name='user_reminders_bulk', request_method='POST', renderer='json')
+def bulk_user_reminders_view(request):
+    # Example: POST /api/v1/users/1/reminders:bulk
+    # {"action": "complete", "filter": {"due_before": "2026-10-18T00:00:00Z"}}
+    # {"action": "snooze", "ids": [3, 4], "minutes": 60}
+    # {"action": "delete", "filter": {"completed": true}}
+    # One UPDATE of the user row counts the matching reminders, reserves
+    # their sequence numbers and bumps the version; then one set-based
+    # UPDATE or DELETE (with its tombstones) of the reminders
+    user_id_from_path = request.matchdict.get('user_id')
+
+    # Authorization: Ensure the authenticated user is changing their own reminders
+    if not request.user or str(request.user['user_id']) != user_id_from_path:
+        raise HTTPForbidden(json_body={'error': 'Not authorized to change reminders for this user'})
+
+    if not user_exists(request, user_id_from_path):
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id_from_path} not found'})
+
+    try:
+        data = request.json_body
+        if not isinstance(data, dict):
+            raise HTTPBadRequest(json_body={'error': 'Expected a JSON object'})
+        action = data.get('action')
+        if action not in BULK_ACTIONS:
+            raise HTTPBadRequest(json_body={'error': f'Invalid action: {action}. Valid values are: {", ".join(BULK_ACTIONS)}'})
+        criteria = bulk_criteria(request, user_id_from_path, data)
+
+        if action == 'complete':
+            # A series is not finished by one of its occurrences being due;
+            # occurrences are completed through PUT /reminders/{id}/occurrences
+            affected = update_where(
+                request.dbsession, user_id_from_path, Reminder,
+                criteria + [Reminder.is_completed.isnot(True), Reminder.recurrence.is_(None)],
+                {'is_completed': True}, User.reminder_version,
+            )
+        elif action == 'snooze':
+            minutes = data.get('minutes')
+            if isinstance(minutes, bool) or not isinstance(minutes, int) or not 1 <= minutes <= MAX_SNOOZE_MINUTES:
+                raise HTTPBadRequest(json_body={'error': f'minutes must be an integer between 1 and {MAX_SNOOZE_MINUTES}'})
+            # Recurring reminders keep their schedule, like for complete above
+            due_date = shifted(request.dbsession.get_bind().dialect.name, Reminder.due_date, minutes)
+            if due_date is None:
+                raise HTTPBadRequest(json_body={'error': 'Snoozing is not supported on this database'})
+            affected = update_where(
+                request.dbsession, user_id_from_path, Reminder,
+                criteria + [Reminder.recurrence.is_(None)],
+                dict(DISPATCH_RESET, due_date=due_date), User.reminder_version,
+            )
+        else:
+            affected = delete_where(request.dbsession, user_id_from_path, Reminder, criteria, User.reminder_version)
+        return {'action': action, 'affected': affected}
+    except (HTTPBadRequest, HTTPNotFound) as e:
+        request.response.status_code = e.code
+        return e.json_body
+    except Exception as e:
+        request.response.status_code = 500
+        return {'error': str(e)}
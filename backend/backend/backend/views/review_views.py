@@ -0,0 +1,111 @@
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPForbidden
+from datetime import datetime, timezone
+
+from ..models import Hafalan, HafalanStatusEnum, User
+from ..utils.activity import record_events, review_event
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    bump_collection_version,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.pagination import decode_cursor, keyset_after, parse_limit, set_next_cursor
+from ..utils.review import MAX_QUALITY, MIN_QUALITY, schedule_review
+from ..utils.sync import record_changes
+from .hafalan_views import parse_datetime_param, parse_reviewed_at
+
+DEFAULT_QUEUE_SIZE = 20
+MAX_QUEUE_SIZE = 100
+
+
+@view_config(route_name='hafalan_review', request_method='POST', renderer='json')
+def review_hafalan_view(request):
+    # Example: POST /api/v1/hafalan/5/review {"quality": 4}
+    # quality grades the recall from 0 (forgotten) to 5 (perfect)
+    hafalan_id = request.matchdict.get('hafalan_id')
+    hafalan = request.dbsession.query(Hafalan).filter_by(id=hafalan_id).first()
+    if not hafalan:
+        raise HTTPNotFound(json_body={'error': 'Hafalan not found'})
+
+    if not request.user or ('user_id' in request.user and hafalan.user_id != request.user['user_id']):
+        raise HTTPForbidden(json_body={'error': 'Not authorized to review this hafalan'})
+
+    try:
+        data = request.json_body
+        if not isinstance(data, dict):
+            raise HTTPBadRequest(json_body={'error': 'Expected a JSON object'})
+        quality = data.get('quality')
+        if isinstance(quality, bool) or not isinstance(quality, int) or not MIN_QUALITY <= quality <= MAX_QUALITY:
+            raise HTTPBadRequest(json_body={'error': f'quality must be an integer between {MIN_QUALITY} and {MAX_QUALITY}'})
+        if hafalan.status == HafalanStatusEnum.belum:
+            raise HTTPBadRequest(json_body={'error': 'Only hafalan being memorized (sedang) or finished (selesai) can be reviewed'})
+
+        reviewed_at = datetime.now(timezone.utc)
+        if data.get('reviewed_at'):
+            reviewed_at = parse_reviewed_at(data['reviewed_at'], None)
+            if reviewed_at is None:
+                raise HTTPBadRequest(json_body={'error': f'Invalid reviewed_at: {data["reviewed_at"]}. Use an ISO 8601 datetime'})
+            if reviewed_at.tzinfo is None:
+                reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+
+        schedule_review(hafalan, quality, reviewed_at)
+        record_changes(request.dbsession, hafalan.user_id, changed=[hafalan])
+        request.dbsession.flush()
+        record_events(request.dbsession, hafalan.user_id, [review_event(hafalan, quality, reviewed_at)])
+        bump_collection_version(request.dbsession, hafalan.user_id, User.hafalan_version)
+        return hafalan.to_dict()
+    except (HTTPBadRequest, HTTPNotFound) as e:
+        request.response.status_code = e.code
+        return e.json_body
+    except Exception as e:
+        request.response.status_code = 500
+        return {'error': str(e)}
+
+
+def decode_queue_cursor(request):
+    after = request.params.get('after')
+    if not after:
+        return None
+    due_at, last_id = decode_cursor(after, 2)
+    try:
+        due_at = datetime.fromisoformat(due_at)
+    except (TypeError, ValueError):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    if not isinstance(last_id, int):
+        raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {after}'})
+    return due_at, last_id
+
+
+@view_config(route_name='user_review_queue', request_method='GET', renderer='json')
+def user_review_queue_view(request):
+    # Example: GET /api/v1/users/1/review-queue?limit=20&until=2026-10-18T23:59:59Z
+    # Entries due soonest first, read in order from the (user_id, due_at)
+    # index; the cursor for the next page is in the X-Next-Cursor header.
+    user_id = request.matchdict.get('user_id')
+    version = get_collection_version(request.dbsession, user_id, User.hafalan_version)
+    if version is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+
+    limit = parse_limit(request, default=DEFAULT_QUEUE_SIZE, maximum=MAX_QUEUE_SIZE)
+    until = parse_datetime_param(request, 'until')
+    cursor = decode_queue_cursor(request)
+
+    etag = collection_etag('review-queue', user_id, version, request)
+    not_modified = conditional_response(request, etag, PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    query = request.dbsession.query(Hafalan).filter(Hafalan.user_id == user_id, Hafalan.due_at.isnot(None))
+    if until is not None:
+        query = query.filter(Hafalan.due_at <= until)
+    if cursor:
+        query = query.filter(keyset_after(Hafalan.due_at, Hafalan.id, cursor[0], cursor[1], False))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(Hafalan.due_at.asc(), Hafalan.id.asc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        set_next_cursor(request, [rows[-1].due_at.isoformat(), rows[-1].id])
+    return [row.to_dict() for row in rows]
@@ -1,8 +1,15 @@
 from pyramid.view import view_config
 from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPConflict
-from sqlalchemy import or_
 
 from ..models import Surah, Ayah # Adjust path if necessary
+from ..models.search import unindex_ayahs
+from ..utils.corpus_cache import corpus_response, get_corpus, invalidate_corpus
+from ..utils.http_cache import CORPUS_CACHE_CONTROL, conditional_response, content_etag
+from ..utils.pagination import parse_limit
+from ..utils.projection import parse_fields, project
+from ..utils.surah_resolver import DEFAULT_AUTOCOMPLETE_LIMIT
+
+MAX_AUTOCOMPLETE_LIMIT = 20
 
 @view_config(route_name='surahs_collection', request_method='POST', renderer='json', permission='admin') # Assuming admin permission
 def create_surah_view(request):
@@ -28,6 +35,7 @@ def create_surah_view(request):
         )
         request.dbsession.add(new_surah)
         request.dbsession.flush() # To get ID
+        invalidate_corpus(request)
         return new_surah.to_dict()
     except (HTTPBadRequest, HTTPConflict) as e:
         request.response.status_code = e.code
@@ -38,38 +46,46 @@ def create_surah_view(request):
 
 @view_config(route_name='surahs_collection', request_method='GET', renderer='json')
 def list_surahs_view(request):
-    surahs = request.dbsession.query(Surah).order_by(Surah.surah_number).all()
-    return [surah.to_dict() for surah in surahs]
+    fields = parse_fields(request, Surah)
+    corpus = get_corpus(request)
+    if fields is None:
+        return corpus_response(request, corpus, 'surahs', corpus.surahs)
+    key = f'surahs:{",".join(fields)}'
+    payload = corpus.payload(key, lambda: project(corpus.surahs, fields))
+    return corpus_response(request, corpus, key, payload)
+
+@view_config(route_name='surahs_autocomplete', request_method='GET', renderer='json')
+def autocomplete_surahs_view(request):
+    """Surahs matching a number, name or transliteration prefix (``?q=``)."""
+    query = request.params.get('q', '').strip()
+    if not query:
+        raise HTTPBadRequest(json_body={'error': 'Query parameter q is required'})
+    limit = parse_limit(request, DEFAULT_AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT)
+    corpus = get_corpus(request)
+    surahs = corpus.resolver.autocomplete(query, limit=limit)
+    # Queries are open-ended, so the validator is not memoized on the snapshot
+    not_modified = conditional_response(request, content_etag(surahs), CORPUS_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+    return surahs
 
 def get_surah_by_id_or_number(request, surah_id_or_number):
-    """Helper to get Surah by ID or surah_number."""
-    try:
-        surah_identifier = int(surah_id_or_number)
-        # Try to find by ID first, then by surah_number if it's a plausible number for surah_number
-        surah = request.dbsession.query(Surah).filter(
-            or_(Surah.id == surah_identifier, Surah.surah_number == surah_identifier)
-        ).first()
-    except ValueError: # If not an int, assume it's a name (though route expects number/id)
-        # This part might not be hit if route constrains to digits, but good for robustness
-        surah = request.dbsession.query(Surah).filter(
-            or_(Surah.name_english.ilike(f'%{surah_id_or_number}%'), Surah.name_arabic.ilike(f'%{surah_id_or_number}%'))
-        ).first()
-
-    if not surah:
-        # If it was an integer, try specifically by surah_number if ID search failed
-        if isinstance(surah_identifier, int):
-             surah = request.dbsession.query(Surah).filter(Surah.surah_number == surah_identifier).first()
-
-    return surah
+    """Helper to get the Surah instance by ID, surah_number or name."""
+    surah = get_corpus(request).find_surah(surah_id_or_number)
+    if surah is None:
+        return None
+    # Primary key lookup, answered from the identity map when already loaded
+    return request.dbsession.get(Surah, surah['id'])
 
 
 @view_config(route_name='surah_detail', request_method='GET', renderer='json')
 def get_surah_view(request):
     surah_id_or_number = request.matchdict.get('surah_id_or_number')
-    surah = get_surah_by_id_or_number(request, surah_id_or_number)
+    corpus = get_corpus(request)
+    surah = corpus.find_surah(surah_id_or_number)
     if not surah:
         raise HTTPNotFound(json_body={'error': f'Surah with identifier {surah_id_or_number} not found'})
-    return surah.to_dict()
+    return corpus_response(request, corpus, f'surah:{surah["id"]}', surah)
 
 @view_config(route_name='surah_detail', request_method='PUT', renderer='json', permission='admin') # Assuming admin permission
 def update_surah_view(request):
@@ -98,6 +114,7 @@ def update_surah_view(request):
             surah.revelation_type = data.get('revelation_type')
         
         request.dbsession.flush()
+        invalidate_corpus(request)
         return surah.to_dict()
     except HTTPConflict as e:
         request.response.status_code = e.code
@@ -113,17 +130,26 @@ def delete_surah_view(request):
     if not surah:
         raise HTTPNotFound(json_body={'error': f'Surah with identifier {surah_id_or_number} not found'})
     
+    ayah_ids = [ayah_id for ayah_id, in request.dbsession.query(Ayah.id).filter_by(surah_id=surah.id)]
     request.dbsession.delete(surah)
     request.dbsession.flush()
+    unindex_ayahs(request.dbsession, ayah_ids)
+    invalidate_corpus(request)
     request.response.status_code = 204 # No Content
     return {}
 
 @view_config(route_name='surah_ayahs_collection', request_method='GET', renderer='json')
 def list_surah_ayahs_view(request):
     surah_id_or_number = request.matchdict.get('surah_id_or_number')
-    surah = get_surah_by_id_or_number(request, surah_id_or_number)
+    fields = parse_fields(request, Ayah)
+    corpus = get_corpus(request)
+    surah = corpus.find_surah(surah_id_or_number)
     if not surah:
         raise HTTPNotFound(json_body={'error': f'Surah with identifier {surah_id_or_number} not found'})
 
-    ayahs = request.dbsession.query(Ayah).filter_by(surah_id=surah.id).order_by(Ayah.ayah_number_in_surah).all()
-    return [ayah.to_dict() for ayah in ayahs]
+    key = f'surah-ayahs:{surah["id"]}'
+    if fields is None:
+        return corpus_response(request, corpus, key, corpus.surah_ayahs(surah['id']))
+    key = f'{key}:{",".join(fields)}'
+    payload = corpus.payload(key, lambda: project(corpus.surah_ayahs(surah['id']), fields))
+    return corpus_response(request, corpus, key, payload)
@@ -0,0 +1,43 @@
+from pyramid.view import view_config
+from pyramid.httpexceptions import HTTPNotFound, HTTPBadRequest, HTTPForbidden
+
+from ..models import User
+from ..utils.http_cache import (
+    PRIVATE_CACHE_CONTROL,
+    collection_etag,
+    conditional_response,
+    get_collection_version,
+)
+from ..utils.pagination import decode_cursor, encode_cursor, parse_limit
+from ..utils.sync import DEFAULT_SYNC_PAGE_SIZE, MAX_SYNC_PAGE_SIZE, changes_since
+
+@view_config(route_name='user_sync', request_method='GET', renderer='json')
+def user_sync_view(request):
+    # Example: GET /api/v1/users/1/sync?since=<cursor>&limit=500
+    # Without since everything is returned (the initial sync). Clients store
+    # the returned cursor and come back while has_more is true.
+    user_id = request.matchdict.get('user_id')
+
+    # Authorization: Ensure the authenticated user syncs their own data
+    if not request.user or str(request.user['user_id']) != user_id:
+        raise HTTPForbidden(json_body={'error': 'Not authorized to sync data of this user'})
+
+    since = 0
+    since_str = request.params.get('since')
+    if since_str:
+        since, = decode_cursor(since_str, 1)
+        if not isinstance(since, int) or since < 0:
+            raise HTTPBadRequest(json_body={'error': f'Invalid cursor: {since_str}'})
+    limit = parse_limit(request, default=DEFAULT_SYNC_PAGE_SIZE, maximum=MAX_SYNC_PAGE_SIZE)
+
+    change_seq = get_collection_version(request.dbsession, user_id, User.change_seq)
+    if change_seq is None:
+        raise HTTPNotFound(json_body={'error': f'User with id {user_id} not found'})
+    # Polling without changes is answered from the user row alone
+    etag = collection_etag('sync', user_id, change_seq, request)
+    not_modified = conditional_response(request, etag, PRIVATE_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    changes, last_seq, has_more = changes_since(request.dbsession, user_id, since, limit)
+    return dict(changes, cursor=encode_cursor([last_seq]), has_more=has_more)
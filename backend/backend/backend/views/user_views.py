@@ -5,6 +5,8 @@ import json
 
 from ..models import User # Sesuaikan path jika perlu
 from ..models.mymodel import pwd_context # Untuk password hashing
+from ..utils.identity import forget_user, load_user
+from ..utils.projection import parse_fields, query_fields, serialize
 
 @view_config(route_name='users_collection', request_method='POST', renderer='json')
 def create_user_view(request):
@@ -44,13 +46,14 @@ def create_user_view(request):
 
 @view_config(route_name='users_collection', request_method='GET', renderer='json')
 def list_users_view(request):
-    users = request.dbsession.query(User).all()
-    return [user.to_dict() for user in users]
+    fields = parse_fields(request, User)
+    users = query_fields(request.dbsession, User, fields).all()
+    return serialize(users, fields)
 
 @view_config(route_name='user_detail', request_method='GET', renderer='json')
 def get_user_view(request):
     user_id = request.matchdict.get('user_id')
-    user = request.dbsession.query(User).filter_by(id=user_id).first()
+    user = load_user(request, user_id)
     if not user:
         raise HTTPNotFound(json_body={'error': 'User not found'})
     return user.to_dict()
@@ -58,7 +61,7 @@ def get_user_view(request):
 @view_config(route_name='user_detail', request_method='PUT', renderer='json')
 def update_user_view(request):
     user_id = request.matchdict.get('user_id')
-    user = request.dbsession.query(User).filter_by(id=user_id).first()
+    user = load_user(request, user_id)
     if not user:
         raise HTTPNotFound(json_body={'error': 'User not found'})
 
@@ -96,11 +99,12 @@ def update_user_view(request):
 @view_config(route_name='user_detail', request_method='DELETE', renderer='json')
 def delete_user_view(request):
     user_id = request.matchdict.get('user_id')
-    user = request.dbsession.query(User).filter_by(id=user_id).first()
+    user = load_user(request, user_id)
     if not user:
         raise HTTPNotFound(json_body={'error': 'User not found'})
     
     request.dbsession.delete(user)
     request.dbsession.flush()
+    forget_user(user.id)
     request.response.status_code = 204 # No Content
     return {}
\ No newline at end of file
@@ -48,6 +48,8 @@ setup(
     zip_safe=False,
     extras_require={
         'testing': tests_require,
+        # serve_backend_gevent, for the push channel
+        'gevent': ['gevent'],
     },
     install_requires=requires,
     entry_points={
@@ -56,6 +58,11 @@ setup(
         ],
         'console_scripts': [
             'initialize_backend_db=backend.scripts.initialize_db:main',
+            'load_backend_corpus=backend.scripts.load_corpus:main',
+            'rebuild_backend_progress=backend.scripts.rebuild_progress:main',
+            'prune_backend_review_events=backend.scripts.prune_review_events:main',
+            'dispatch_backend_reminders=backend.scripts.dispatch_reminders:main',
+            'serve_backend_gevent=backend.scripts.serve_gevent:main',
         ],
     },
 )
@@ -0,0 +1,88 @@
+import gzip
+import json
+
+from pyramid import testing
+from pyramid.response import Response
+
+from backend.compression import compression_tween_factory
+
+
+def make_tween(body, headers=None, content_type='application/json', **settings):
+    def handler(request):
+        response = Response(body=body, content_type=content_type, charset='utf-8')
+        response.headers.update(headers or {})
+        return response
+
+    registry = testing.DummyResource(settings=settings)
+    return compression_tween_factory(handler, registry)
+
+
+def make_request(accept_encoding=None):
+    request = testing.DummyRequest()
+    if accept_encoding:
+        request.headers['Accept-Encoding'] = accept_encoding
+    return request
+
+
+LARGE_BODY = json.dumps([{'text': 'بِسْمِ ٱللَّهِ ٱلرَّحْمَٰنِ ٱلرَّحِيمِ'}] * 200).encode('utf-8')
+
+
+class TestCompressionTween:
+
+    def test_gzip_negotiated(self):
+        tween = make_tween(LARGE_BODY)
+
+        response = tween(make_request('gzip, deflate'))
+
+        assert response.content_encoding == 'gzip'
+        assert 'Accept-Encoding' in response.vary
+        assert gzip.decompress(response.body) == LARGE_BODY
+        assert response.content_length < len(LARGE_BODY)
+
+    def test_not_accepted_or_too_small(self):
+        tween = make_tween(LARGE_BODY)
+        response = tween(make_request('identity'))
+        assert response.content_encoding is None
+        assert response.body == LARGE_BODY
+        assert 'Accept-Encoding' in response.vary
+
+        tween = make_tween(b'{"ok": true}')
+        response = tween(make_request('gzip'))
+        assert response.content_encoding is None
+
+        tween = make_tween(LARGE_BODY)
+        response = tween(make_request('gzip;q=0'))
+        assert response.content_encoding is None
+
+    def test_skips_event_streams_and_encoded_bodies(self):
+        tween = make_tween(LARGE_BODY, content_type='text/event-stream')
+        assert tween(make_request('gzip')).content_encoding is None
+
+        tween = make_tween(gzip.compress(LARGE_BODY), headers={'Content-Encoding': 'gzip'})
+        response = tween(make_request('gzip'))
+        assert gzip.decompress(response.body) == LARGE_BODY
+
+    def test_public_bodies_compressed_once(self):
+        headers = {'ETag': '"abc"', 'Cache-Control': 'public, max-age=86400'}
+        tween = make_tween(LARGE_BODY, headers=headers)
+
+        first = tween(make_request('gzip'))
+        second = tween(make_request('gzip'))
+
+        assert first.headers['ETag'] == '"abc-gzip"'
+        assert len(tween.cache) == 1
+        assert first.body is second.body
+
+    def test_private_bodies_not_cached(self):
+        headers = {'ETag': '"hafalan-1-3"', 'Cache-Control': 'private, no-cache'}
+        tween = make_tween(LARGE_BODY, headers=headers)
+
+        response = tween(make_request('gzip'))
+
+        assert response.content_encoding == 'gzip'
+        assert len(tween.cache) == 0
+
+    def test_disabled(self):
+        tween = make_tween(LARGE_BODY, **{'compression.enabled': 'false'})
+
+        assert tween(make_request('gzip')).content_encoding is None
@@ -1,15 +1,30 @@
 import pytest
 import json
+import re
+from datetime import date, datetime, timedelta, timezone
 from pyramid import testing
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+from sqlalchemy import event, text
 
-from backend.models.mymodel import User, Hafalan, HafalanStatusEnum
+from backend.models.mymodel import User, Hafalan, HafalanStatusEnum, Surah, UserProgress, UserCoverage, ReviewEvent, UserDailyActivity
+from backend.utils.corpus_cache import corpus_cache
 from backend.views.hafalan_views import (
     create_user_hafalan_view, 
     list_user_hafalan_view, 
     get_hafalan_view, 
     update_hafalan_view, 
-    delete_hafalan_view
+    delete_hafalan_view,
+    batch_user_hafalan_view,
+    user_hafalan_stats_view,
+    user_progress_view,
+    user_surah_progress_view,
 )
+from backend.utils.progress import _insert_missing_portable, rebuild_progress
+from backend.utils.review import next_schedule
+from backend.views.review_views import review_hafalan_view, user_review_queue_view
+from backend.views.coverage_views import user_coverage_view, user_coverage_range_view
+from backend.views.activity_views import user_activity_heatmap_view
+from backend.utils.activity import _add_activity_portable, prune_events, streaks
 from .factories import UserFactory, HafalanFactory, BaseFactory
 
 
@@ -68,6 +83,42 @@ class TestHafalanViews:
         assert hafalan.surah_name == 'Al-Fatihah'
         assert hafalan.status == HafalanStatusEnum.sedang
     
+    def test_create_hafalan_parses_range(self, setup_factory_session, auth_request):
+        dbsession = setup_factory_session
+        dummy_request, user = auth_request
+        for number, name, count in ((1, 'Al-Fatihah', 7), (2, 'Al-Baqarah', 286)):
+            dbsession.add(Surah(surah_number=number, name_arabic=name, name_english=name, number_of_ayahs=count))
+        dbsession.flush()
+        corpus_cache.invalidate()
+        baqarah = dbsession.query(Surah).filter_by(surah_number=2).one()
+
+        try:
+            dummy_request.matchdict = {'user_id': str(user.id)}
+            dummy_request.json_body = {'surah_name': 'Al-Baqara', 'ayah_range': '250 - 257'}
+            response = create_user_hafalan_view(dummy_request)
+
+            assert response['surah_id'] == baqarah.id
+            assert (response['start_ayah'], response['end_ayah']) == (250, 257)
+            # Counted after the 7 ayahs of Al-Fatihah
+            assert (response['start_index'], response['end_index']) == (257, 264)
+            covering = dbsession.query(Hafalan).filter(
+                Hafalan.surah_id == baqarah.id, Hafalan.start_ayah <= 255, Hafalan.end_ayah >= 255
+            ).all()
+            assert [h.id for h in covering] == [response['id']]
+
+            # Changing the range re-parses it
+            dummy_request.matchdict = {'hafalan_id': str(response['id'])}
+            dummy_request.json_body = {'ayah_range': '255'}
+            response = update_hafalan_view(dummy_request)
+            assert (response['start_index'], response['end_index']) == (262, 262)
+
+            for ayah_range in ('abc', '10-5', '280-290'):
+                dummy_request.json_body = {'ayah_range': ayah_range}
+                update_hafalan_view(dummy_request)
+                assert dummy_request.response.status_code == 400
+        finally:
+            corpus_cache.invalidate()
+
     def test_list_user_hafalan(self, setup_factory_session, dummy_request):
         dbsession = setup_factory_session
         # Create a test user manually
@@ -101,6 +152,58 @@ class TestHafalanViews:
         assert all('id' in h for h in response)
         assert all('surah_name' in h for h in response)
     
+    def test_list_user_hafalan_not_modified(self, setup_factory_session, auth_request):
+        dbsession = setup_factory_session
+        dummy_request, user = auth_request
+        dbsession.add(Hafalan(user_id=user.id, surah_name='Al-Ikhlas', ayah_range='1-4'))
+        dbsession.flush()
+
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        list_user_hafalan_view(dummy_request)
+        etag = dummy_request.response.headers['ETag']
+        assert dummy_request.response.headers['Cache-Control'] == 'private, no-cache'
+
+        # Unchanged collection -> 304
+        dummy_request.headers['If-None-Match'] = etag
+        response = list_user_hafalan_view(dummy_request)
+        assert response.status_code == 304
+
+        # A write bumps the version and the old validator no longer matches
+        dummy_request.json_body = {'surah_name': 'An-Nas', 'ayah_range': '1-6'}
+        create_user_hafalan_view(dummy_request)
+        response = list_user_hafalan_view(dummy_request)
+        assert len(response) == 2
+        assert dummy_request.response.headers['ETag'] != etag
+
+    def test_list_user_hafalan_fields(self, setup_factory_session, auth_request):
+        dbsession = setup_factory_session
+        dummy_request, user = auth_request
+        dbsession.add(Hafalan(
+            user_id=user.id, surah_name='Al-Mulk', ayah_range='1-30',
+            status=HafalanStatusEnum.selesai, catatan='long notes ' * 100
+        ))
+        dbsession.flush()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            dummy_request.matchdict = {'user_id': str(user.id)}
+            dummy_request.params = {'fields': 'status,id'}
+            response = list_user_hafalan_view(dummy_request)
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+        assert len(response) == 1
+        assert list(response[0]) == ['id', 'status']
+        assert response[0]['status'] == 'selesai'
+        # The heavy column is never read
+        assert not any('catatan' in statement for statement in statements)
+
+        dummy_request.params = {'fields': 'id,secret'}
+        with pytest.raises(HTTPBadRequest):
+            list_user_hafalan_view(dummy_request)
+
     def test_get_hafalan_by_id(self, setup_factory_session, auth_request):
         dbsession = setup_factory_session
         dummy_request, user = auth_request
@@ -201,3 +304,651 @@ class TestHafalanViews:
         
         # Verify it's a 404 exception
         assert excinfo.value.status_code == 404
+
+
+class TestHafalanStats:
+
+    @pytest.fixture
+    def finished(self, auth_request, setup_factory_session):
+        dbsession = setup_factory_session
+        dummy_request, user = auth_request
+        for surah_name, start, end, reviewed, status in (
+            ('Al-Ikhlas', 1, 4, datetime(2025, 12, 30, tzinfo=timezone.utc), HafalanStatusEnum.selesai),
+            ('Al-Falaq', 1, 5, datetime(2026, 1, 5, 8, tzinfo=timezone.utc), HafalanStatusEnum.selesai),
+            ('An-Nas', 1, 6, datetime(2026, 1, 11, 23, tzinfo=timezone.utc), HafalanStatusEnum.selesai),
+            ('Al-Mulk', 1, 10, datetime(2026, 3, 2, tzinfo=timezone.utc), HafalanStatusEnum.selesai),
+            ('Al-Mulk', 11, 30, datetime(2026, 3, 3, tzinfo=timezone.utc), HafalanStatusEnum.sedang),
+        ):
+            dbsession.add(Hafalan(
+                user_id=user.id, surah_name=surah_name, ayah_range=f'{start}-{end}',
+                start_ayah=start, end_ayah=end, status=status, last_reviewed_at=reviewed
+            ))
+        dbsession.flush()
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        return dummy_request
+
+    def test_monthly(self, finished):
+        finished.params = {'granularity': 'month', 'from': '2026-01-15', 'to': '2026-03-31'}
+        response = user_hafalan_stats_view(finished)
+
+        assert response['from'] == '2026-01-01'
+        assert response['buckets'] == [
+            # The 4 ayahs finished in 2025 are carried into the cumulative count
+            {'start': '2026-01-01', 'new_ayahs': 11, 'cumulative_ayahs': 15},
+            {'start': '2026-02-01', 'new_ayahs': 0, 'cumulative_ayahs': 15},
+            {'start': '2026-03-01', 'new_ayahs': 10, 'cumulative_ayahs': 25},
+        ]
+        assert response['totals'] == {'ayahs': 25, 'surahs': 4}
+
+    def test_weekly_starts_on_monday(self, finished):
+        finished.params = {'granularity': 'week', 'from': '2025-12-29', 'to': '2026-01-11'}
+        response = user_hafalan_stats_view(finished)
+
+        assert [(b['start'], b['new_ayahs']) for b in response['buckets']] == [
+            ('2025-12-29', 4),
+            ('2026-01-05', 11),
+        ]
+
+    def test_yearly_defaults_to_first_entry(self, finished):
+        finished.params = {'granularity': 'year', 'to': '2026-12-31'}
+        response = user_hafalan_stats_view(finished)
+
+        assert [(b['start'], b['cumulative_ayahs']) for b in response['buckets']] == [
+            ('2025-01-01', 4),
+            ('2026-01-01', 25),
+        ]
+
+    def test_invalid_params(self, finished):
+        for params in (
+            {'granularity': 'day'},
+            {'from': '15-01-2026'},
+            {'from': '2026-03-01', 'to': '2026-01-01'},
+        ):
+            finished.params = params
+            with pytest.raises(HTTPBadRequest):
+                user_hafalan_stats_view(finished)
+
+
+class TestUserProgress:
+
+    @pytest.fixture
+    def surahs(self, setup_factory_session):
+        dbsession = setup_factory_session
+        for number, name, count in ((1, 'Al-Fatihah', 7), (112, 'Al-Ikhlas', 4)):
+            dbsession.add(Surah(surah_number=number, name_arabic=name, name_english=name, number_of_ayahs=count))
+        dbsession.flush()
+        corpus_cache.invalidate()
+        yield {s.surah_number: s for s in dbsession.query(Surah)}
+        corpus_cache.invalidate()
+
+    def create(self, dummy_request, user, surah_name, ayah_range, status):
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_request.json_body = {'surah_name': surah_name, 'ayah_range': ayah_range, 'status': status}
+        return create_user_hafalan_view(dummy_request)
+
+    def progress(self, dummy_request, user):
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        return user_progress_view(dummy_request)
+
+    def test_writes_maintain_summary(self, surahs, auth_request):
+        dummy_request, user = auth_request
+        fatihah = self.create(dummy_request, user, 'Al-Fatihah', '1-7', 'selesai')
+        ikhlas = self.create(dummy_request, user, 'Al-Ikhlas', '1-2', 'sedang')
+        # Unresolved surahs count towards the user totals only
+        self.create(dummy_request, user, 'Surah Lain', '1-3', 'selesai')
+
+        progress = self.progress(dummy_request, user)
+        assert progress['total_entries'] == 3
+        assert progress['status_counts'] == {'belum': 0, 'sedang': 1, 'selesai': 2}
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (10, 1)
+
+        dummy_request.matchdict = {'hafalan_id': str(ikhlas['id'])}
+        dummy_request.json_body = {'ayah_range': '1-4', 'status': 'selesai'}
+        update_hafalan_view(dummy_request)
+        progress = self.progress(dummy_request, user)
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (14, 2)
+
+        dummy_request.matchdict = {'hafalan_id': str(fatihah['id'])}
+        delete_hafalan_view(dummy_request)
+        progress = self.progress(dummy_request, user)
+        assert progress['total_entries'] == 2
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (7, 1)
+
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        assert user_surah_progress_view(dummy_request) == [{
+            'user_id': user.id, 'surah_id': surahs[112].id, 'entries': 1,
+            'selesai_entries': 1, 'ayahs_memorized': 4, 'completed': True,
+        }]
+        # The deltas agree with a full recount
+        assert rebuild_progress(dummy_request.dbsession, user_ids=[user.id]) == []
+
+    def test_overlapping_entries_count_once(self, surahs, auth_request):
+        dummy_request, user = auth_request
+        self.create(dummy_request, user, 'Al-Fatihah', '1-4', 'selesai')
+        second = self.create(dummy_request, user, 'Al-Fatihah', '1-4', 'selesai')
+        self.create(dummy_request, user, 'Al-Ikhlas', '1-3', 'selesai')
+        self.create(dummy_request, user, 'Al-Ikhlas', '2-4', 'selesai')
+
+        progress = self.progress(dummy_request, user)
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (8, 1)
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        assert [
+            (row['surah_id'], row['ayahs_memorized'], row['completed'])
+            for row in user_surah_progress_view(dummy_request)
+        ] == [(surahs[1].id, 4, False), (surahs[112].id, 4, True)]
+
+        # Extending one copy counts only the new ayahs
+        dummy_request.matchdict = {'hafalan_id': str(second['id'])}
+        dummy_request.json_body = {'ayah_range': '3-7'}
+        update_hafalan_view(dummy_request)
+        progress = self.progress(dummy_request, user)
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (11, 2)
+
+        dummy_request.matchdict = {'hafalan_id': str(second['id'])}
+        delete_hafalan_view(dummy_request)
+        progress = self.progress(dummy_request, user)
+        assert (progress['ayahs_memorized'], progress['surahs_completed']) == (8, 1)
+        assert rebuild_progress(dummy_request.dbsession, user_ids=[user.id]) == []
+
+    def test_portable_insert_for_other_dialects(self, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        for _ in range(2):
+            _insert_missing_portable(dbsession, UserProgress.__table__, {'user_id': user.id})
+        assert dbsession.query(UserProgress.user_id, UserProgress.total_entries).filter_by(
+            user_id=user.id
+        ).all() == [(user.id, 0)]
+
+    def test_rebuild_reports_and_fixes_drift(self, surahs, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        self.create(dummy_request, user, 'Al-Ikhlas', '1-4', 'selesai')
+        dbsession.query(UserProgress).filter_by(user_id=user.id).update({UserProgress.ayahs_memorized: 99})
+
+        drift = rebuild_progress(dbsession, user_ids=[user.id], dry_run=True)
+        assert [(d.user_id, d.surah_id, d.changes) for d in drift] == [
+            (user.id, None, {'ayahs_memorized': (99, 4)}),
+        ]
+        assert self.progress(dummy_request, user)['ayahs_memorized'] == 99
+
+        assert len(rebuild_progress(dbsession, user_ids=[user.id])) == 1
+        assert self.progress(dummy_request, user)['ayahs_memorized'] == 4
+        assert rebuild_progress(dbsession, user_ids=[user.id]) == []
+
+    def test_user_without_entries(self, auth_request):
+        dummy_request, user = auth_request
+        progress = self.progress(dummy_request, user)
+        assert (progress['total_entries'], progress['ayahs_memorized']) == (0, 0)
+
+        dummy_request.matchdict = {'user_id': '9999'}
+        with pytest.raises(HTTPNotFound):
+            user_progress_view(dummy_request)
+
+
+class TestHafalanBatch:
+
+    @pytest.fixture
+    def entries(self, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        entries = [
+            Hafalan(user_id=user.id, surah_name='Al-Ikhlas', ayah_range='1-4', start_ayah=1, end_ayah=4,
+                    status=HafalanStatusEnum.sedang),
+            Hafalan(user_id=user.id, surah_name='An-Nas', ayah_range='1-6', start_ayah=1, end_ayah=6,
+                    status=HafalanStatusEnum.belum),
+        ]
+        dbsession.add_all(entries)
+        dbsession.flush()
+        # Added directly, so the summaries are seeded by a rebuild
+        rebuild_progress(dbsession, user_ids=[user.id])
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        return dummy_request, user, entries
+
+    def test_applies_all_operations(self, entries):
+        dummy_request, user, (ikhlas, nas) = entries
+        dummy_request.json_body = [
+            {'op': 'create', 'data': {'surah_name': 'Al-Falaq', 'ayah_range': '1-5', 'status': 'selesai'}},
+            {'op': 'update', 'id': ikhlas.id, 'data': {'status': 'selesai'}},
+            {'op': 'delete', 'id': nas.id},
+        ]
+
+        results = batch_user_hafalan_view(dummy_request)
+
+        assert [(r['index'], r['op'], r['status']) for r in results] == [
+            (0, 'create', 201), (1, 'update', 200), (2, 'delete', 204),
+        ]
+        assert results[0]['hafalan']['surah_name'] == 'Al-Falaq'
+        assert results[0]['hafalan']['created_at'] is not None
+        assert results[1]['hafalan']['last_reviewed_at'] is not None
+        dbsession = dummy_request.dbsession
+        assert sorted(h.surah_name for h in dbsession.query(Hafalan).filter_by(user_id=user.id)) == [
+            'Al-Falaq', 'Al-Ikhlas',
+        ]
+        dbsession.refresh(user)
+        assert user.hafalan_version == 1
+        progress = user_progress_view(dummy_request)
+        assert (progress['total_entries'], progress['ayahs_memorized']) == (2, 9)
+        assert rebuild_progress(dbsession, user_ids=[user.id], dry_run=True) == []
+
+    def test_invalid_batch_applies_nothing(self, entries, setup_factory_session):
+        dummy_request, user, (ikhlas, nas) = entries
+        other = User(username='other_batch_user', email='other_batch@example.com')
+        other.set_password('SecurePassword123!')
+        setup_factory_session.add(other)
+        setup_factory_session.flush()
+        foreign = Hafalan(user_id=other.id, surah_name='Al-Kautsar', ayah_range='1-3', status=HafalanStatusEnum.belum)
+        setup_factory_session.add(foreign)
+        setup_factory_session.flush()
+
+        dummy_request.json_body = [
+            {'op': 'create', 'data': {'surah_name': 'Al-Falaq', 'ayah_range': '1-5'}},
+            {'op': 'update', 'id': ikhlas.id, 'data': {'status': 'hafal'}},
+            {'op': 'delete', 'id': foreign.id},
+            {'op': 'delete', 'id': nas.id},
+            {'op': 'update', 'id': nas.id, 'data': {'catatan': 'x'}},
+            {'op': 'move'},
+        ]
+
+        response = batch_user_hafalan_view(dummy_request)
+
+        assert dummy_request.response.status_code == 400
+        assert [(e['index'], e['status']) for e in response['errors']] == [
+            (1, 400), (2, 404), (4, 400), (5, 400),
+        ]
+        assert setup_factory_session.query(Hafalan).filter_by(user_id=user.id).count() == 2
+        assert ikhlas.status == HafalanStatusEnum.sedang
+
+        dummy_request.response.status_code = 200
+        dummy_request.json_body = {'op': 'create'}
+        batch_user_hafalan_view(dummy_request)
+        assert dummy_request.response.status_code == 400
+
+
+class TestHafalanListQuery:
+
+    @pytest.fixture
+    def listing(self, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        day = lambda d, h=0: datetime(2026, 3, d, h, tzinfo=timezone.utc)
+        entries = {}
+        for key, surah_name, status, updated, reviewed in (
+            ('mulk', 'Al-Mulk', HafalanStatusEnum.selesai, day(1), day(2)),
+            ('naba', "An-Naba'", HafalanStatusEnum.sedang, day(3), None),
+            ('ikhlas', 'Al-Ikhlas', HafalanStatusEnum.selesai, day(3), day(1, 12)),
+            ('falaq', 'Al-Falaq', HafalanStatusEnum.belum, day(5), None),
+            ('nas', 'An-Nas', HafalanStatusEnum.sedang, day(4), day(6)),
+        ):
+            entries[key] = Hafalan(
+                user_id=user.id, surah_name=surah_name, ayah_range='1-3', status=status,
+                updated_at=updated, last_reviewed_at=reviewed
+            )
+            dbsession.add(entries[key])
+        dbsession.flush()
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        return dummy_request, {key: hafalan.id for key, hafalan in entries.items()}
+
+    def walk(self, dummy_request, params):
+        """Follow X-Next-Cursor through all pages; returns the pages of ids."""
+        pages, after = [], None
+        while True:
+            dummy_request.response = testing.DummyRequest().response
+            dummy_request.params = dict(params, **({'after': after} if after else {}))
+            pages.append([item['id'] for item in list_user_hafalan_view(dummy_request)])
+            after = dummy_request.response.headers.get('X-Next-Cursor')
+            if not after:
+                return pages
+
+    def test_sorts_and_pages(self, listing):
+        dummy_request, ids = listing
+
+        pages = self.walk(dummy_request, {'sort': '-updated_at', 'limit': '2'})
+        # Equal updated_at values are ordered by id
+        assert pages == [[ids['falaq'], ids['nas']], [ids['ikhlas'], ids['naba']], [ids['mulk']]]
+
+        # Never reviewed entries first, then the longest unreviewed
+        pages = self.walk(dummy_request, {'sort': 'last_reviewed_at', 'limit': '1'})
+        assert sum(pages, []) == [ids['naba'], ids['falaq'], ids['ikhlas'], ids['mulk'], ids['nas']]
+        pages = self.walk(dummy_request, {'sort': '-last_reviewed_at', 'limit': '3'})
+        assert sum(pages, []) == [ids['nas'], ids['mulk'], ids['ikhlas'], ids['falaq'], ids['naba']]
+
+        pages = self.walk(dummy_request, {'sort': '-id', 'limit': '4', 'fields': 'id'})
+        assert pages == [[ids['nas'], ids['falaq'], ids['ikhlas'], ids['naba']], [ids['mulk']]]
+
+        # The cursor does not depend on the projected fields
+        dummy_request.params = {'sort': 'updated_at', 'limit': '2', 'fields': 'status'}
+        assert list_user_hafalan_view(dummy_request) == [{'status': 'selesai'}, {'status': 'sedang'}]
+        dummy_request.params['after'] = dummy_request.response.headers['X-Next-Cursor']
+        assert list_user_hafalan_view(dummy_request) == [{'status': 'selesai'}, {'status': 'sedang'}]
+
+    def test_timestamps_share_one_format(self, listing):
+        dummy_request, ids = listing
+        dbsession = dummy_request.dbsession
+        reviewed = dbsession.get(Hafalan, ids['naba'])
+        reviewed.last_reviewed_at = datetime(2026, 3, 2, 7, tzinfo=timezone(timedelta(hours=7)))
+        # created_at and updated_at are taken by the database
+        dbsession.add(Hafalan(user_id=reviewed.user_id, surah_name='Al-Kautsar', ayah_range='1-3',
+                              status=HafalanStatusEnum.belum))
+        dbsession.flush()
+
+        stored = dbsession.execute(text(
+            'SELECT id, created_at, updated_at, last_reviewed_at FROM hafalan WHERE user_id = :user_id'
+        ), {'user_id': reviewed.user_id}).all()
+        values = [value for row in stored for value in row[1:] if value is not None]
+        assert len(stored) == 6 and len(values) == 16
+        assert all(re.fullmatch(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{6}', value) for value in values)
+        assert dict((row[0], row[3]) for row in stored)[ids['naba']] == '2026-03-02 00:00:00.000000'
+
+    def test_sorted_pages_read_the_index_in_order(self, listing):
+        dummy_request, _ = listing
+        dbsession = dummy_request.dbsession
+        statements = []
+        listener = lambda conn, cursor, statement, parameters, *args: statements.append((conn, statement, parameters))
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            self.walk(dummy_request, {'sort': '-last_reviewed_at', 'limit': '2'})
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+        # The first page and one seeking past a cursor
+        for conn, statement, parameters in [s for s in statements if 'FROM hafalan' in s[1]][:2]:
+            plan = ' '.join(str(row) for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+            assert 'ix_hafalan_user_reviewed' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_filters(self, listing):
+        dummy_request, ids = listing
+
+        def listed(**params):
+            dummy_request.params = params
+            return sorted(item['id'] for item in list_user_hafalan_view(dummy_request))
+
+        assert listed(status='sedang,belum') == sorted([ids['naba'], ids['falaq'], ids['nas']])
+        assert listed(surah='Al-Mulk') == [ids['mulk']]
+        assert listed(updated_since='2026-03-04') == sorted([ids['falaq'], ids['nas']])
+        assert listed(reviewed_before='2026-03-02T00:00:00Z', status='selesai') == [ids['ikhlas']]
+        # No limit: the full list, without a cursor
+        assert len(listed()) == 5
+        assert 'X-Next-Cursor' not in dummy_request.response.headers
+
+    def test_invalid_params(self, listing):
+        dummy_request, _ = listing
+        for params in (
+            {'sort': 'surah_name'},
+            {'status': 'hafal'},
+            {'updated_since': 'kemarin'},
+            {'limit': '1000'},
+            {'sort': 'updated_at', 'after': 'bm90LWEtY3Vyc29y'},
+        ):
+            dummy_request.params = params
+            with pytest.raises(HTTPBadRequest):
+                list_user_hafalan_view(dummy_request)
+
+
+class TestReviewQueue:
+
+    @pytest.fixture
+    def scheduled(self, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        day = lambda d: datetime(2026, 3, d, tzinfo=timezone.utc)
+        entries = {}
+        for key, status, due_at in (
+            ('mulk', HafalanStatusEnum.selesai, day(5)),
+            ('naba', HafalanStatusEnum.sedang, day(2)),
+            ('ikhlas', HafalanStatusEnum.selesai, day(2)),
+            ('falaq', HafalanStatusEnum.belum, None),
+        ):
+            entries[key] = Hafalan(
+                user_id=user.id, surah_name=key, ayah_range='1-3', status=status, due_at=due_at
+            )
+            dbsession.add(entries[key])
+        dbsession.flush()
+        return dummy_request, user, entries
+
+    def test_sm2_intervals(self):
+        assert next_schedule(0, 2.5, 0, 5) == (1, 2.6, 1)
+        assert next_schedule(1, 2.6, 1, 5) == (6, 2.7, 2)
+        assert next_schedule(6, 2.7, 2, 5) == (17, 2.8, 3)
+        # Forgotten: starts over, and the ease drops but not below 1.3
+        assert next_schedule(17, 2.8, 3, 1) == (1, 2.26, 0)
+        assert next_schedule(1, 1.3, 0, 0)[1] == 1.3
+
+    def test_review_reschedules_entry(self, scheduled):
+        dummy_request, user, entries = scheduled
+        dummy_request.matchdict = {'hafalan_id': str(entries['naba'].id)}
+        dummy_request.json_body = {'quality': 4, 'reviewed_at': '2026-03-02T08:00:00Z'}
+
+        response = review_hafalan_view(dummy_request)
+
+        assert dummy_request.response.status_code == 200
+        assert response['last_reviewed_at'].startswith('2026-03-02T08:00:00')
+        assert response['due_at'].startswith('2026-03-03T08:00:00')
+        assert (response['review_interval'], response['review_repetitions'], response['ease_factor']) == (1, 1, 2.5)
+        dummy_request.dbsession.refresh(user)
+        assert user.hafalan_version == 1
+        assert entries['naba'].change_seq == user.change_seq > 0
+
+    def test_review_rejects_invalid_requests(self, scheduled):
+        dummy_request, user, entries = scheduled
+        for hafalan, body in (
+            (entries['naba'], {'quality': 6}),
+            (entries['naba'], {'quality': True}),
+            (entries['naba'], {'quality': 3, 'reviewed_at': 'kemarin'}),
+            (entries['falaq'], {'quality': 3}),
+        ):
+            dummy_request.response.status_code = 200
+            dummy_request.matchdict = {'hafalan_id': str(hafalan.id)}
+            dummy_request.json_body = body
+            assert 'error' in review_hafalan_view(dummy_request)
+            assert dummy_request.response.status_code == 400
+        assert entries['naba'].review_repetitions == 0
+
+    def test_status_changes_enter_and_leave_queue(self, scheduled):
+        dummy_request, user, entries = scheduled
+        dummy_request.matchdict = {'hafalan_id': str(entries['falaq'].id)}
+        dummy_request.json_body = {'status': 'sedang'}
+        assert update_hafalan_view(dummy_request)['due_at'] is not None
+
+        dummy_request.matchdict = {'hafalan_id': str(entries['mulk'].id)}
+        dummy_request.json_body = {'status': 'belum'}
+        assert update_hafalan_view(dummy_request)['due_at'] is None
+
+    def test_queue_is_due_soonest_first(self, scheduled):
+        dummy_request, user, entries = scheduled
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        ids = lambda keys: [entries[key].id for key in keys]
+
+        dummy_request.params = {'limit': '2'}
+        assert [h['id'] for h in user_review_queue_view(dummy_request)] == ids(['naba', 'ikhlas'])
+        dummy_request.params = {'limit': '2', 'after': dummy_request.response.headers['X-Next-Cursor']}
+        dummy_request.response = testing.DummyRequest().response
+        assert [h['id'] for h in user_review_queue_view(dummy_request)] == ids(['mulk'])
+        assert 'X-Next-Cursor' not in dummy_request.response.headers
+
+        dummy_request.params = {'until': '2026-03-04'}
+        assert [h['id'] for h in user_review_queue_view(dummy_request)] == ids(['naba', 'ikhlas'])
+
+        dummy_request.params = {'after': 'nope'}
+        with pytest.raises(HTTPBadRequest):
+            user_review_queue_view(dummy_request)
+
+    def test_queue_reads_the_due_index_in_order(self, scheduled):
+        dummy_request, user, _ = scheduled
+        dbsession = dummy_request.dbsession
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        statements = []
+        listener = lambda conn, cursor, statement, parameters, *args: statements.append((conn, statement, parameters))
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            dummy_request.params = {'limit': '2', 'until': '2026-03-31'}
+            user_review_queue_view(dummy_request)
+            dummy_request.params = {'limit': '2', 'after': dummy_request.response.headers['X-Next-Cursor']}
+            user_review_queue_view(dummy_request)
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+        queries = [s for s in statements if 'FROM hafalan' in s[1]]
+        assert len(queries) == 2
+        for conn, statement, parameters in queries:
+            plan = ' '.join(str(row) for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+            assert 'ix_hafalan_user_due' in plan
+            assert 'TEMP B-TREE' not in plan
+
+
+class TestCoverage:
+
+    @pytest.fixture
+    def corpus(self, setup_factory_session):
+        dbsession = setup_factory_session
+        for number, name, count in ((1, 'Al-Fatihah', 7), (2, 'Al-Baqarah', 286), (3, 'Ali Imran', 200)):
+            dbsession.add(Surah(surah_number=number, name_arabic=name, name_english=name, number_of_ayahs=count))
+        dbsession.flush()
+        corpus_cache.invalidate()
+        yield
+        corpus_cache.invalidate()
+
+    def create(self, dummy_request, user, surah_name, ayah_range, status='selesai'):
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_request.json_body = {'surah_name': surah_name, 'ayah_range': ayah_range, 'status': status}
+        return create_user_hafalan_view(dummy_request)
+
+    def coverage(self, dummy_request, user, **params):
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_request.params = params
+        return (user_coverage_range_view if params else user_coverage_view)(dummy_request)
+
+    def test_writes_maintain_bitmap(self, corpus, auth_request):
+        dummy_request, user = auth_request
+        self.create(dummy_request, user, 'Al-Fatihah', '1-7')
+        early = self.create(dummy_request, user, 'Al-Baqarah', '1-141')
+        # Overlapping entries and unfinished ones do not count twice
+        self.create(dummy_request, user, 'Al-Baqarah', '100-160')
+        self.create(dummy_request, user, 'Ali Imran', '1-50', status='sedang')
+
+        coverage = self.coverage(dummy_request, user)
+        assert (coverage['total_ayahs'], coverage['covered_ayahs']) == (493, 167)
+        assert [(j['juz'], j['start_index'], j['end_index'], j['covered_ayahs'], j['percentage']) for j in coverage['juz']] == [
+            (1, 1, 148, 148, 100.0), (2, 149, 259, 19, 17.12), (3, 260, 385, 0, 0.0),
+        ]
+
+        dummy_request.matchdict = {'hafalan_id': str(early['id'])}
+        delete_hafalan_view(dummy_request)
+        coverage = self.coverage(dummy_request, user)
+        assert coverage['covered_ayahs'] == 7 + 61
+        assert [(s['surah_number'], s['covered_ayahs']) for s in coverage['surahs']] == [(1, 7), (2, 61), (3, 0)]
+        assert coverage['juz'][0]['covered_ayahs'] == 7 + 42
+        stored = dummy_request.dbsession.get(UserCoverage, user.id)
+        assert len(stored.bitmap) == 780 and stored.covered_ayahs == 68
+        assert rebuild_progress(dummy_request.dbsession, user_ids=[user.id]) == []
+
+    def test_range_coverage(self, corpus, auth_request):
+        dummy_request, user = auth_request
+        self.create(dummy_request, user, 'Al-Fatihah', '1-7')
+        self.create(dummy_request, user, 'Al-Baqarah', '140-160')
+
+        juz = self.coverage(dummy_request, user, juz='2')
+        assert (juz['juz'], juz['number_of_ayahs'], juz['covered_ayahs'], juz['union_ayahs']) == (2, 111, 19, 28 + 111 - 19)
+        fatihah = self.coverage(dummy_request, user, surah='1')
+        assert (fatihah['ayah_range'], fatihah['covered_ayahs'], fatihah['percentage']) == ('1-7', 7, 100.0)
+        part = self.coverage(dummy_request, user, surah='Al-Baqarah', ayah_range='150-170')
+        assert (part['start_index'], part['end_index'], part['covered_ayahs']) == (157, 177, 11)
+
+        for params, error in (
+            ({'juz': '4'}, HTTPNotFound),  # ends in a surah outside the corpus
+            ({'juz': '31'}, HTTPBadRequest),
+            ({'surah': '1', 'ayah_range': '5-9'}, HTTPBadRequest),
+            ({'surah': 'Al-Kahf'}, HTTPNotFound),
+            ({'ayah_range': '1-2'}, HTTPBadRequest),
+        ):
+            with pytest.raises(error):
+                self.coverage(dummy_request, user, **params)
+
+    def test_rebuild_fixes_bitmap(self, corpus, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        self.create(dummy_request, user, 'Al-Fatihah', '1-7')
+        dbsession.get(UserCoverage, user.id).bitmap = bytes(780)
+        dbsession.flush()
+
+        drift = rebuild_progress(dbsession, user_ids=[user.id], dry_run=True)
+        assert [(d.user_id, d.changes) for d in drift] == [(user.id, {'covered_ayahs': (7, 7)})]
+        rebuild_progress(dbsession, user_ids=[user.id])
+        assert self.coverage(dummy_request, user)['covered_ayahs'] == 7
+
+
+class TestReviewActivity:
+
+    @pytest.fixture
+    def entry(self, auth_request):
+        dummy_request, user = auth_request
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_request.json_body = {'surah_name': 'Al-Ikhlas', 'ayah_range': '1-4', 'status': 'sedang'}
+        return dummy_request, user, create_user_hafalan_view(dummy_request)
+
+    def review(self, dummy_request, hafalan, reviewed_at, quality=4):
+        dummy_request.matchdict = {'hafalan_id': str(hafalan['id'])}
+        dummy_request.json_body = {'quality': quality, 'reviewed_at': reviewed_at}
+        return review_hafalan_view(dummy_request)
+
+    def test_writes_log_events_and_rollups(self, entry):
+        dummy_request, user, hafalan = entry
+        dbsession = dummy_request.dbsession
+        for reviewed_at in ('2026-03-01T22:00:00Z', '2026-03-02T06:00:00+07:00', '2026-03-02T20:00:00Z',
+                            '2026-03-03T08:00:00Z', '2026-03-05T08:00:00Z'):
+            self.review(dummy_request, hafalan, reviewed_at)
+        dummy_request.matchdict = {'hafalan_id': str(hafalan['id'])}
+        dummy_request.json_body = {'catatan': 'lancar'}
+        update_hafalan_view(dummy_request)
+        dummy_request.json_body = {'status': 'selesai'}
+        update_hafalan_view(dummy_request)
+
+        kinds = [e.kind for e in dbsession.query(ReviewEvent).filter_by(user_id=user.id).order_by(ReviewEvent.id)]
+        # Creation and the status change, not the note edit
+        assert kinds == ['status'] + ['review'] * 5 + ['status']
+
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_request.params = {'to': '2026-03-05', 'days': '5'}
+        heatmap = user_activity_heatmap_view(dummy_request)
+        # 06:00+07:00 is still March 1st in UTC
+        assert [(d['date'], d['reviews'], d['ayahs_reviewed']) for d in heatmap['days']] == [
+            ('2026-03-01', 2, 8), ('2026-03-02', 1, 4), ('2026-03-03', 1, 4), ('2026-03-05', 1, 4),
+        ]
+        assert (heatmap['from'], heatmap['active_days']) == ('2026-03-01', 4)
+
+        dbsession.query(UserDailyActivity).filter(
+            UserDailyActivity.user_id == user.id, UserDailyActivity.day > date(2026, 3, 5)
+        ).delete()
+        assert streaks(dbsession, user.id, date(2026, 3, 6)) == {
+            'current_streak': 1, 'longest_streak': 3, 'last_active_day': '2026-03-05', 'today': '2026-03-06',
+        }
+        assert streaks(dbsession, user.id, date(2026, 3, 7))['current_streak'] == 0
+
+        dummy_request.params = {'days': '400'}
+        with pytest.raises(HTTPBadRequest):
+            user_activity_heatmap_view(dummy_request)
+
+    def test_prune_keeps_rollups(self, entry):
+        dummy_request, user, hafalan = entry
+        dbsession = dummy_request.dbsession
+        for reviewed_at in ('2025-01-01T08:00:00Z', '2025-01-02T08:00:00Z', '2026-03-01T08:00:00Z'):
+            self.review(dummy_request, hafalan, reviewed_at)
+        before = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        assert [e['occurred_at'][:10] for e in prune_events(dbsession, before, batch_size=1)] == ['2025-01-01']
+        assert [e['occurred_at'][:10] for e in prune_events(dbsession, before)] == ['2025-01-02']
+        assert prune_events(dbsession, before) == []
+        assert dbsession.query(ReviewEvent).filter_by(user_id=user.id, kind='review').count() == 1
+        assert dbsession.query(UserDailyActivity).filter(
+            UserDailyActivity.user_id == user.id, UserDailyActivity.day < date(2026, 1, 1)
+        ).count() == 2
+
+    def test_portable_rollup_for_other_dialects(self, auth_request):
+        dummy_request, user = auth_request
+        dbsession = dummy_request.dbsession
+        day = date(2026, 3, 1)
+        for deltas in ({'events': 1, 'reviews': 0, 'ayahs_reviewed': 0}, {'events': 1, 'reviews': 1, 'ayahs_reviewed': 4}):
+            _add_activity_portable(dbsession, user.id, day, deltas)
+        assert dbsession.query(
+            UserDailyActivity.events, UserDailyActivity.reviews, UserDailyActivity.ayahs_reviewed
+        ).filter_by(user_id=user.id, day=day).all() == [(2, 1, 4)]
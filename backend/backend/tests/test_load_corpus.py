@@ -0,0 +1,108 @@
+import pytest
+
+from backend.models.mymodel import Surah, Ayah
+from backend.models.search import search_ayah_ids
+from backend.scripts.load_corpus import (
+    CorpusFormatError,
+    csv_row,
+    iter_ayahs,
+    iter_surahs,
+    load_corpus,
+)
+
+
+@pytest.fixture
+def corpus_files(tmp_path):
+    surahs = tmp_path / 'surahs.csv'
+    surahs.write_text(
+        'surah_number,name_arabic,name_english,english_translation,number_of_ayahs,revelation_type\n'
+        '1,الفاتحة,Al-Fatihah,The Opening,7,Meccan\n'
+        '112,الإخلاص,Al-Ikhlas,Sincerity,4,Meccan\n',
+        encoding='utf-8'
+    )
+    ayahs = tmp_path / 'quran-uthmani.txt'
+    ayahs.write_text(
+        '# tanzil header\n'
+        '1|1|بِسْمِ ٱللَّهِ\n'
+        '1|2|ٱلْحَمْدُ لِلَّهِ\n'
+        '112|1|قُلْ هُوَ ٱللَّهُ أَحَدٌ\n',
+        encoding='utf-8'
+    )
+    translation_en = tmp_path / 'en.sahih.txt'
+    translation_en.write_text(
+        '1|1|In the name of Allah\n'
+        '1|2|All praise is due to Allah\n'
+        '112|1|Say, He is Allah, One\n',
+        encoding='utf-8'
+    )
+    return surahs, ayahs, translation_en
+
+
+class TestLoadCorpus:
+
+    @pytest.mark.parametrize('upsert_dialects', [('postgresql', 'sqlite'), ()], ids=['on_conflict', 'portable'])
+    def test_load_and_upsert(self, dbsession, corpus_files, monkeypatch, upsert_dialects):
+        # Without ON CONFLICT the keys are looked up before writing
+        monkeypatch.setattr('backend.scripts.load_corpus.UPSERT_DIALECTS', upsert_dialects)
+        surahs, ayahs, translation_en = corpus_files
+        messages = []
+
+        counts = load_corpus(
+            dbsession,
+            iter_surahs(str(surahs)),
+            iter_ayahs(str(ayahs), translation_en_path=str(translation_en)),
+            batch_size=2,
+            report=messages.append,
+        )
+
+        assert counts == (2, 3)
+        assert 'rows/s' in messages[-1]
+        ayah = dbsession.query(Ayah).join(Surah).filter(
+            Surah.surah_number == 112, Ayah.ayah_number_in_surah == 1
+        ).one()
+        assert ayah.translation_en == 'Say, He is Allah, One'
+        assert [hit[0] for hit in search_ayah_ids(dbsession, 'قل هو الله', 10)] == [ayah.id]
+
+        # Loading again updates rows in place instead of duplicating them,
+        # and a file without translations keeps the stored ones
+        load_corpus(dbsession, (), iter_ayahs(str(ayahs)), report=messages.append)
+        assert dbsession.query(Ayah).count() == 3
+        dbsession.expire_all()
+        assert dbsession.query(Ayah).filter_by(id=ayah.id).one().translation_en == 'Say, He is Allah, One'
+
+    def test_json_array_files(self, dbsession, tmp_path):
+        surahs = tmp_path / 'surahs.json'
+        surahs.write_text(
+            '[{"number": 1, "name": "الفاتحة", "englishName": "Al-Fatihah", "numberOfAyahs": 7}]',
+            encoding='utf-8'
+        )
+        ayahs = tmp_path / 'ayahs.json'
+        ayahs.write_text(
+            '[{"surah": 1, "ayah": 1, "text": "بِسْمِ ٱللَّهِ", "translation_id": "Dengan nama Allah"}]',
+            encoding='utf-8'
+        )
+
+        assert load_corpus(dbsession, iter_surahs(str(surahs)), iter_ayahs(str(ayahs)), report=lambda message: None) == (1, 1)
+        assert dbsession.query(Ayah).one().translation_id == 'Dengan nama Allah'
+
+        ayahs.write_text('{"surah": 1}', encoding='utf-8')
+        with pytest.raises(CorpusFormatError):
+            list(iter_ayahs(str(ayahs)))
+
+    def test_translation_out_of_step(self, tmp_path, corpus_files):
+        _, ayahs, _ = corpus_files
+        translation = tmp_path / 'id.indonesian.txt'
+        translation.write_text('1|2|Segala puji bagi Allah\n', encoding='utf-8')
+
+        with pytest.raises(CorpusFormatError):
+            list(iter_ayahs(str(ayahs), translation_id_path=str(translation)))
+
+    def test_unknown_surah(self, dbsession, corpus_files):
+        _, ayahs, _ = corpus_files
+
+        with pytest.raises(CorpusFormatError):
+            load_corpus(dbsession, (), iter_ayahs(str(ayahs)), report=lambda message: None)
+
+
+def test_copy_rows_send_null_for_missing_values():
+    assert csv_row([1, 'a "b"', None, '']) == '1,"a ""b""",,""\n'
@@ -0,0 +1,250 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from pyramid.httpexceptions import HTTPForbidden, HTTPServiceUnavailable
+
+from backend.models.mymodel import User, Reminder, ReminderOccurrence
+from backend.push import Channel, EventStream, PushHub, PushSettings
+from backend.utils.http_cache import CHANGED_USERS, bump_collection_version
+from backend.utils.jwt_helper import create_token
+from backend.utils.timer_wheel import TimerWheel
+from backend.views.event_views import user_events_view
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+START = NOW.timestamp()
+
+
+class TestTimerWheel:
+
+    def test_fires_on_the_first_tick_at_or_after_the_time(self):
+        wheel = TimerWheel(0, slots=4, levels=3)
+        wheel.schedule('a', 2.5, 'A')
+        wheel.schedule('b', 3, 'B')
+
+        assert wheel.advance(2) == []
+        assert wheel.advance(3) == [('a', 'A'), ('b', 'B')]
+        assert len(wheel) == 0
+
+    def test_far_timers_cascade_down(self):
+        # Level 2 buckets span 16 ticks; 100 is beyond the whole wheel (64)
+        wheel = TimerWheel(0, slots=4, levels=3)
+        for when in (5, 17, 40, 100):
+            wheel.schedule(when, when, when)
+
+        fired = {}
+        for now in range(1, 120):
+            for key, _ in wheel.advance(now):
+                fired[key] = now
+
+        assert fired == {5: 5, 17: 17, 40: 40, 100: 100}
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimerWheel(0)
+        wheel.schedule('a', 10)
+        wheel.schedule('b', 10)
+        wheel.schedule('a', 20)
+
+        assert wheel.cancel('b') is True
+        assert wheel.cancel('b') is False
+        assert wheel.advance(15) == []
+        assert wheel.advance(20) == [('a', None)]
+
+    def test_past_timers_fire_on_the_next_advance(self):
+        wheel = TimerWheel(100)
+        wheel.schedule('late', 50)
+        assert wheel.advance(100) == [('late', None)]
+
+
+class TestChannel:
+
+    def test_events_after_an_id(self):
+        channel = Channel()
+        for name in ('a', 'b', 'c'):
+            channel.publish(name, {})
+
+        assert [item['event'] for item in channel.since(1)] == ['b', 'c']
+        assert channel.since(3) == []
+        assert channel.wait(3, 0) == []
+
+    def test_readers_resync_when_events_were_dropped(self):
+        channel = Channel(backlog=2)
+        for name in ('a', 'b', 'c'):
+            channel.publish(name, {})
+
+        assert [item['event'] for item in channel.since(1)] == ['b', 'c']
+        assert channel.since(0) is None
+        # An id handed out by another process
+        assert channel.since(10) is None
+
+
+@pytest.fixture
+def user(dbsession):
+    user = User(username='push_user', email='push_user@example.com')
+    user.set_password('SecurePassword123!')
+    dbsession.add(user)
+    dbsession.flush()
+    return user
+
+
+@pytest.fixture
+def hub():
+    return PushHub(None, PushSettings({'push.horizon': '3600', 'push.poll_interval': '5'}))
+
+
+def add_reminder(dbsession, user, due_in, **values):
+    reminder = Reminder(user_id=user.id, surat='Al-Mulk', ayat='1-10', due_date=NOW + due_in, **values)
+    dbsession.add(reminder)
+    dbsession.flush()
+    return reminder
+
+
+def events(channel, after=0):
+    return [(item['event'], item['data'].get('id')) for item in channel.since(after)]
+
+
+class TestPushHub:
+
+    def test_publishes_reminders_as_they_come_due(self, hub, dbsession, user):
+        soon = add_reminder(dbsession, user, timedelta(minutes=30))
+        add_reminder(dbsession, user, timedelta(minutes=-5))
+        add_reminder(dbsession, user, timedelta(minutes=10), is_completed=True)
+        add_reminder(dbsession, user, timedelta(hours=3))
+        daily = add_reminder(dbsession, user, timedelta(days=-2, minutes=45), recurrence='FREQ=DAILY')
+        dbsession.add(ReminderOccurrence(reminder_id=daily.id, occurs_at=NOW + timedelta(minutes=45)))
+        weekly = add_reminder(dbsession, user, timedelta(days=-7, minutes=50), recurrence='FREQ=WEEKLY')
+        channel = hub.connect(user.id)
+
+        hub.tick(dbsession, now=START)
+        hub.tick(dbsession, now=START + 29 * 60)
+        assert events(channel) == []
+
+        hub.tick(dbsession, now=START + 30 * 60)
+        hub.tick(dbsession, now=START + 59 * 60)
+        assert events(channel) == [('reminder-due', soon.id), ('reminder-due', weekly.id)]
+        assert channel.events[-1]['data']['due_date'] == (NOW + timedelta(minutes=50)).isoformat()
+
+    def test_reminder_changes_reschedule_timers(self, hub, dbsession, user):
+        reminder = add_reminder(dbsession, user, timedelta(minutes=10))
+        channel = hub.connect(user.id)
+        hub.tick(dbsession, now=START)
+
+        reminder.due_date = NOW + timedelta(minutes=20)
+        bump_collection_version(dbsession, user.id, User.reminder_version)
+        hub.changed(dbsession.info.pop(CHANGED_USERS))
+        hub.tick(dbsession, now=START + 60)
+
+        hub.tick(dbsession, now=START + 15 * 60)
+        assert events(channel) == [('reminders-changed', None)]
+        hub.tick(dbsession, now=START + 20 * 60)
+        assert events(channel, 1) == [('reminder-due', reminder.id)]
+
+        deleted = add_reminder(dbsession, user, timedelta(minutes=30))
+        bump_collection_version(dbsession, user.id, User.reminder_version)
+        hub.changed([user.id])
+        hub.tick(dbsession, now=START + 21 * 60)
+        dbsession.delete(deleted)
+        bump_collection_version(dbsession, user.id, User.reminder_version)
+        hub.changed([user.id])
+        hub.tick(dbsession, now=START + 22 * 60)
+        hub.tick(dbsession, now=START + 31 * 60)
+        assert events(channel, 2) == [('reminders-changed', None)] * 2
+
+    def test_hafalan_writes_are_seen_by_polling(self, hub, dbsession, user):
+        channel = hub.connect(user.id)
+        hub.tick(dbsession, now=START)
+
+        bump_collection_version(dbsession, user.id, User.hafalan_version)
+        # Without a commit hook call the change waits for the next poll
+        hub.tick(dbsession, now=START + 1)
+        assert events(channel) == []
+        hub.tick(dbsession, now=START + 5)
+        assert [item['event'] for item in channel.since(0)] == ['hafalan-changed']
+        assert channel.events[0]['data'] == {'version': 1}
+
+    def test_idle_channels_linger_then_close(self, hub, dbsession, user):
+        add_reminder(dbsession, user, timedelta(minutes=10))
+        hub.clock = lambda: START
+        channel = hub.connect(user.id)
+        hub.tick(dbsession, now=START)
+        hub.disconnect(channel)
+
+        hub.tick(dbsession, now=START + 30)
+        assert hub.connect(user.id) is channel
+        hub.disconnect(channel)
+        hub.tick(dbsession, now=START + 60)
+
+        assert hub.connect(user.id) is not channel
+        assert len(hub._wheel) == 0
+
+
+class TestEventsView:
+
+    @pytest.fixture
+    def events_request(self, dummy_config, dummy_request, hub, user):
+        dummy_request.user = {'user_id': user.id}
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        dummy_config.registry['push_hub'] = hub
+        return dummy_request
+
+    def test_long_poll_returns_events_after_the_given_id(self, events_request, hub, user):
+        channel = hub.connect(user.id)
+        channel.publish('hafalan-changed', {'version': 1})
+        channel.publish('hafalan-changed', {'version': 2})
+        events_request.params = {'after': '1', 'wait': '0'}
+
+        result = user_events_view(events_request)
+
+        assert [item['data'] for item in result['events']] == [{'version': 2}]
+        assert result['last_id'] == 2 and result['resync'] is False
+        assert channel.readers == 1
+
+    def test_event_stream(self, events_request, hub, user):
+        events_request.headers['Accept'] = 'text/event-stream'
+        events_request.headers['Last-Event-ID'] = '0'
+        channel = hub.connect(user.id)
+        channel.publish('reminder-due', {'id': 7})
+
+        response = user_events_view(events_request)
+        body = iter(response.app_iter)
+
+        assert response.content_type == 'text/event-stream'
+        assert next(body) == b'retry: 5000\n\n'
+        assert next(body) == b'id: 1\nevent: reminder-due\ndata: {"id":7}\n\n'
+        assert channel.readers == 2
+        response.app_iter.close()
+        assert channel.readers == 1
+
+    def test_disabled_or_foreign_user(self, dummy_request, user):
+        dummy_request.user = {'user_id': user.id}
+        dummy_request.matchdict = {'user_id': str(user.id)}
+        with pytest.raises(HTTPServiceUnavailable):
+            user_events_view(dummy_request)
+
+        dummy_request.matchdict = {'user_id': str(user.id + 1)}
+        with pytest.raises(HTTPForbidden):
+            user_events_view(dummy_request)
+
+    def test_access_token_for_event_source(self, testapp, user):
+        headers = {'Authorization': f'Bearer {create_token(user.id, user.username)}'}
+        issued = testapp.post(f'/api/v1/users/{user.id}/events/token', headers=headers).json
+        events_path = f'/api/v1/users/{user.id}/events'
+        assert issued['url'] == f'{events_path}?access_token={issued["token"]}'
+        assert issued['expires_in'] == 300
+
+        # Authenticated; push is not enabled in testing.ini
+        testapp.get(issued['url'], status=503)
+        # Only on the events path and never as a bearer token
+        testapp.get(f'/api/v1/users/{user.id}/reminders?access_token={issued["token"]}', status=401)
+        testapp.get(events_path, headers={'Authorization': f'Bearer {issued["token"]}'}, status=401)
+        testapp.post(f'/api/v1/users/{user.id + 1}/events/token', headers=headers, status=403)
+
+
+def test_event_stream_sends_heartbeats_and_resyncs():
+    channel = Channel(backlog=1)
+    hub = PushHub(None)
+    stream = iter(EventStream(hub, channel, after=0, heartbeat=0))
+
+    next(stream)
+    assert next(stream) == b': keep-alive\n\n'
+    channel.publish('a', {})
+    channel.publish('b', {})
+    assert next(stream) == b'id: 2\nevent: resync\ndata: {}\n\n'
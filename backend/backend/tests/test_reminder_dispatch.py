@@ -0,0 +1,229 @@
+import contextlib
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from backend.models.mymodel import User, Reminder, ReminderOccurrence
+from backend.utils.reminder_dispatch import (
+    DispatchMetrics,
+    DispatchSettings,
+    claim_batch,
+    dispatch_once,
+    finish_batch,
+    notifications,
+)
+from backend.utils.reminder_sinks import LogSink, Sink, WebhookSink, load_sinks
+from backend.views.reminder_views import update_reminder_view
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+LEASE = timedelta(minutes=5)
+
+
+class FailingSink(Sink):
+    name = 'failing'
+
+    def send(self, notification):
+        raise ConnectionError('unreachable')
+
+
+@pytest.fixture
+def user(dbsession):
+    user = User(username='dispatch_user', email='dispatch_user@example.com')
+    user.set_password('SecurePassword123!')
+    dbsession.add(user)
+    dbsession.flush()
+    return user
+
+
+@pytest.fixture
+def add_reminder(dbsession, user):
+    def add(due_in, **values):
+        reminder = Reminder(user_id=user.id, surat='Al-Mulk', ayat='1-10', due_date=NOW + due_in, **values)
+        dbsession.add(reminder)
+        dbsession.flush()
+        return reminder
+    return add
+
+
+def ids(reminders):
+    return [reminder.id for reminder in reminders]
+
+
+class TestClaimBatch:
+
+    def test_claims_only_due_pending_reminders(self, dbsession, add_reminder):
+        due = add_reminder(timedelta(hours=-2))
+        due_later = add_reminder(timedelta(minutes=-1))
+        add_reminder(timedelta(hours=1))
+        add_reminder(timedelta(hours=-1), is_completed=True)
+        add_reminder(timedelta(hours=-1), dispatch_status='sent')
+        add_reminder(timedelta(hours=-1), next_attempt_at=NOW + timedelta(minutes=1))
+
+        token, claimed = claim_batch(dbsession, 10, LEASE, now=NOW)
+
+        assert ids(claimed) == [due.id, due_later.id]
+        assert all(reminder.claim_token == token for reminder in claimed)
+
+    def test_claims_do_not_overlap_until_lease_expires(self, dbsession, add_reminder):
+        reminders = [add_reminder(timedelta(minutes=-minutes)) for minutes in (3, 2, 1)]
+
+        _, first = claim_batch(dbsession, 2, LEASE, now=NOW)
+        _, second = claim_batch(dbsession, 2, LEASE, now=NOW)
+        _, third = claim_batch(dbsession, 2, LEASE, now=NOW + timedelta(minutes=1))
+        _, expired = claim_batch(dbsession, 5, LEASE, now=NOW + LEASE + timedelta(seconds=1))
+
+        assert ids(first) == ids(reminders[:2])
+        assert ids(second) == ids(reminders[2:])
+        assert third == []
+        assert ids(expired) == ids(reminders)
+
+    def test_notifications_include_user_contact(self, dbsession, user, add_reminder):
+        add_reminder(timedelta(minutes=-1))
+        _, claimed = claim_batch(dbsession, 10, LEASE, now=NOW)
+
+        [notification] = notifications(dbsession, claimed)
+
+        assert notification['user'] == {'id': user.id, 'username': 'dispatch_user', 'email': 'dispatch_user@example.com'}
+        assert notification['reminder']['surat'] == 'Al-Mulk'
+        assert notification['attempt'] == 1
+
+
+class TestFinishBatch:
+
+    def test_failures_back_off_then_give_up(self, dbsession, add_reminder):
+        reminder = add_reminder(timedelta(minutes=-1))
+        settings = DispatchSettings({'reminders.dispatch.max_attempts': '3', 'reminders.dispatch.backoff_seconds': '60'})
+
+        now = NOW
+        retries = []
+        for _ in range(3):
+            token, claimed = claim_batch(dbsession, 10, LEASE, now=now)
+            assert ids(claimed) == [reminder.id]
+            outcome = finish_batch(dbsession, token, {reminder.id: 'smtp: refused'}, settings, now=now)
+            if reminder.next_attempt_at is not None:
+                retries.append(reminder.next_attempt_at - now)
+                now = reminder.next_attempt_at
+
+        assert retries == [timedelta(seconds=60), timedelta(seconds=120)]
+        assert outcome == {'sent': 0, 'retried': 0, 'failed': 1, 'lost': 0}
+        assert reminder.dispatch_status == 'failed'
+        assert reminder.dispatch_attempts == 3
+        assert reminder.last_error == 'smtp: refused'
+        assert claim_batch(dbsession, 10, LEASE, now=now + timedelta(days=1))[1] == []
+
+    def test_lost_claim_is_not_recorded(self, dbsession, add_reminder):
+        reminder = add_reminder(timedelta(minutes=-1))
+        stale, _ = claim_batch(dbsession, 10, LEASE, now=NOW)
+        later = NOW + LEASE + timedelta(seconds=1)
+        current, _ = claim_batch(dbsession, 10, LEASE, now=later)
+
+        outcome = finish_batch(dbsession, stale, {reminder.id: None}, DispatchSettings(), now=later)
+
+        assert outcome == {'sent': 0, 'retried': 0, 'failed': 0, 'lost': 1}
+        assert reminder.dispatch_status == 'pending'
+        assert reminder.claim_token == current
+
+
+class TestDispatchOnce:
+
+    def test_delivers_to_log_sink_file(self, dbsession, add_reminder, tmp_path):
+        reminders = [add_reminder(timedelta(minutes=-minutes)) for minutes in (2, 1)]
+        path = tmp_path / 'reminders.jsonl'
+        sinks = load_sinks({'reminders.sinks': 'log', 'reminders.sink.log.path': str(path)})
+        metrics = DispatchMetrics()
+
+        claimed = dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW)
+
+        assert claimed == 2
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line['reminder']['id'] for line in lines] == ids(reminders)
+        assert all(reminder.dispatch_status == 'sent' for reminder in reminders)
+        assert all(reminder.dispatched_at is not None for reminder in reminders)
+        assert metrics.to_dict()['sent'] == 2
+        assert dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW) == 0
+
+    def test_any_failing_sink_schedules_retry(self, dbsession, add_reminder):
+        reminder = add_reminder(timedelta(minutes=-1))
+        sinks = [LogSink({}), FailingSink({})]
+        metrics = DispatchMetrics()
+
+        dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW)
+
+        assert reminder.dispatch_status == 'pending'
+        assert reminder.last_error == 'failing: unreachable'
+        assert reminder.next_attempt_at is not None
+        assert metrics.retried == 1 and metrics.sent == 0
+
+    def test_retry_skips_sinks_that_accepted(self, dbsession, add_reminder):
+        reminder = add_reminder(timedelta(minutes=-1))
+        received = []
+        recorder = type('Recorder', (Sink,), {'name': 'recorder', 'send': lambda self, notification: received.append(notification)})({})
+        flaky = FailingSink({})
+        metrics = DispatchMetrics()
+
+        dispatch_once(contextlib.nullcontext(), dbsession, [recorder, flaky], DispatchSettings(), metrics, now=NOW)
+        assert reminder.delivered_sinks == 'recorder'
+
+        # The failing sink recovers; the retry goes to it alone
+        flaky.send = lambda notification: None
+        dispatch_once(contextlib.nullcontext(), dbsession, [recorder, flaky], DispatchSettings(), metrics, now=reminder.next_attempt_at)
+
+        assert len(received) == 1
+        assert reminder.dispatch_status == 'sent'
+        assert reminder.delivered_sinks is None
+        assert (metrics.retried, metrics.sent) == (1, 1)
+
+    def test_recurring_reminder_waits_for_its_next_occurrence(self, dbsession, add_reminder):
+        reminder = add_reminder(timedelta(days=-15), recurrence='FREQ=WEEKLY')
+        metrics = DispatchMetrics()
+        batches = []
+        sinks = [type('Recorder', (Sink,), {'send': lambda self, notification: batches.append(notification)})({})]
+
+        dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW)
+
+        # Only the latest missed occurrence is delivered
+        assert [notification['occurs_at'] for notification in batches] == [(NOW - timedelta(days=1)).isoformat()]
+        assert reminder.dispatch_status == 'pending'
+        assert reminder.next_attempt_at == NOW + timedelta(days=6)
+        assert dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW + timedelta(days=5)) == 0
+
+        # An occurrence completed in advance is skipped, not delivered
+        dbsession.add(ReminderOccurrence(reminder_id=reminder.id, occurs_at=NOW + timedelta(days=6)))
+        dbsession.flush()
+        dispatch_once(contextlib.nullcontext(), dbsession, sinks, DispatchSettings(), metrics, now=NOW + timedelta(days=6))
+
+        assert len(batches) == 1
+        assert metrics.skipped == 1
+        assert reminder.next_attempt_at == NOW + timedelta(days=13)
+
+
+def test_load_sinks_by_name_and_dotted_path():
+    sinks = load_sinks({'reminders.sinks': 'webhook\ntests.test_reminder_dispatch.FailingSink'})
+    assert [type(sink) for sink in sinks] == [WebhookSink, FailingSink]
+
+
+def test_rescheduling_makes_reminder_deliverable_again(dummy_request, dbsession, user, add_reminder):
+    reminder = add_reminder(timedelta(minutes=-1), dispatch_status='sent', dispatch_attempts=1, dispatched_at=NOW)
+    dummy_request.user = {'user_id': user.id}
+    dummy_request.matchdict = {'reminder_id': str(reminder.id)}
+    dummy_request.json_body = {'due_date': (NOW + timedelta(days=1)).replace(tzinfo=None).isoformat()}
+
+    update_reminder_view(dummy_request)
+
+    assert reminder.dispatch_status == 'pending'
+    assert reminder.dispatch_attempts == 0
+    assert reminder.dispatched_at is None
+
+
+def test_same_due_date_keeps_dispatch_state(dummy_request, dbsession, user, add_reminder):
+    # The stored value is aware, as PostgreSQL loads it
+    reminder = add_reminder(timedelta(minutes=-1), dispatch_status='sent', dispatch_attempts=1, dispatched_at=NOW)
+    dummy_request.user = {'user_id': user.id}
+    dummy_request.matchdict = {'reminder_id': str(reminder.id)}
+    for due_date in ('2026-10-18T11:59:00', '2026-10-18T18:59:00+07:00'):
+        dummy_request.json_body = {'due_date': due_date, 'surat': 'Al-Mulk'}
+
+        update_reminder_view(dummy_request)
+
+        assert reminder.dispatch_status == 'sent'
+        assert reminder.dispatched_at == NOW
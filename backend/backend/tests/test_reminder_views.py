@@ -0,0 +1,358 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from pyramid.httpexceptions import HTTPBadRequest
+from sqlalchemy import event
+
+from backend.models.mymodel import User, Reminder, ReminderOccurrence
+from backend.utils.recurrence import RecurrenceError, Rule
+from backend.views.reminder_views import (
+    bulk_user_reminders_view,
+    create_user_reminder_view,
+    list_user_reminders_view,
+    shifted,
+    update_reminder_occurrence_view,
+    update_reminder_view,
+)
+from backend.views.sync_views import user_sync_view
+
+UTC = timezone.utc
+
+
+@pytest.fixture
+def reminder_request(dummy_request, dbsession):
+    user = User(username='test_reminder_user', email='test_reminder@example.com')
+    user.set_password('SecurePassword123!')
+    dbsession.add(user)
+    dbsession.flush()
+    dummy_request.user = {'user_id': user.id}
+    return dummy_request, user
+
+
+def call(view, request, matchdict, json_body=None, params=None):
+    request.matchdict = matchdict
+    request.json_body = json_body
+    request.params = params or {}
+    request.response.status_code = 200
+    return view(request)
+
+
+class TestRecurrenceRule:
+
+    def test_parse_normalizes(self):
+        assert str(Rule.parse('RRULE:freq=weekly;interval=1')) == 'FREQ=WEEKLY'
+        assert str(Rule.parse('FREQ=DAILY;INTERVAL=2;UNTIL=2026-12-31T00:00:00Z')) == 'FREQ=DAILY;INTERVAL=2;UNTIL=20261231T000000Z'
+
+    @pytest.mark.parametrize('text', [
+        'FREQ=MONTHLY', 'FREQ=WEEKLY;BYDAY=FR', 'FREQ=DAILY;COUNT=0',
+        'FREQ=DAILY;COUNT=2;UNTIL=20261231T000000Z', 'WEEKLY', '',
+    ])
+    def test_rejects_unsupported_rules(self, text):
+        with pytest.raises(RecurrenceError):
+            Rule.parse(text)
+
+    def test_occurrences_are_computed_from_the_window(self):
+        start = datetime(2026, 1, 2, 5, 0, tzinfo=UTC)
+        rule = Rule.parse('FREQ=WEEKLY;INTERVAL=2;COUNT=30')
+
+        moments = rule.between(start, datetime(2026, 10, 1, tzinfo=UTC), datetime(2026, 10, 31, tzinfo=UTC))
+
+        assert moments == [datetime(2026, 10, 9, 5, 0, tzinfo=UTC), datetime(2026, 10, 23, 5, 0, tzinfo=UTC)]
+        assert rule.last(start) == start + 29 * timedelta(weeks=2)
+        assert rule.latest(start, datetime(2026, 10, 20, tzinfo=UTC)) == datetime(2026, 10, 9, 5, 0, tzinfo=UTC)
+        assert rule.following(start, datetime(2026, 10, 9, 5, 0, tzinfo=UTC)) == datetime(2026, 10, 23, 5, 0, tzinfo=UTC)
+        assert rule.following(start, rule.last(start)) is None
+
+
+class TestRecurringReminders:
+
+    @pytest.fixture
+    def weekly(self, reminder_request):
+        dummy_request, user = reminder_request
+        reminder = call(create_user_reminder_view, dummy_request, {'user_id': str(user.id)}, {
+            'surat': 'Al-Kahf', 'ayat': '1-110', 'due_date': '2026-10-02T05:00:00', 'recurrence': 'FREQ=WEEKLY;COUNT=8',
+        })
+        return dummy_request, user, reminder
+
+    def window(self, dummy_request, user, first, last, **params):
+        return call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)},
+                    params=dict(params, **{'from': first, 'to': last}))
+
+    def test_listing_expands_only_the_window(self, weekly):
+        dummy_request, user, reminder = weekly
+        one_shot = call(create_user_reminder_view, dummy_request, {'user_id': str(user.id)},
+                        {'surat': 'Al-Mulk', 'ayat': '1-30', 'due_date': '2026-10-20T20:00:00'})
+        call(create_user_reminder_view, dummy_request, {'user_id': str(user.id)},
+             {'surat': 'Yasin', 'ayat': '1-83', 'due_date': '2026-12-01T20:00:00'})
+
+        items = self.window(dummy_request, user, '2026-10-10', '2026-10-31')
+
+        assert reminder['recurrence'] == 'FREQ=WEEKLY;COUNT=8'
+        assert [(item['id'], item['due_date']) for item in items] == [
+            (reminder['id'], '2026-10-16T05:00:00+00:00'),
+            (one_shot['id'], '2026-10-20T20:00:00+00:00'),
+            (reminder['id'], '2026-10-23T05:00:00+00:00'),
+            (reminder['id'], '2026-10-30T05:00:00+00:00'),
+        ]
+        # The series ends with its 8th occurrence
+        assert [item['due_date'] for item in self.window(dummy_request, user, '2026-11-10', '2026-12-31')] == [
+            '2026-11-13T05:00:00+00:00', '2026-11-20T05:00:00+00:00', '2026-12-01T20:00:00+00:00',
+        ]
+
+    def test_without_window_lists_one_row_per_schedule(self, weekly):
+        dummy_request, user, reminder = weekly
+
+        items = call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)})
+
+        assert [item['id'] for item in items] == [reminder['id']]
+
+    @pytest.mark.parametrize('params', [
+        {'from': '2026-10-01'},
+        {'from': '2026-10-31', 'to': '2026-10-01'},
+        {'from': '2026-01-01', 'to': '2027-06-01'},
+    ])
+    def test_invalid_windows_are_rejected(self, weekly, params):
+        dummy_request, user, _ = weekly
+        with pytest.raises(HTTPBadRequest):
+            call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)}, params=params)
+
+    def test_completing_one_occurrence_stores_an_override(self, weekly, dbsession):
+        dummy_request, user, reminder = weekly
+        match = {'reminder_id': str(reminder['id'])}
+
+        done = call(update_reminder_occurrence_view, dummy_request, match,
+                    {'occurs_at': '2026-10-09T05:00:00Z', 'is_completed': True})
+        items = self.window(dummy_request, user, '2026-10-01', '2026-10-20')
+
+        assert done['is_completed'] is True
+        assert [item['is_completed'] for item in items] == [False, True, False]
+        assert [item['due_date'] for item in self.window(dummy_request, user, '2026-10-01', '2026-10-20', completed='false')] == [
+            '2026-10-02T05:00:00+00:00', '2026-10-16T05:00:00+00:00',
+        ]
+        assert dbsession.query(ReminderOccurrence).count() == 1
+
+        call(update_reminder_occurrence_view, dummy_request, match,
+             {'occurs_at': '2026-10-09T05:00:00Z', 'is_completed': False})
+        assert dbsession.query(ReminderOccurrence).count() == 0
+
+    def test_occurrence_must_belong_to_the_series(self, weekly):
+        dummy_request, user, reminder = weekly
+
+        response = call(update_reminder_occurrence_view, dummy_request, {'reminder_id': str(reminder['id'])},
+                        {'occurs_at': '2026-10-10T05:00:00Z', 'is_completed': True})
+
+        assert dummy_request.response.status_code == 400
+        assert 'not an occurrence' in response['error']
+
+    def test_invalid_rule_is_rejected(self, weekly):
+        dummy_request, user, reminder = weekly
+
+        response = call(update_reminder_view, dummy_request, {'reminder_id': str(reminder['id'])},
+                        {'recurrence': 'FREQ=HOURLY'})
+
+        assert dummy_request.response.status_code == 400
+        assert 'FREQ' in response['error']
+
+    def test_moving_due_date_moves_the_series_end(self, weekly):
+        dummy_request, user, reminder = weekly
+
+        call(update_reminder_view, dummy_request, {'reminder_id': str(reminder['id'])}, {'due_date': '2026-10-03T05:00:00'})
+        items = self.window(dummy_request, user, '2026-11-14', '2026-11-30')
+
+        assert [item['due_date'] for item in items] == ['2026-11-14T05:00:00+00:00', '2026-11-21T05:00:00+00:00']
+
+
+class TestReminderPagination:
+
+    @pytest.fixture
+    def reminders(self, reminder_request):
+        dummy_request, user = reminder_request
+        match = {'user_id': str(user.id)}
+        created = [
+            call(create_user_reminder_view, dummy_request, match,
+                 {'surat': 'Al-Mulk', 'ayat': '1-30', 'due_date': f'2026-10-{day:02d}T20:00:00', 'is_completed': day == 19})
+            for day in (18, 19, 20, 20, 22, 30)
+        ]
+        series = call(create_user_reminder_view, dummy_request, match,
+                      {'surat': 'Al-Kahf', 'ayat': '1-110', 'due_date': '2026-10-16T05:00:00', 'recurrence': 'FREQ=WEEKLY'})
+        return dummy_request, user, created, series
+
+    def pages(self, dummy_request, user, **params):
+        seen, after = [], None
+        while True:
+            page_params = dict(params, **({'after': after} if after else {}))
+            dummy_request.response.headers.pop('X-Next-Cursor', None)
+            page = call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)}, params=page_params)
+            seen.append(page)
+            after = dummy_request.response.headers.get('X-Next-Cursor')
+            if not after:
+                return seen
+
+    def test_keyset_pages_cover_the_filtered_list(self, reminders):
+        dummy_request, user, created, series = reminders
+
+        pages = self.pages(dummy_request, user, completed='false', limit='2')
+
+        open_ids = [r['id'] for r in created if not r['is_completed']]
+        assert [len(page) for page in pages] == [2, 2, 2]
+        assert [item['id'] for page in pages for item in page] == [series['id']] + open_ids
+
+    def test_projected_pages(self, reminders):
+        dummy_request, user, created, series = reminders
+
+        pages = self.pages(dummy_request, user, fields='id', limit='4')
+
+        assert [item for page in pages for item in page] == [{'id': series['id']}] + [{'id': r['id']} for r in created]
+
+    def test_next_seven_days_window_pages(self, reminders):
+        dummy_request, user, created, series = reminders
+        params = {'from': '2026-10-18T00:00:00Z', 'to': '2026-10-25T00:00:00Z', 'completed': 'false'}
+
+        unpaged = call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)}, params=params)
+        pages = self.pages(dummy_request, user, limit='2', **params)
+
+        assert [(item['due_date'], item['id']) for item in unpaged] == [
+            ('2026-10-18T20:00:00+00:00', created[0]['id']),
+            ('2026-10-20T20:00:00+00:00', created[2]['id']),
+            ('2026-10-20T20:00:00+00:00', created[3]['id']),
+            ('2026-10-22T20:00:00+00:00', created[4]['id']),
+            ('2026-10-23T05:00:00+00:00', series['id']),
+        ]
+        assert [item for page in pages for item in page] == unpaged
+
+    def test_listing_reads_the_composite_index(self, reminders, dbsession):
+        dummy_request, user, _, _ = reminders
+        statements = []
+        listener = lambda conn, cursor, statement, parameters, *args: statements.append((conn, statement, parameters))
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)},
+                 params={'completed': 'false', 'limit': '2'})
+            call(list_user_reminders_view, dummy_request, {'user_id': str(user.id)},
+                 params={'completed': 'false', 'limit': '2', 'after': dummy_request.response.headers['X-Next-Cursor']})
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+        # The first page and one seeking past a cursor, both in index order
+        queries = [s for s in statements if 'FROM reminders' in s[1]]
+        assert len(queries) == 2
+        for conn, statement, parameters in queries:
+            plan = ' '.join(str(row) for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+            assert 'ix_reminders_user_completed_due' in plan
+            assert 'TEMP B-TREE' not in plan
+
+
+class TestBulkReminders:
+
+    @pytest.fixture
+    def backlog(self, reminder_request, dbsession):
+        dummy_request, user = reminder_request
+        match = {'user_id': str(user.id)}
+        created = [
+            call(create_user_reminder_view, dummy_request, match,
+                 {'surat': 'Al-Mulk', 'ayat': '1-30', 'due_date': f'2026-10-{day:02d}T20:00:00.250000'})
+            for day in (10, 12, 14, 20)
+        ]
+        series = call(create_user_reminder_view, dummy_request, match,
+                      {'surat': 'Al-Kahf', 'ayat': '1-110', 'due_date': '2026-10-02T05:00:00', 'recurrence': 'FREQ=WEEKLY'})
+        other = User(username='bulk_other', email='bulk_other@example.com')
+        other.set_password('SecurePassword123!')
+        dbsession.add(other)
+        dbsession.flush()
+        foreign = Reminder(user_id=other.id, surat='Yasin', ayat='1', due_date=datetime(2026, 10, 1))
+        dbsession.add(foreign)
+        dbsession.flush()
+        return dummy_request, user, created, series, foreign
+
+    def bulk(self, dummy_request, user, body):
+        return call(bulk_user_reminders_view, dummy_request, {'user_id': str(user.id)}, body)
+
+    def reload(self, dbsession, reminder_id):
+        return dbsession.query(Reminder).filter_by(id=reminder_id).populate_existing().one_or_none()
+
+    def test_complete_by_filter_is_one_update(self, backlog, dbsession):
+        dummy_request, user, created, series, foreign = backlog
+        version = lambda: dbsession.query(User.reminder_version).filter_by(id=user.id).scalar()
+        before = version()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            response = self.bulk(dummy_request, user, {'action': 'complete', 'filter': {'due_before': '2026-10-15T00:00:00Z'}})
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+        # The three one-shot reminders; not the series, whose first occurrence
+        # is due before, nor the other user's
+        assert response == {'action': 'complete', 'affected': 3}
+        # Count, reservation and version bump in one UPDATE of the user row
+        # (read back as SQLite has no RETURNING here), then the reminders
+        assert len(statements) == 3
+        assert statements[0].startswith('UPDATE users SET')
+        assert 'UPDATE reminders SET' in statements[2]
+        completed = [self.reload(dbsession, r['id']) for r in created[:3]]
+        assert all(reminder.is_completed for reminder in completed)
+        assert len({reminder.change_seq for reminder in completed}) == 3
+        assert not self.reload(dbsession, series['id']).is_completed
+        assert not self.reload(dbsession, created[3]['id']).is_completed
+        assert not self.reload(dbsession, foreign.id).is_completed
+
+        # Already completed reminders are not counted again
+        assert self.bulk(dummy_request, user, {'action': 'complete', 'ids': [r['id'] for r in created]})['affected'] == 1
+        assert version() == before + 2
+        # Nothing matching leaves the version alone
+        assert self.bulk(dummy_request, user, {'action': 'complete', 'ids': [r['id'] for r in created]})['affected'] == 0
+        assert version() == before + 2
+
+    def test_snooze_moves_one_shot_reminders(self, backlog, dbsession):
+        dummy_request, user, created, series, foreign = backlog
+        sent = self.reload(dbsession, created[0]['id'])
+        sent.dispatch_status = 'sent'
+        dbsession.flush()
+
+        response = self.bulk(dummy_request, user, {'action': 'snooze', 'minutes': 90, 'ids': [created[0]['id'], series['id'], foreign.id]})
+
+        assert response == {'action': 'snooze', 'affected': 1}
+        snoozed = self.reload(dbsession, created[0]['id'])
+        assert snoozed.due_date.replace(tzinfo=None) == datetime(2026, 10, 10, 21, 30, 0, 250000)
+        assert snoozed.dispatch_status == 'pending'
+        assert self.reload(dbsession, series['id']).due_date.replace(tzinfo=None) == datetime(2026, 10, 2, 5, 0)
+
+    def test_snooze_rejected_without_timestamp_shift(self, backlog, dbsession, monkeypatch):
+        dummy_request, user, created, _, _ = backlog
+        assert shifted('oracle', Reminder.due_date, 90) is None
+        monkeypatch.setattr('backend.views.reminder_views.shifted', lambda *args: None)
+
+        response = self.bulk(dummy_request, user, {'action': 'snooze', 'minutes': 90, 'ids': [created[0]['id']]})
+
+        assert dummy_request.response.status_code == 400
+        assert response == {'error': 'Snoozing is not supported on this database'}
+        assert self.reload(dbsession, created[0]['id']).due_date.replace(tzinfo=None) == datetime(2026, 10, 10, 20, 0, 0, 250000)
+
+    def test_delete_leaves_tombstones_for_sync(self, backlog, dbsession):
+        dummy_request, user, created, series, foreign = backlog
+        cursor = call(user_sync_view, dummy_request, {'user_id': str(user.id)})['cursor']
+
+        response = self.bulk(dummy_request, user, {'action': 'delete', 'filter': {
+            'due_after': '2026-10-12T00:00:00', 'due_before': '2026-10-15T00:00:00', 'completed': False,
+        }})
+        changes = call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params={'since': cursor})
+
+        assert response == {'action': 'delete', 'affected': 2}
+        assert self.reload(dbsession, created[1]['id']) is None
+        assert self.reload(dbsession, created[0]['id']) is not None
+        assert sorted(changes['deleted']['reminders']) == [created[1]['id'], created[2]['id']]
+
+    @pytest.mark.parametrize('body', [
+        {'action': 'archive', 'ids': [1]},
+        {'action': 'complete'},
+        {'action': 'complete', 'ids': [1], 'filter': {'completed': False}},
+        {'action': 'delete', 'filter': {}},
+        {'action': 'delete', 'filter': {'surah': 'Al-Mulk'}},
+        {'action': 'snooze', 'ids': [1]},
+    ])
+    def test_invalid_requests(self, backlog, body):
+        dummy_request, user, _, _, _ = backlog
+
+        self.bulk(dummy_request, user, body)
+
+        assert dummy_request.response.status_code == 400
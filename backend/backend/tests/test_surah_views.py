@@ -0,0 +1,386 @@
+import pytest
+
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+from sqlalchemy import event
+
+from backend.models.mymodel import Surah, Ayah
+from backend.models.search import _like_search
+from backend.utils.corpus_cache import corpus_cache, get_corpus
+from backend.views.surah_views import (
+    list_surahs_view,
+    get_surah_view,
+    update_surah_view,
+    list_surah_ayahs_view,
+    autocomplete_surahs_view,
+)
+from backend.views.ayah_views import (
+    create_ayah_view,
+    delete_ayah_view,
+    list_ayahs_view,
+    get_ayah_view,
+    search_ayahs_view,
+)
+from backend.views.quran_views import get_quran_surah_view, list_quran_surahs_view
+
+
+@pytest.fixture
+def corpus(dbsession):
+    # The cache is per process, make sure nothing leaks in from other tests
+    corpus_cache.invalidate()
+
+    surah = Surah(
+        surah_number=1,
+        name_arabic='الفاتحة',
+        name_english='Al-Fatihah',
+        english_translation='The Opening',
+        number_of_ayahs=7,
+        revelation_type='Meccan'
+    )
+    dbsession.add(surah)
+    dbsession.flush()
+    for number in range(1, 4):
+        dbsession.add(Ayah(
+            surah_id=surah.id,
+            ayah_number_in_surah=number,
+            text_uthmani=f'text {number}',
+            translation_en=f'translation {number}'
+        ))
+    dbsession.flush()
+
+    yield surah
+
+    corpus_cache.invalidate()
+
+
+class TestCorpusCache:
+
+    def test_list_surahs(self, corpus, dummy_request):
+        response = list_surahs_view(dummy_request)
+
+        assert len(response) == 1
+        assert response[0]['name_english'] == 'Al-Fatihah'
+
+    def test_get_surah_by_number_and_name(self, corpus, dummy_request):
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+        assert get_surah_view(dummy_request)['id'] == corpus.id
+
+        dummy_request.matchdict = {'surah_id_or_number': 'fatihah'}
+        assert get_surah_view(dummy_request)['id'] == corpus.id
+
+    def test_list_surah_ayahs(self, corpus, dummy_request):
+        dummy_request.matchdict = {'surah_id_or_number': str(corpus.surah_number)}
+        response = list_surah_ayahs_view(dummy_request)
+
+        assert [a['ayah_number_in_surah'] for a in response] == [1, 2, 3]
+
+    def test_fields_projection(self, corpus, dummy_request):
+        dummy_request.params = {'fields': 'name_english,surah_number'}
+        assert list_surahs_view(dummy_request) == [{'surah_number': 1, 'name_english': 'Al-Fatihah'}]
+
+        dummy_request.params = {'fields': 'ayah_number_in_surah'}
+        assert list_ayahs_view(dummy_request) == [
+            {'ayah_number_in_surah': number} for number in (1, 2, 3)
+        ]
+
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+        dummy_request.params = {'fields': 'id,translation_en'}
+        response = list_surah_ayahs_view(dummy_request)
+        assert [list(a) for a in response] == [['id', 'translation_en']] * 3
+
+        dummy_request.params = {'fields': 'text'}
+        with pytest.raises(HTTPBadRequest):
+            list_surahs_view(dummy_request)
+
+    def test_reads_are_served_from_memory(self, corpus, dummy_request, dbsession):
+        list_surahs_view(dummy_request)
+
+        # A change that bypasses the admin views is not seen until invalidation
+        corpus.name_english = 'Changed'
+        dbsession.flush()
+        assert list_surahs_view(dummy_request)[0]['name_english'] == 'Al-Fatihah'
+
+        corpus_cache.invalidate()
+        assert list_surahs_view(dummy_request)[0]['name_english'] == 'Changed'
+
+    def test_admin_write_invalidates(self, corpus, dummy_request):
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+        assert get_surah_view(dummy_request)['name_english'] == 'Al-Fatihah'
+
+        dummy_request.json_body = {'name_english': 'The Opening'}
+        update_surah_view(dummy_request)
+
+        assert get_surah_view(dummy_request)['name_english'] == 'The Opening'
+
+    def test_uncommitted_writes_stay_out_of_the_shared_cache(self, corpus, dummy_request, dbsession):
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+        get_surah_view(dummy_request)
+
+        dummy_request.json_body = {'name_english': 'The Opening'}
+        update_surah_view(dummy_request)
+
+        assert get_surah_view(dummy_request)['name_english'] == 'The Opening'
+        # Other requests keep the committed snapshot until the commit hook runs
+        assert corpus_cache.get(dbsession).surahs[0]['name_english'] == 'Al-Fatihah'
+        for hook, args, kws in dummy_request.tm.get().getAfterCommitHooks():
+            hook(True, *args, **kws)
+        assert corpus_cache.get(dbsession).surahs[0]['name_english'] == 'The Opening'
+
+    def test_create_ayah_invalidates(self, corpus, dummy_request):
+        assert len(list_ayahs_view(dummy_request)) == 3
+
+        dummy_request.json_body = {
+            'surah_id': corpus.id,
+            'ayah_number_in_surah': 4,
+            'text_uthmani': 'text 4'
+        }
+        created = create_ayah_view(dummy_request)
+
+        assert len(list_ayahs_view(dummy_request)) == 4
+        dummy_request.matchdict = {'ayah_id': str(created['id'])}
+        assert get_ayah_view(dummy_request)['text_uthmani'] == 'text 4'
+
+    def test_get_missing_ayah(self, corpus, dummy_request):
+        dummy_request.matchdict = {'ayah_id': '9999'}
+
+        with pytest.raises(Exception) as excinfo:
+            get_ayah_view(dummy_request)
+
+        assert excinfo.value.status_code == 404
+
+    def test_list_ayahs_keyset_pagination(self, corpus, dummy_request):
+        dummy_request.params = {'limit': '2'}
+        first_page = list_ayahs_view(dummy_request)
+        cursor = dummy_request.response.headers['X-Next-Cursor']
+
+        assert [a['ayah_number_in_surah'] for a in first_page] == [1, 2]
+
+        dummy_request.response.headers.pop('X-Next-Cursor')
+        dummy_request.params = {'limit': '2', 'after': cursor}
+        second_page = list_ayahs_view(dummy_request)
+
+        assert [a['ayah_number_in_surah'] for a in second_page] == [3]
+        assert 'X-Next-Cursor' not in dummy_request.response.headers
+
+    def test_list_ayahs_range_in_surah(self, corpus, dummy_request):
+        dummy_request.params = {'surah_id': str(corpus.id), 'from': '2', 'to': '3'}
+        response = list_ayahs_view(dummy_request)
+
+        assert [a['ayah_number_in_surah'] for a in response] == [2, 3]
+
+    def test_list_ayahs_range_requires_surah(self, corpus, dummy_request):
+        dummy_request.params = {'from': '2'}
+
+        with pytest.raises(Exception) as excinfo:
+            list_ayahs_view(dummy_request)
+
+        assert excinfo.value.status_code == 400
+
+    def test_list_surah_ayahs_not_modified(self, corpus, dummy_request):
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+        list_surah_ayahs_view(dummy_request)
+        etag = dummy_request.response.headers['ETag']
+
+        assert dummy_request.response.headers['Cache-Control'].startswith('public')
+
+        dummy_request.headers['If-None-Match'] = etag
+        response = list_surah_ayahs_view(dummy_request)
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+    def test_preserialized_corpus_body(self, corpus, dummy_config, dummy_request):
+        import gzip
+        import json
+
+        dummy_config.add_settings({'corpus.preserialize': 'true', 'corpus.precompress': 'true'})
+        dummy_request.matchdict = {'surah_id_or_number': '1'}
+
+        response = list_surah_ayahs_view(dummy_request)
+        assert response.content_type == 'application/json'
+        assert [a['ayah_number_in_surah'] for a in json.loads(response.body)] == [1, 2, 3]
+        assert response.content_encoding is None
+
+        dummy_request.headers['Accept-Encoding'] = 'gzip, deflate'
+        response = list_surah_ayahs_view(dummy_request)
+        assert response.content_encoding == 'gzip'
+        assert response.headers['ETag'].endswith('-gzip"')
+        assert len(json.loads(gzip.decompress(response.body))) == 3
+
+        # The gzip validator revalidates the same representation
+        dummy_request.headers['If-None-Match'] = response.headers['ETag']
+        assert list_surah_ayahs_view(dummy_request).status_code == 304
+
+
+class TestAyahSearch:
+
+    @pytest.fixture
+    def indexed_corpus(self, corpus, dummy_request):
+        # Index through the admin view so the search table is maintained
+        dummy_request.json_body = {
+            'surah_id': corpus.id,
+            'ayah_number_in_surah': 4,
+            'text_uthmani': 'مَٰلِكِ يَوْمِ ٱلدِّينِ',
+            'translation_en': 'Sovereign of the Day of Recompense',
+            'translation_id': 'Pemilik hari pembalasan'
+        }
+        created = create_ayah_view(dummy_request)
+        dummy_request.json_body = {
+            'surah_id': corpus.id,
+            'ayah_number_in_surah': 6,
+            'text_uthmani': 'ٱهْدِنَا ٱلصِّرَٰطَ ٱلْمُسْتَقِيمَ',
+            'translation_en': 'Guide us to the straight path',
+        }
+        create_ayah_view(dummy_request)
+        return created
+
+    def test_search_arabic_without_diacritics(self, indexed_corpus, dummy_request):
+        dummy_request.params = {'q': 'يوم الدين'}
+        response = search_ayahs_view(dummy_request)
+
+        assert [a['id'] for a in response] == [indexed_corpus['id']]
+
+        # Superscript alef spelled out as in standard orthography
+        dummy_request.params = {'q': 'الصراط'}
+        assert [a['ayah_number_in_surah'] for a in search_ayahs_view(dummy_request)] == [6]
+
+    def test_search_translation_prefix(self, indexed_corpus, dummy_request):
+        dummy_request.params = {'q': 'pembala'}
+        response = search_ayahs_view(dummy_request)
+
+        assert len(response) == 1
+        assert response[0]['translation_id'] == 'Pemilik hari pembalasan'
+
+    def test_search_pagination(self, indexed_corpus, dummy_request):
+        dummy_request.params = {'q': 'the', 'limit': '1'}
+        first_page = search_ayahs_view(dummy_request)
+        cursor = dummy_request.response.headers['X-Next-Cursor']
+
+        dummy_request.params = {'q': 'the', 'limit': '1', 'after': cursor}
+        second_page = search_ayahs_view(dummy_request)
+
+        assert len(first_page) == len(second_page) == 1
+        assert first_page[0]['id'] != second_page[0]['id']
+
+    def test_like_fallback_for_other_dialects(self, indexed_corpus, dbsession):
+        hits = _like_search(dbsession.connection(), 'Straight path', 10, 0)
+        assert [(ayah_id, score) for ayah_id, score in hits] == [
+            (dbsession.query(Ayah.id).filter_by(ayah_number_in_surah=6).scalar(), 0.0)
+        ]
+        assert _like_search(dbsession.connection(), 'straight_path', 10, 0) == []
+
+    def test_deleted_ayah_is_unindexed(self, indexed_corpus, dummy_request):
+        dummy_request.matchdict = {'ayah_id': str(indexed_corpus['id'])}
+        delete_ayah_view(dummy_request)
+
+        dummy_request.params = {'q': 'الدين'}
+        assert search_ayahs_view(dummy_request) == []
+
+
+class TestSurahResolver:
+
+    @pytest.fixture
+    def surahs(self, corpus, dbsession):
+        for number, arabic, english, translation in (
+            (2, 'البقرة', 'Al-Baqarah', 'The Cow'),
+            (91, 'الشمس', 'Ash-Shams', 'The Sun'),
+            (113, 'الفلق', 'Al-Falaq', 'The Daybreak'),
+            (114, 'الناس', 'An-Nas', 'Mankind'),
+        ):
+            dbsession.add(Surah(
+                surah_number=number, name_arabic=arabic, name_english=english,
+                english_translation=translation, number_of_ayahs=1
+            ))
+        dbsession.flush()
+        corpus_cache.invalidate()
+
+    @pytest.mark.parametrize('identifier, surah_number', [
+        ('al-baqarah', 2),
+        ('baqara', 2),
+        ('Al Baqqarah', 2),
+        ('سُورَةُ البَقَرَةِ', 2),
+        ('cow', 2),
+        ('shams', 91),
+        ('falak', 113),
+        ('an-nas', 114),
+        ('al', None),
+        ('xyz', None),
+    ])
+    def test_resolve_names(self, surahs, dummy_request, identifier, surah_number):
+        surah = get_corpus(dummy_request).find_surah(identifier)
+
+        assert (surah and surah['surah_number']) == surah_number
+
+    def test_resolution_costs_no_queries(self, surahs, dummy_request, dbsession):
+        get_corpus(dummy_request)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        try:
+            dummy_request.matchdict = {'surah_id_or_number': 'baqarah'}
+            assert get_surah_view(dummy_request)['surah_number'] == 2
+            list_surah_ayahs_view(dummy_request)
+        finally:
+            event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+        assert statements == []
+
+    def test_autocomplete(self, surahs, dummy_request):
+        dummy_request.params = {'q': 'al-f'}
+        assert [s['surah_number'] for s in autocomplete_surahs_view(dummy_request)] == [1, 113]
+
+        dummy_request.params = {'q': '11'}
+        assert [s['surah_number'] for s in autocomplete_surahs_view(dummy_request)] == [113, 114]
+
+        dummy_request.params = {'q': ''}
+        with pytest.raises(HTTPBadRequest):
+            autocomplete_surahs_view(dummy_request)
+
+
+class TestQuranViews:
+
+    def test_list_surahs_in_alquran_cloud_shape(self, corpus, dummy_request):
+        response = list_quran_surahs_view(dummy_request)
+
+        assert response == [{
+            'number': 1,
+            'name': 'الفاتحة',
+            'englishName': 'Al-Fatihah',
+            'englishNameTranslation': 'The Opening',
+            'numberOfAyahs': 7,
+            'revelationType': 'Meccan',
+        }]
+
+    def test_surah_with_combined_editions(self, corpus, dummy_request, dbsession):
+        baqarah = Surah(
+            surah_number=2, name_arabic='البقرة', name_english='Al-Baqarah',
+            number_of_ayahs=286, revelation_type='Medinan'
+        )
+        dbsession.add(baqarah)
+        dbsession.flush()
+        dbsession.add(Ayah(
+            surah_id=baqarah.id, ayah_number_in_surah=1, text_uthmani='الٓمٓ',
+            translation_en='Alif, Lam, Meem', translation_id='Alif Lam Mim'
+        ))
+        dbsession.flush()
+        corpus_cache.invalidate()
+
+        dummy_request.matchdict = {'surah_number': '2'}
+        response = get_quran_surah_view(dummy_request)
+
+        assert response['surah']['englishName'] == 'Al-Baqarah'
+        assert response['source'] == 'local'
+        # Numbered across the mushaf, after the 7 ayahs of Al-Fatihah
+        assert response['ayahs'] == [{
+            'number': 8,
+            'text': 'الٓمٓ',
+            'numberInSurah': 1,
+            'translation': {'en': 'Alif, Lam, Meem', 'id': 'Alif Lam Mim'},
+        }]
+
+        dummy_request.matchdict = {'surah_number': '1'}
+        assert [a['number'] for a in get_quran_surah_view(dummy_request)['ayahs']] == [1, 2, 3]
+
+    def test_unknown_surah(self, corpus, dummy_request):
+        for surah_number in ('114', 'fatihah'):
+            dummy_request.matchdict = {'surah_number': surah_number}
+            with pytest.raises(HTTPNotFound):
+                get_quran_surah_view(dummy_request)
@@ -0,0 +1,109 @@
+import pytest
+from datetime import datetime
+from pyramid.httpexceptions import HTTPBadRequest, HTTPForbidden
+
+from backend.models.mymodel import User, Hafalan, Reminder
+from backend.utils.identity import user_cache
+from backend.utils.pagination import encode_cursor
+from backend.views.hafalan_views import create_user_hafalan_view, update_hafalan_view, delete_hafalan_view
+from backend.views.reminder_views import create_user_reminder_view, delete_reminder_view
+from backend.views.sync_views import user_sync_view
+
+
+@pytest.fixture
+def sync_request(dummy_request, dbsession):
+    user = User(username='test_sync_user', email='test_sync@example.com')
+    user.set_password('SecurePassword123!')
+    dbsession.add(user)
+    dbsession.flush()
+    dummy_request.user = {'user_id': user.id}
+    return dummy_request, user
+
+
+def call(view, request, matchdict, json_body=None, params=None):
+    request.matchdict = matchdict
+    request.json_body = json_body
+    request.params = params or {}
+    request.response.status_code = 200
+    return view(request)
+
+
+class TestUserSync:
+
+    @pytest.fixture
+    def synced(self, sync_request):
+        dummy_request, user = sync_request
+        user_match = {'user_id': str(user.id)}
+        hafalan = [
+            call(create_user_hafalan_view, dummy_request, user_match,
+                 {'surah_name': name, 'ayah_range': '1-3', 'status': 'sedang'})
+            for name in ('Al-Ikhlas', 'An-Nas', 'Al-Falaq')
+        ]
+        reminder = call(create_user_reminder_view, dummy_request, user_match,
+                        {'surat': 'Al-Ikhlas', 'ayat': '1-4', 'due_date': '2026-10-20T05:00:00'})
+        return dummy_request, user, hafalan, reminder
+
+    def test_initial_sync_returns_everything(self, synced):
+        dummy_request, user, hafalan, reminder = synced
+
+        response = call(user_sync_view, dummy_request, {'user_id': str(user.id)})
+
+        assert [h['id'] for h in response['hafalan']] == [h['id'] for h in hafalan]
+        assert [r['id'] for r in response['reminders']] == [reminder['id']]
+        assert response['deleted'] == {'hafalan': [], 'reminders': []}
+        assert response['has_more'] is False
+        assert response['cursor'] == encode_cursor([4])
+
+    def test_returns_only_changes_since_cursor(self, synced):
+        dummy_request, user, (ikhlas, nas, falaq), reminder = synced
+        cursor = call(user_sync_view, dummy_request, {'user_id': str(user.id)})['cursor']
+
+        call(update_hafalan_view, dummy_request, {'hafalan_id': str(nas['id'])}, {'status': 'selesai'})
+        call(delete_hafalan_view, dummy_request, {'hafalan_id': str(falaq['id'])})
+        call(delete_reminder_view, dummy_request, {'reminder_id': str(reminder['id'])})
+        response = call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params={'since': cursor})
+
+        assert [(h['id'], h['status']) for h in response['hafalan']] == [(nas['id'], 'selesai')]
+        assert response['reminders'] == []
+        assert response['deleted'] == {'hafalan': [falaq['id']], 'reminders': [reminder['id']]}
+
+        again = call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params={'since': response['cursor']})
+        assert again['hafalan'] == [] and again['deleted'] == {'hafalan': [], 'reminders': []}
+        assert again['cursor'] == response['cursor']
+
+    def test_pages_with_limit(self, synced):
+        dummy_request, user, hafalan, reminder = synced
+        seen, params = [], {'limit': '3'}
+        while True:
+            response = call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params=params)
+            seen.extend(h['id'] for h in response['hafalan'])
+            seen.extend(r['id'] for r in response['reminders'])
+            if not response['has_more']:
+                break
+            params = {'limit': '3', 'since': response['cursor']}
+
+        assert seen == [h['id'] for h in hafalan] + [reminder['id']]
+
+    def test_rejects_other_users_and_bad_cursors(self, synced):
+        dummy_request, user, hafalan, reminder = synced
+        with pytest.raises(HTTPForbidden):
+            call(user_sync_view, dummy_request, {'user_id': str(user.id + 1)})
+        with pytest.raises(HTTPBadRequest):
+            call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params={'since': 'not-a-cursor'})
+        with pytest.raises(HTTPBadRequest):
+            call(user_sync_view, dummy_request, {'user_id': str(user.id)}, params={'since': encode_cursor(['x'])})
+
+    def test_write_for_user_deleted_elsewhere_is_not_found(self, sync_request, dummy_config):
+        dummy_request, user = sync_request
+        # Another process deleted the user while this one still has it cached
+        dummy_config.add_settings({'identity.user_cache_ttl': '30'})
+        missing = user.id + 1000
+        user_cache.add(missing, 30)
+        try:
+            response = call(create_user_hafalan_view, dummy_request, {'user_id': str(missing)},
+                            {'surah_name': 'Al-Ikhlas', 'ayah_range': '1-4'})
+        finally:
+            user_cache.clear()
+
+        assert dummy_request.response.status_code == 404
+        assert response == {'error': f'User with id {missing} not found'}
@@ -4,7 +4,9 @@ import transaction
 from pyramid import testing
 
 from backend.models.mymodel import User
+from backend.utils.identity import load_user, user_cache, user_exists
 from backend.views.user_views import create_user_view, get_user_view, update_user_view, delete_user_view, list_users_view
+from sqlalchemy import event
 from .factories import UserFactory, BaseFactory
 
 
@@ -173,3 +175,52 @@ class TestUserViews:
         assert dummy_request.response.status_code == 204
         # Optionally, verify the user is deleted from the database
         assert dbsession.query(User).get(user_id) is None
+
+
+class TestIdentity:
+
+    @pytest.fixture
+    def user(self, dbsession):
+        user = User(username='identity_user', email='identity_user@example.com')
+        user.set_password('SecurePassword123!')
+        dbsession.add(user)
+        dbsession.flush()
+        user_id = user.id
+        # Start from an empty identity map, like a new request
+        dbsession.expunge_all()
+        user_cache.clear()
+        yield user_id
+        user_cache.clear()
+
+    @pytest.fixture
+    def selects(self, dbsession):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(dbsession.get_bind(), 'before_cursor_execute', listener)
+        yield lambda: [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+        event.remove(dbsession.get_bind(), 'before_cursor_execute', listener)
+
+    def test_user_loaded_once_per_request(self, user, selects, dummy_request):
+        loaded = load_user(dummy_request, str(user))
+        assert loaded.id == user
+        assert user_exists(dummy_request, user)
+        assert load_user(dummy_request, user) is loaded
+        assert len(selects()) == 1
+
+        assert not user_exists(dummy_request, user + 1000)
+        assert not user_exists(dummy_request, 'abc')
+        assert load_user(dummy_request, None) is None
+
+    def test_existence_cache(self, user, selects, dummy_request, dummy_config, dbsession):
+        dummy_config.add_settings({'identity.user_cache_ttl': '30'})
+        assert user_exists(dummy_request, user)
+        dbsession.expunge_all()
+        # Known ids skip the database; unknown ones are not remembered
+        assert user_exists(dummy_request, user)
+        assert not user_exists(dummy_request, user + 1000)
+        assert not user_exists(dummy_request, user + 1000)
+        assert len(selects()) == 3
+
+        dummy_request.matchdict = {'user_id': str(user)}
+        delete_user_view(dummy_request)
+        assert user not in user_cache
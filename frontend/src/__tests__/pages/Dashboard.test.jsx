@@ -71,8 +71,10 @@ describe('Dashboard Page', () => {
       expect(screen.getByText(/Al-Baqarah : 1-5/i)).toBeInTheDocument();
     });
 
-    // Verify API calls
-    expect(api.get).toHaveBeenCalledWith(`/v1/users/${testUser.id}/hafalan`);
+    // Verify API calls: only the first page of hafalan is requested
+    expect(api.get).toHaveBeenCalledWith(`/v1/users/${testUser.id}/hafalan`, {
+      params: { sort: '-updated_at', limit: 20 }
+    });
     expect(api.get).toHaveBeenCalledWith(`/v1/users/${testUser.id}/reminders`);
   });
 
@@ -385,7 +387,7 @@ describe('Dashboard Page', () => {
     // Verify api.get calls
     // Initial calls: hafalan (fail), reminders (ok)
     // After click: hafalan (success), reminders (ok)
-    expect(api.get).toHaveBeenCalledWith(hafalanApiUrl);
+    expect(api.get).toHaveBeenCalledWith(hafalanApiUrl, expect.objectContaining({ params: expect.any(Object) }));
     expect(api.get).toHaveBeenCalledWith(remindersApiUrl);
     
     const hafalanCalls = api.get.mock.calls.filter(call => call[0] === hafalanApiUrl);
@@ -395,4 +397,44 @@ describe('Dashboard Page', () => {
     // Reminders are called initially, and potentially again after hafalan succeeds in useEffect
     expect(reminderCalls.length).toBeGreaterThanOrEqual(1); // At least once, likely twice
   });
+
+  // Test 13: "Muat Lebih Banyak" loads the next page with the cursor
+  test('"Muat Lebih Banyak" loads the next page of hafalan', async () => {
+    const testUser = { id: 1, name: 'Test User' };
+    useAuthStore.mockReturnValue({ user: testUser, isAuthenticated: true });
+    const hafalanApiUrl = `/v1/users/${testUser.id}/hafalan`;
+
+    api.get.mockImplementation((url, config) => {
+      if (url === hafalanApiUrl && !config.params.after) {
+        return Promise.resolve({
+          data: [{ id: 2, surah_name: 'Al-Mulk', ayah_range: '1-10', status: 'sedang' }],
+          headers: { 'x-next-cursor': 'cursor-1' },
+        });
+      }
+      if (url === hafalanApiUrl) {
+        return Promise.resolve({
+          data: [{ id: 1, surah_name: 'Al-Fatihah', ayah_range: '1-7', status: 'selesai' }],
+          headers: {},
+        });
+      }
+      return Promise.resolve({ data: [] });
+    });
+
+    render(
+      <MemoryRouter>
+        <Dashboard />
+      </MemoryRouter>
+    );
+
+    fireEvent.click(await screen.findByRole('button', { name: /Muat Lebih Banyak/i }));
+
+    await waitFor(() => {
+      expect(screen.getByText(/Al-Mulk : 1-10/i)).toBeInTheDocument();
+      expect(screen.getByText(/Al-Fatihah : 1-7/i)).toBeInTheDocument();
+    });
+    expect(api.get).toHaveBeenCalledWith(hafalanApiUrl, {
+      params: { sort: '-updated_at', limit: 20, after: 'cursor-1' }
+    });
+    expect(screen.queryByRole('button', { name: /Muat Lebih Banyak/i })).not.toBeInTheDocument();
+  });
 });
@@ -4,18 +4,22 @@ import { useNavigate } from 'react-router-dom';
 import api from '../services/api';
 import useAuthStore from '../hooks/useAuth';
 import { CircularProgress, Typography, Paper, Tabs, Tab, Box } from '@mui/material';
-import { subWeeks, format, parseISO, getMonth, getYear, startOfMonth, endOfMonth, eachWeekOfInterval, startOfWeek, endOfWeek, differenceInCalendarWeeks, startOfYear, endOfYear, eachMonthOfInterval } from 'date-fns';
+import { format, parseISO } from 'date-fns';
 import { id } from 'date-fns/locale';
 
-// Helper function to calculate number of ayahs from range like "1-10" or "5"
-const calculateAyahCount = (ayahRange) => {
-  if (!ayahRange) return 0;
-  const parts = ayahRange.split('-').map(s => parseInt(s.trim(), 10));
-  if (parts.length === 1) return 1; // Single ayah
-  if (parts.length === 2 && !isNaN(parts[0]) && !isNaN(parts[1])) {
-    return parts[1] - parts[0] + 1;
-  }
-  return 0; // Invalid range
+// Chart filters map to the granularity of the stats endpoint
+const GRANULARITIES = {
+  weekly: 'week',
+  monthly: 'month',
+  yearly: 'year'
+};
+
+// Label for a bucket starting at `start` (YYYY-MM-DD)
+const bucketLabel = (filter, start) => {
+  const date = parseISO(start);
+  if (filter === 'weekly') return `Pekan ${format(date, 'dd/MM')}`;
+  if (filter === 'monthly') return format(date, 'MMM', { locale: id });
+  return format(date, 'yyyy');
 };
 
 const Chart = () => {
@@ -43,16 +47,14 @@ const Chart = () => {
       setIsLoading(true);
       setError(null);
       try {
-        console.log(`[Chart.jsx] Fetching hafalan for user ID: ${user.id}`);
-        const response = await api.get(`/v1/users/${user.id}/hafalan`);
-        console.log('[Chart.jsx] Raw API response:', response);
-        const hafalanItems = response.data;
-        console.log('[Chart.jsx] Hafalan items from API:', hafalanItems);
-        // Added log to inspect last_reviewed_at
-        console.log('[Chart.jsx] Hafalan items from API (checking last_reviewed_at):', hafalanItems.map(item => ({ id: item.id, status: item.status, last_reviewed_at: item.last_reviewed_at })));
-
-        if (!Array.isArray(hafalanItems)) {
-          console.error('[Chart.jsx] hafalanItems is not an array:', hafalanItems);
+        // Bucketing and totals are computed by the backend
+        const response = await api.get(`/v1/users/${user.id}/hafalan/stats`, {
+          params: { granularity: GRANULARITIES[filter] }
+        });
+        const stats = response.data;
+
+        if (!stats || !Array.isArray(stats.buckets)) {
+          console.error('[Chart.jsx] Invalid stats response:', stats);
           setError("Data hafalan yang diterima tidak valid.");
           setChartData([]);
           setSummaryStats({ totalAyahs: 0, totalSurahs: 0 });
@@ -60,113 +62,14 @@ const Chart = () => {
           return;
         }
 
-        const completedHafalan = hafalanItems.filter(
-          item => {
-            const isSelesai = item.status === 'selesai';
-            const hasLastReviewed = !!item.last_reviewed_at;
-            // console.log(`[Chart.jsx] Filtering item ID ${item.id}: status=${item.status}, last_reviewed_at=${item.last_reviewed_at}, isSelesai=${isSelesai}, hasLastReviewed=${hasLastReviewed}`);
-            return isSelesai && hasLastReviewed;
-          }
-        ).map(item => {
-          let parsedDate;
-          try {
-            parsedDate = parseISO(item.last_reviewed_at);
-          } catch (e) {
-            console.error(`[Chart.jsx] Error parsing date for item ID ${item.id}: ${item.last_reviewed_at}`, e);
-            return null; // Skip this item if date is invalid
-          }
-          const ayahs = calculateAyahCount(item.ayah_range);
-          // console.log(`[Chart.jsx] Mapping item ID ${item.id}: date=${parsedDate}, ayahCount=${ayahs}`);
-          return {
-            ...item,
-            date: parsedDate,
-            ayahCount: ayahs
-          };
-        }).filter(item => item !== null) // Remove items with parsing errors
-        .sort((a, b) => a.date - b.date); // Sort by date for cumulative calculation
-        console.log('[Chart.jsx] Filtered and mapped completedHafalan:', completedHafalan);
-
-        let processedData = [];
-        let cumulativeAyahs = 0;
-        const today = new Date();
-
-        if (filter === 'monthly') {
-          const currentYear = getYear(today);
-          const monthsInYear = eachMonthOfInterval({
-            start: startOfYear(today),
-            end: today // up to the current month
-          });
-
-          processedData = monthsInYear.map(monthStart => {
-            const monthEnd = endOfMonth(monthStart);
-            const ayahsThisMonth = completedHafalan
-              .filter(item => item.date >= monthStart && item.date <= monthEnd)
-              .reduce((sum, item) => sum + item.ayahCount, 0);
-            cumulativeAyahs += ayahsThisMonth;
-            return {
-              name: format(monthStart, 'MMM', { locale: id }),
-              ayatDihafal: cumulativeAyahs,
-              newAyahs: ayahsThisMonth // For tooltip or bar chart
-            };
-          });
-        } else if (filter === 'weekly') {
-          const last8Weeks = eachWeekOfInterval({
-            start: subWeeks(startOfWeek(today, { weekStartsOn: 1 }), 7), // Start of 8 weeks ago
-            end: startOfWeek(today, { weekStartsOn: 1 }) // Start of current week
-          }, { weekStartsOn: 1 });
-          
-          processedData = last8Weeks.map(weekStart => {
-            const weekEnd = endOfWeek(weekStart, { weekStartsOn: 1 });
-            const ayahsThisWeek = completedHafalan
-              .filter(item => item.date >= weekStart && item.date <= weekEnd)
-              .reduce((sum, item) => sum + item.ayahCount, 0);
-            cumulativeAyahs += ayahsThisWeek;
-            return {
-              name: `Pekan ${format(weekStart, 'dd/MM')}`,
-              ayatDihafal: cumulativeAyahs,
-              newAyahs: ayahsThisWeek
-            };
-          });
-        } else if (filter === 'yearly') {
-          const uniqueYears = [...new Set(completedHafalan.map(item => getYear(item.date)))].sort();
-          const displayYears = uniqueYears.slice(-3); // Max last 3 years or all if less
-
-          if (displayYears.length === 0 && completedHafalan.length > 0) { // Handle case where all hafalan is in current year but no full previous year
-             displayYears.push(getYear(completedHafalan[0].date));
-          } else if (displayYears.length === 0) {
-            displayYears.push(getYear(today)); // Default to current year if no data
-          }
-
-
-          processedData = displayYears.map(year => {
-            const yearStart = startOfYear(new Date(year, 0, 1));
-            const yearEnd = endOfYear(new Date(year, 0, 1));
-            const ayahsThisYear = completedHafalan
-              .filter(item => getYear(item.date) === year)
-              .reduce((sum, item) => sum + item.ayahCount, 0);
-            cumulativeAyahs += ayahsThisYear; // This cumulative logic might need adjustment for yearly if not reset
-            return {
-              name: year.toString(),
-              ayatDihafal: completedHafalan.filter(item => getYear(item.date) <= year).reduce((sum, item) => sum + item.ayahCount, 0), // True cumulative up to this year
-              newAyahs: ayahsThisYear
-            };
-          });
-           // For yearly, we want the total for that year, not a running cumulative across years in the chart
-           // So, let's recalculate ayatDihafal to be the total up to that year.
-           let runningTotalForYearly = 0;
-           processedData = processedData.map(dataPoint => {
-               runningTotalForYearly += dataPoint.newAyahs; // This was ayahsThisYear
-               return { ...dataPoint, ayatDihafal: runningTotalForYearly };
-           });
-        }
-        
-        console.log('[Chart.jsx] Processed chart data before setting state:', processedData);
-        setChartData(processedData);
-
-        const totalAyahs = completedHafalan.reduce((sum, item) => sum + item.ayahCount, 0);
-        const totalSurahs = new Set(completedHafalan.map(item => item.surah_name)).size;
-        console.log('[Chart.jsx] Summary stats: totalAyahs=', totalAyahs, 'totalSurahs=', totalSurahs);
-        setSummaryStats({ totalAyahs, totalSurahs });
+        // Nothing finished in this period: show the empty state
+        const hasProgress = stats.buckets.some(bucket => bucket.new_ayahs > 0);
+        setChartData(hasProgress ? stats.buckets.map(bucket => ({
+          name: bucketLabel(filter, bucket.start),
+          ayatDihafal: bucket.cumulative_ayahs,
+          newAyahs: bucket.new_ayahs
+        })) : []);
+        setSummaryStats({ totalAyahs: stats.totals.ayahs, totalSurahs: stats.totals.surahs });
 
       } catch (err) {
         console.error("[Chart.jsx] Error fetching or processing hafalan data:", err);
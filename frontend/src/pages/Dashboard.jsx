@@ -11,8 +11,13 @@ const quranQuotes = [
   { id: 4, text: "Verily, with hardship, there is relief.", surah: "Ash-Sharh", ayat: "6" },
 ];
 
+// Hafalan entries per page, most recently updated first
+const HAFALAN_PAGE_SIZE = 20;
+
 const Dashboard = () => {
   const [hafalanList, setHafalanList] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [upcomingReminders, setUpcomingReminders] = useState([]);
   const [currentQuote, setCurrentQuote] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
@@ -34,18 +39,37 @@ const Dashboard = () => {
       setIsReminderLoading(false);
     }
   }, [isAuthenticated, user]);
+  const fetchHafalanPage = (after) => api.get(`/v1/users/${user.id}/hafalan`, {
+    params: { sort: '-updated_at', limit: HAFALAN_PAGE_SIZE, ...(after ? { after } : {}) }
+  });
+
     const fetchHafalanData = async () => {
     setIsLoading(true);
     setError(null);
     try {
-      // Use the proper API endpoint with user_id
-      const response = await api.get(`/v1/users/${user.id}/hafalan`);
-      setHafalanList(response.data);    } catch (err) {
+      // Only the first page; the rest is loaded on demand
+      const response = await fetchHafalanPage();
+      setHafalanList(response.data);
+      setNextCursor(response.headers?.['x-next-cursor'] || null);
+    } catch (err) {
       console.error("Error fetching hafalan list:", err);
       setError("Gagal mengambil data hafalan. Silakan coba lagi nanti.");
     } finally {
       setIsLoading(false);
     }
+  };
+  const loadMoreHafalan = async () => {
+    setIsLoadingMore(true);
+    try {
+      const response = await fetchHafalanPage(nextCursor);
+      setHafalanList(list => [...list, ...response.data]);
+      setNextCursor(response.headers?.['x-next-cursor'] || null);
+    } catch (err) {
+      console.error("Error fetching more hafalan:", err);
+      alert("Gagal memuat hafalan berikutnya");
+    } finally {
+      setIsLoadingMore(false);
+    }
   };
     const fetchReminders = async () => {
     setIsReminderLoading(true);
@@ -160,7 +184,7 @@ const Dashboard = () => {
               <div className="flex-grow flex flex-col justify-center items-center bg-red-100 p-6 text-center border border-red-300 rounded-lg">
                 <p className="text-red-600">{error}</p>
                 <button 
-                  onClick={fetchHafalanData} 
+                  onClick={() => fetchHafalanData()} 
                   className="mt-4 bg-accent-primary hover:bg-accent-primary-dark text-white px-4 py-2 rounded-lg"
                 >
                   Coba Lagi
@@ -213,6 +237,17 @@ const Dashboard = () => {
                     </div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <div className="md:col-span-2 flex justify-center">
+                    <button
+                      onClick={loadMoreHafalan}
+                      disabled={isLoadingMore}
+                      className="text-sm bg-gray-200 hover:bg-gray-300 text-text-primary font-medium py-2 px-4 rounded-lg shadow-sm hover:shadow-md transition-all duration-150 disabled:opacity-60"
+                    >
+                      {isLoadingMore ? 'Memuat...' : 'Muat Lebih Banyak'}
+                    </button>
+                  </div>
+                )}
               </div>
             )}
          </section>
@@ -1,69 +1,38 @@
-import axios from 'axios';
-
-// External Quran API
-const quranCloudApi = axios.create({
-  baseURL: 'https://api.alquran.cloud/v1',
-});
+import api from './api';
 
 /**
- * Service for interacting with the alquran.cloud API
+ * Service for reading the Quran corpus from our backend.
+ * Payloads keep the alquran.cloud shape the pages were written against.
  */
 const quranService = {
   /**
-   * Get all surahs from the alquran.cloud API
+   * Get all surahs
    */
   getAllSurahs: async () => {
     try {
-      // Get data directly from alquran.cloud
-      const response = await quranCloudApi.get('/surah');
+      const response = await api.get('/v1/quran/surahs');
       return {
-        data: response.data.data,
-        source: 'external'
+        data: response.data,
+        source: 'local'
       };
     } catch (error) {
-      console.error('Error fetching surahs from alquran.cloud:', error);
+      console.error('Error fetching surahs:', error);
       throw error;
     }
   },
 
   /**
-   * Get a specific surah with its ayahs from alquran.cloud
+   * Get a specific surah with its ayahs (Uthmani text plus English and
+   * Indonesian translations, combined by the backend)
    * @param {number} surahNumber - The surah number (1-114)
    * @returns {Object} The surah data with ayahs
    */
   getSurahWithAyahs: async (surahNumber) => {
     try {
-      // Get directly from external API
-      const response = await quranCloudApi.get(`/surah/${surahNumber}/editions/quran-uthmani,en.sahih,id.indonesian`);
-      
-      // Extract the data from different editions
-      const arabicEdition = response.data.data[0];
-      const englishEdition = response.data.data[1];
-      const indonesianEdition = response.data.data[2];
-      
-      // Combine data
-      return {
-        surah: {
-          number: arabicEdition.number,
-          name: arabicEdition.name,
-          englishName: arabicEdition.englishName,
-          englishNameTranslation: arabicEdition.englishNameTranslation,
-          numberOfAyahs: arabicEdition.numberOfAyahs,
-          revelationType: arabicEdition.revelationType,
-        },
-        ayahs: arabicEdition.ayahs.map((ayah, index) => ({
-          number: ayah.number,
-          text: ayah.text,
-          numberInSurah: ayah.numberInSurah,
-          translation: {
-            en: englishEdition.ayahs[index].text,
-            id: indonesianEdition.ayahs[index].text,
-          }
-        })),
-        source: 'external'
-      };
+      const response = await api.get(`/v1/quran/surahs/${surahNumber}`);
+      return response.data;
     } catch (error) {
-      console.error('Error fetching surah with ayahs from alquran.cloud:', error);
+      console.error('Error fetching surah with ayahs:', error);
       throw error;
     }
   },